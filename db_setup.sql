@@ -67,4 +67,14 @@ CREATE TABLE tags (
    name VARCHAR(32) NOT NULL,
    content TEXT NOT NULL,
    PRIMARY KEY (tag_id)
-);
\ No newline at end of file
+);
+CREATE TABLE reminders (
+   id BIGSERIAL NOT NULL,
+   user_id BIGINT NOT NULL,
+   channel_id BIGINT,
+   expires_at TIMESTAMPTZ NOT NULL,
+   created_at TIMESTAMPTZ,
+   content TEXT NOT NULL,
+   PRIMARY KEY (id)
+);
+CREATE INDEX reminders_expires_at_idx ON reminders (expires_at);
@@ -2,59 +2,131 @@
 import discord
 from discord.ext import commands
 
+from utils.fanout import RequestGraph
+
 
 class Animals(commands.Cog):
     """Sends a random cute picture of animals"""
 
     def __init__(self, bot):
         self.bot = bot
+        # The pictures are fetched in the background so the commands can reply instantly
+        self.pools = {
+            "animals.cat": self.fetch_cat,
+            "animals.dog": self.fetch_dog,
+            "animals.panda": self.fetch_panda,
+            "animals.duck": self.fetch_duck,
+            "animals.rabbit": self.fetch_rabbit,
+            "animals.bird": self.fetch_bird,
+            "animals.capybara": self.fetch_capybara,
+            "animals.shiba": self.fetch_shiba,
+            "animals.fox": self.fetch_fox,
+        }
+
+    async def cog_load(self):
+        for name, fetch in self.pools.items():
+            self.bot.prefetch.add(name, fetch)
+
+    async def cog_unload(self):
+        for name in self.pools:
+            self.bot.prefetch.remove(name)
+
+    async def fetch_cat(self):
+        """Returns a cat picture and maybe a cat fact"""
+        graph = RequestGraph(deadline=8)
+        # Fetch image from TheCatAPI and fact from catfact.ninja
+        graph.add(
+            "image",
+            lambda: self.bot.web.get_json("https://api.thecatapi.com/v1/images/search"),
+            host="api.thecatapi.com",
+        )
+        # The picture can be sent without a fact
+        graph.add("fact", lambda: self.bot.web.get_json("https://catfact.ninja/fact"), optional=True)
+        results = await graph.run()
+        fact = results["fact"]["fact"] if results["fact"] else None
+        return results["image"][0]["url"], fact
+
+    async def fetch_dog(self):
+        """Returns a dog picture and maybe a dog fact"""
+        graph = RequestGraph(deadline=8)
+        # Fetch image from Dog CEO API and fact from dogapi.dog
+        graph.add("image", lambda: self.bot.web.get_json("https://dog.ceo/api/breeds/image/random"), host="dog.ceo")
+        # The picture can be sent without a fact
+        graph.add("fact", lambda: self.bot.web.get_json("https://dogapi.dog/api/v2/facts"), optional=True)
+        results = await graph.run()
+        fact = results["fact"]["data"][0]["attributes"]["body"] if results["fact"] else None
+        return results["image"]["message"], fact
+
+    async def fetch_panda(self):
+        """Returns a panda picture and maybe a panda fact"""
+        # Fetch image and fact from pandaa.vercel.app
+        parsed_json = await self.bot.web.get_json("https://pandaa.vercel.app/all")
+        return parsed_json["pic"], parsed_json.get("fact")
+
+    async def fetch_duck(self):
+        """Returns a duck picture"""
+        # Fetch image from random-d.uk
+        parsed_json = await self.bot.web.get_json("https://random-d.uk/api/v2/random")
+        return parsed_json["url"]
+
+    async def fetch_rabbit(self):
+        """Returns a rabbit picture"""
+        # Fetch image from animals.maxz.dev
+        parsed_json = await self.bot.web.get_json("https://animals.maxz.dev/api/rabbit/random")
+        return parsed_json["image"]
+
+    async def fetch_bird(self):
+        """Returns a bird picture"""
+        # Fetch image from shibe.online
+        parsed_json = await self.bot.web.get_json(
+            "https://shibe.online/api/birds", params={"count": 1, "urls": "true", "httpsUrls": "true"}
+        )
+        return parsed_json[0]
+
+    async def fetch_capybara(self):
+        """Returns a capybara picture"""
+        # Fetch image from animals.maxz.dev
+        parsed_json = await self.bot.web.get_json("https://animals.maxz.dev/api/capybara/random")
+        return parsed_json["image"]
+
+    async def fetch_shiba(self):
+        """Returns a shiba inu picture"""
+        # Fetch image from shibe.online
+        parsed_json = await self.bot.web.get_json(
+            "https://shibe.online/api/shibes", params={"count": 1, "urls": "true", "httpsUrls": "true"}
+        )
+        return parsed_json[0]
+
+    async def fetch_fox(self):
+        """Returns a fox picture"""
+        # Fetch image from randomfox.ca
+        parsed_json = await self.bot.web.get_json("https://randomfox.ca/floof/")
+        return parsed_json["image"]
 
     @commands.command(aliases=["kitty"], extras={"image": "https://i.imgur.com/J8vTsyK.gif"})
     async def cat(self, ctx):
         """Sends a random random cute cat picture"""
-        # Fetch image from TheCatAPI
-        async with self.bot.session.get("https://api.thecatapi.com/v1/images/search") as response:
-            parsed_json = await response.json()
-        img_url = parsed_json[0]["url"]
-
-        # Fetch fact from catfact.ninja
-        async with self.bot.session.get("https://catfact.ninja/fact") as response:
-            fact_json = await response.json()
-        fact = fact_json["fact"]
-
-        await ctx.send(
-            embed=discord.Embed(title="Heres a cat picture")
-            .set_image(url=img_url)
-            .set_footer(text="Fun Fact: " + fact)
-        )
+        img_url, fact = await self.bot.prefetch.get("animals.cat")
+
+        embed = discord.Embed(title="Heres a cat picture").set_image(url=img_url)
+        if fact:
+            embed.set_footer(text="Fun Fact: " + fact)
+        await ctx.send(embed=embed)
 
     @commands.command(aliases=["doggo", "puppy"], extras={"image": "https://i.imgur.com/nJIyoLq.gif"})
     async def dog(self, ctx):
         """Sends a random random cute dog picture"""
-        # Fetch image from Dog CEO API
-        async with self.bot.session.get("https://dog.ceo/api/breeds/image/random") as response:
-            parsed_json = await response.json()
-        img_url = parsed_json["message"]
-
-        # Fetch fact from dogapi.dog
-        async with self.bot.session.get("https://dogapi.dog/api/v2/facts") as response:
-            fact_json = await response.json()
-        fact = fact_json["data"][0]["attributes"]["body"]
-
-        await ctx.send(
-            embed=discord.Embed(title="Heres a dog picture")
-            .set_image(url=img_url)
-            .set_footer(text="Fun Fact: " + fact)
-        )
+        img_url, fact = await self.bot.prefetch.get("animals.dog")
+
+        embed = discord.Embed(title="Heres a dog picture").set_image(url=img_url)
+        if fact:
+            embed.set_footer(text="Fun Fact: " + fact)
+        await ctx.send(embed=embed)
 
     @commands.command(aliases=["pnd"], extras={"image": "https://i.imgur.com/GjsQ5AB.gif"})
     async def panda(self, ctx):
         """Sends a random random cute panda picture"""
-        # Fetch image and fact from pandaa.vercel.app
-        async with self.bot.session.get("https://pandaa.vercel.app/all") as response:
-            parsed_json = await response.json()
-        img_url = parsed_json["pic"]
-        fact = parsed_json.get("fact")
+        img_url, fact = await self.bot.prefetch.get("animals.panda")
 
         embed = discord.Embed(title="Heres a panda picture").set_image(url=img_url)
         if fact:
@@ -64,60 +136,37 @@ class Animals(commands.Cog):
     @commands.command(aliases=["quack"], extras={"image": "https://i.imgur.com/jgjohiu.gif"})
     async def duck(self, ctx):
         """Sends a random cute duck picture"""
-        # Fetch image from random-d.uk
-        async with self.bot.session.get("https://random-d.uk/api/v2/random") as response:
-            parsed_json = await response.json()
-        img_url = parsed_json["url"]
+        img_url = await self.bot.prefetch.get("animals.duck")
         await ctx.send(embed=discord.Embed(title="Heres a duck picture").set_image(url=img_url))
 
     @commands.command(aliases=["bunny"], extras={"image": "https://i.imgur.com/y8VhA8d.gif"})
     async def rabbit(self, ctx):
         """Sends a random cute rabbit picture"""
-        # Fetch image from animals.maxz.dev
-        async with self.bot.session.get("https://animals.maxz.dev/api/rabbit/random") as response:
-            parsed_json = await response.json()
-        img_url = parsed_json["image"]
+        img_url = await self.bot.prefetch.get("animals.rabbit")
         await ctx.send(embed=discord.Embed(title="Heres a rabbit picture").set_image(url=img_url))
 
     @commands.command(aliases=["birb"], extras={"image": "https://i.imgur.com/wittKiF.gif"})
     async def bird(self, ctx):
         """Sends a random cute bird picture"""
-        # Fetch image from shibe.online
-        async with self.bot.session.get(
-            "https://shibe.online/api/birds", params={"count": 1, "urls": "true", "httpsUrls": "true"}
-        ) as response:
-            parsed_json = await response.json()
-        img_url = parsed_json[0]
+        img_url = await self.bot.prefetch.get("animals.bird")
         await ctx.send(embed=discord.Embed(title="Heres a bird picture").set_image(url=img_url))
 
     @commands.command(aliases=["capy"], extras={"image": "https://i.imgur.com/u7xuVvG.gif"})
     async def capybara(self, ctx):
         """Sends a random capybara picture"""
-        # Fetch image from animals.maxz.dev
-        async with self.bot.session.get("https://animals.maxz.dev/api/capybara/random") as response:
-            parsed_json = await response.json()
-        img_url = parsed_json["image"]
+        img_url = await self.bot.prefetch.get("animals.capybara")
         await ctx.send(embed=discord.Embed(title="Heres a capybara picture").set_image(url=img_url))
 
     @commands.command(aliases=["shibe"], extras={"image": "https://i.imgur.com/rPvwWVW.gif"})
     async def shiba(self, ctx):
         """Sends a random shiba inu picture"""
-        # Fetch image from shibe.online
-        async with self.bot.session.get(
-            "https://shibe.online/api/shibes", params={"count": 1, "urls": "true", "httpsUrls": "true"}
-        ) as response:
-            parsed_json = await response.json()
-        img_url = parsed_json[0]
+        img_url = await self.bot.prefetch.get("animals.shiba")
         await ctx.send(embed=discord.Embed(title="Heres a shiba inu picture").set_image(url=img_url))
 
     @commands.command(aliases=["fx"], extras={"image": "https://i.imgur.com/eHN5GZT.gif"})
     async def fox(self, ctx):
         "Sends a random high quality fox picture"
-        url = "https://randomfox.ca/floof/"
-
-        async with self.bot.session.get(url) as response:
-            parsed_json = await response.json()
-        img_url = parsed_json["image"]
+        img_url = await self.bot.prefetch.get("animals.fox")
         await ctx.send(embed=discord.Embed(title="Heres a fox picture").set_image(url=img_url))
 
 
@@ -144,7 +144,7 @@ class Calculator(commands.Cog):
 
     @commands.command(
         aliases=["math", "calculator", "calculate"],
-        extras={"image": "https://i.imgur.com/P6PbUDi.png"},
+        extras={"image": "https://i.imgur.com/P6PbUDi.png", "typing": False},
     )
     async def calc(self, ctx, *, formula):
         """Evaluate math expressions."""
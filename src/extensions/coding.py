@@ -14,6 +14,7 @@ from bs4 import BeautifulSoup
 from discord.ext import commands
 from rich import print as rprint
 
+from utils.fanout import RequestGraph
 from utils.functions import split_by_slice
 from utils.paginator import Paginator
 from utils.classes import AttrDict
@@ -221,21 +222,23 @@ class Coding(commands.Cog):
     async def python_package(self, ctx, package_name: str):
         """Gets information about the specified pypi package"""
 
-        url = f"https://pypi.org/pypi/{package_name}/json"
-        async with self.bot.session.get(url) as response:
-            if response.status == 404:
-                return await ctx.send("Project not found")
-            if response.status != 200:
-                return await ctx.send(f"Some error occured. response code {response.status}")
-            parsed_json = json.loads(await response.text())
-
-        stats_url = f"https://pypistats.org/api/packages/{package_name}/recent"
-        async with self.bot.session.get(stats_url) as r:
-            resp = await r.text()
-            try:
-                parsed_stats = json.loads(resp)
-            except json.JSONDecodeError:
-                parsed_stats = None
+        graph = RequestGraph(deadline=10)
+        graph.add("package", lambda: self.bot.web.get(f"https://pypi.org/pypi/{package_name}/json"), host="pypi.org")
+        # The package can be shown without the download stats
+        graph.add(
+            "stats",
+            lambda: self.bot.web.get_json(f"https://pypistats.org/api/packages/{package_name}/recent"),
+            optional=True,
+        )
+        results = await graph.run()
+
+        response = results["package"]
+        if response.status == 404:
+            return await ctx.send("Project not found")
+        if response.status != 200:
+            return await ctx.send(f"Some error occured. response code {response.status}")
+        parsed_json = response.json()
+        parsed_stats = results["stats"]
 
         parsed_json = parsed_json["info"]
         if len(parsed_json["summary"]) != 0:
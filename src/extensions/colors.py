@@ -1,9 +1,9 @@
-import json
-
 import discord
 from discord.ext import commands
 
 from utils import randomcolor
+from utils.colors import COLORS, SCHEMES
+from utils.converters import CustomLiteral
 
 
 class Colors(commands.Cog):
@@ -23,23 +23,8 @@ class Colors(commands.Cog):
         - `rgb(<number>, <number>, <number>)`
         - All the colors mentioned in https://gist.github.com/Soheab/d9cf3f40e34037cfa544f464fc7d919e#colours
         """
-        hexcol = str(hex(color.value))[2:]
-        async with self.bot.session.get(f"http://www.thecolorapi.com/id?hex={hexcol}") as response:
-            data = json.loads(await response.text())
-
-        color_name = data["name"]["value"].title()
-        intcol = int(hexcol, 16)
-
-        embed = discord.Embed(color=intcol)
-        embed.set_author(name=color_name)
-        embed.set_image(url=f"http://singlecolorimage.com/get/{hexcol}/384x384")
-        embed.add_field(name="Hex", value=data["hex"]["value"])
-        embed.add_field(name="RGB", value=data["rgb"]["value"])
-        embed.add_field(name="INT", value=intcol)
-        embed.add_field(name="HSL", value=data["hsl"]["value"])
-        embed.add_field(name="HSV", value=data["hsv"]["value"])
-        embed.add_field(name="CMYK", value=data["cmyk"]["value"])
-        embed.add_field(name="XYZ", value=data["XYZ"]["value"])
+        embed = self.color_embed(color.value)
+        embed.set_image(url=f"http://singlecolorimage.com/get/{color.value:06x}/384x384")
         await ctx.send(embed=embed)
 
     @color.error
@@ -59,26 +44,52 @@ class Colors(commands.Cog):
         """
         rand_color = randomcolor.RandomColor()
         generated_color = rand_color.generate()[0]
-        hexcol = generated_color.replace("#", "")
-        async with self.bot.session.get(f"http://www.thecolorapi.com/id?hex={hexcol}") as response:
-            data = json.loads(await response.text())
-        color_name = data["name"]["value"]
-        rgb = data.get("rgb").get("value")
-        hexcol = data.get("hex").get("value")
-        intcol = int(hexcol[1:], 16)
-        embed = discord.Embed(color=intcol)
-        embed.set_author(name=color_name)
-        embed.set_thumbnail(url=f"http://singlecolorimage.com/get/{hexcol[1:]}/256x256")
-        embed.add_field(name="Hex", value=data["hex"]["value"])
-        embed.add_field(name="RGB", value=data["rgb"]["value"])
-        embed.add_field(name="INT", value=intcol)
-        embed.add_field(name="HSL", value=data["hsl"]["value"])
-        embed.add_field(name="HSV", value=data["hsv"]["value"])
-        embed.add_field(name="CMYK", value=data["cmyk"]["value"])
-        embed.add_field(name="XYZ", value=data["XYZ"]["value"])
+        intcol = int(generated_color.replace("#", ""), 16)
+        embed = self.color_embed(intcol)
+        embed.set_thumbnail(url=f"http://singlecolorimage.com/get/{intcol:06x}/256x256")
         embed.set_footer(text="You can use the color command to get more details about the color")
         await ctx.send(embed=embed)
 
+    @commands.command(aliases=["scheme", "palette", "colorscheme"])
+    async def colourscheme(
+        self,
+        ctx,
+        color: commands.ColourConverter,
+        mode: CustomLiteral(*SCHEMES) = "complementary",
+    ):
+        """Sends a color scheme made from a color
+
+        The modes are complementary, analogous, triadic, split (split complementary) and tetradic
+        """
+        mode = mode.lower()
+        colors = COLORS.scheme(color.value, mode)
+        # All the colors are named at once
+        names = COLORS.nearest(colors)
+        embed = discord.Embed(title=f"{mode.title()} Scheme", color=color.value)
+        for value, (name, _) in zip(colors, names):
+            embed.add_field(name=name, value=f"#{value:06X}")
+        await ctx.send(embed=embed)
+
+    @staticmethod
+    def color_embed(value: int) -> discord.Embed:
+        """Makes a embed with the name of a color and the color in the common formats"""
+        # The name and the formats are computed locally so this doesn't make any requests
+        color_name, named_value = COLORS.nearest([value])[0]
+        complementary = COLORS.scheme(value)[1]
+        data = COLORS.describe(value)
+
+        embed = discord.Embed(color=value)
+        embed.set_author(name=color_name if named_value == value else f"{color_name} (closest match)")
+        embed.add_field(name="Hex", value=data["hex"])
+        embed.add_field(name="RGB", value=data["rgb"])
+        embed.add_field(name="INT", value=value)
+        embed.add_field(name="HSL", value=data["hsl"])
+        embed.add_field(name="HSV", value=data["hsv"])
+        embed.add_field(name="CMYK", value=data["cmyk"])
+        embed.add_field(name="XYZ", value=data["xyz"])
+        embed.add_field(name="Complementary", value=f"{COLORS.name(complementary)} (#{complementary:06X})")
+        return embed
+
 
 async def setup(bot):
     """Adds the cog to the bot"""
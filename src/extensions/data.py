@@ -9,6 +9,7 @@ from discord.ext import commands
 from discord.ext.commands import BucketType
 
 from utils.errors import NoAPIKey
+from utils.fanout import RequestGraph
 from utils.paginator import Paginator
 
 
@@ -26,6 +27,27 @@ class Data(commands.Cog):
     def __init__(self, bot):
         self.bot = bot
 
+    async def cog_load(self):
+        # The facts are fetched in the background so the command can reply instantly
+        self.bot.prefetch.add("data.fact", self.fetch_fact)
+
+    async def cog_unload(self):
+        self.bot.prefetch.remove("data.fact")
+
+    async def fetch_fact(self):
+        """Returns a random fact"""
+        fj = await self.bot.web.get_json("https://uselessfacts.jsph.pl/random.json", params={"language": "en"})
+        return fj["text"]
+
+    async def fetch_evolution_chain(self, species_data):
+        """Returns the evolution chain of a pokemon species, None if it doesn't have one"""
+        if not species_data:
+            return None
+        evo_url = species_data.get("evolution_chain", {}).get("url")
+        if not evo_url:
+            return None
+        return await self.bot.pokeapi.get(evo_url)
+
     @commands.command(aliases=["lrc"])
     @commands.bot_has_permissions(use_external_emojis=True)
     async def lyrics(self, ctx, *, song_name: str):
@@ -76,17 +98,26 @@ class Data(commands.Cog):
     @commands.bot_has_permissions(use_external_emojis=True)
     async def pokedex(self, ctx, pokemon: str):
         """Sends the details about a [pokemon](https://en.wikipedia.org/wiki/Pok%C3%A9mon)"""
-        pokemon = quote(pokemon.lower())
+        name = pokemon.lower()
+        pokemon = quote(name)
 
+        # PokéAPI data is cached on disk by bot.pokeapi so only the first lookup of a pokemon is slow
+        graph = RequestGraph(deadline=10)
         # Fetch basic pokemon data from PokéAPI
-        async with self.bot.session.get(f"https://pokeapi.co/api/v2/pokemon/{pokemon}") as cs:
-            if cs.status == 404:
+        graph.add("pokemon", lambda: self.bot.pokeapi.get(f"pokemon/{pokemon}"), host="pokeapi.co")
+        # Fetch species data for description, gender, and evolution chain URL at the same time
+        # Forms like deoxys-attack don't have a species with the same name so this is optional
+        graph.add("species", lambda: self.bot.pokeapi.get(f"pokemon-species/{pokemon}"), optional=True)
+        graph.add("evolution", self.fetch_evolution_chain, after=["species"], optional=True)
+        results = await graph.run()
+
+        poke_data = results["pokemon"]
+        if poke_data is None:
+            suggestions = await self.bot.pokeapi.suggest(name)
+            if not suggestions:
                 return await ctx.send("Pokémon not found.")
-            poke_data = await cs.json()
-
-        # Fetch species data for description, gender, and evolution chain URL
-        async with self.bot.session.get(f"https://pokeapi.co/api/v2/pokemon-species/{pokemon}") as cs:
-            species_data = await cs.json()
+            return await ctx.send(f"Pokémon not found. Did you mean {', '.join(f'`{s}`' for s in suggestions)}?")
+        species_data = results["species"] or {}
 
         # Get English description from flavor text entries
         description = "No description available."
@@ -118,13 +149,10 @@ class Data(commands.Cog):
         height = f"{poke_data['height'] / 10:.1f} m"
         weight = f"{poke_data['weight'] / 10:.1f} kg"
 
-        # Fetch evolution chain
-        evo_url = species_data.get("evolution_chain", {}).get("url")
+        evo_data = results["evolution"]
         evolution_line = []
         current_stage_name = poke_data["name"]
-        if evo_url:
-            async with self.bot.session.get(evo_url) as cs:
-                evo_data = await cs.json()
+        if evo_data:
             # Walk the recursive chain structure
             chain = evo_data["chain"]
             while chain:
@@ -182,8 +210,7 @@ class Data(commands.Cog):
         The area defaults to `global` if not specified"""
         formatted_json = None
 
-        async with self.bot.session.get("https://api.covid19api.com/summary") as r:
-            fj = await r.json()
+        fj = await self.bot.web.get_json("https://api.covid19api.com/summary")
 
         if area is None:
             formatted_json = fj["Global"]
@@ -215,11 +242,8 @@ class Data(commands.Cog):
     @commands.command(aliases=["randomfact", "rf", " f"])
     async def fact(self, ctx):
         """Sends a random fact"""
-
-        async with self.bot.session.get("https://uselessfacts.jsph.pl/random.json?language=en") as resp:
-            fj = json.loads(await resp.text())
-
-        embed = discord.Embed(title="Random Fact", description=fj["text"], color=0x2F3136)
+        fact = await self.bot.prefetch.get("data.fact")
+        embed = discord.Embed(title="Random Fact", description=fact, color=0x2F3136)
         await ctx.send(embed=embed)
 
     @commands.command(description="See details about a movie")
@@ -230,9 +254,7 @@ class Data(commands.Cog):
         if not apikey:
             raise NoAPIKey
 
-        url = f"http://www.omdbapi.com/?apikey={apikey}&t={query}"
-        async with self.bot.session.get(url) as response:
-            fj = json.loads(await response.text())
+        fj = await self.bot.web.get_json("http://www.omdbapi.com/", params={"apikey": apikey, "t": query})
 
         if fj["Response"] == "True":
             embed = discord.Embed(title=fj["Title"], description=fj["Plot"], color=0x2F3136)
@@ -304,9 +326,7 @@ class Data(commands.Cog):
         except KeyError:
             raise NoAPIKey
 
-        url = f"https://gender-api.com/get"
-        async with self.bot.session.get(url, params={"name": "name", "key": api_key}) as r:
-            fj = json.loads(await r.text())
+        fj = await self.bot.web.get_json("https://gender-api.com/get", params={"name": name, "key": api_key})
 
         # Getting the gender and assigning color corresponding to the gender
         if fj["gender"] == "male":
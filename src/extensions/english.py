@@ -1,5 +1,3 @@
-import json
-
 import discord
 from discord.ext import commands
 
@@ -31,9 +29,7 @@ class English(commands.Cog):
             raise NoAPIKey
         # Doing the request
         heds = {"Authorization": f"Token {token}"}
-        async with self.bot.session.get(f"https://owlbot.info/api/v4/dictionary/{word}?format=json", headers=heds) as r:
-            text = await r.text()
-        fj = json.loads(text)
+        fj = await self.bot.web.get_json(f"https://owlbot.info/api/v4/dictionary/{word}?format=json", headers=heds)
         # Validation
         definitions = fj["definitions"]
         if len(definitions) == 0:
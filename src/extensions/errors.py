@@ -10,7 +10,14 @@ from discord.ext import commands
 from rich.console import Console
 from rich.traceback import Traceback
 
-from utils.errors import BlackListed, print_error
+from utils.errors import (
+    APIUnavailable,
+    BlackListed,
+    EffectBudgetExceeded,
+    ImageQueueFull,
+    QuotaExceeded,
+    print_error,
+)
 from utils.functions import format_name
 
 
@@ -159,6 +166,52 @@ class Errors(commands.Cog):
                 f"{self.bot.httpexception_codes[error.code]} ({error.code})"
             )
             raise error
+        elif isinstance(error, APIUnavailable):
+            # If a API we depend on is down then we tell the user to try again later
+            retry = f" in **{round(error.retry_after)}** seconds" if error.retry_after else " later"
+            await ctx.send(
+                embed=discord.Embed(
+                    title="Service Unavailable",
+                    description=f"`{error.host}` is not responding right now, please try again{retry}.",
+                    colour=0xFF0000,
+                )
+            )
+        elif isinstance(error, QuotaExceeded):
+            # If we used up the quota of a API then the command can't be used until it refills
+            await ctx.send(
+                embed=discord.Embed(
+                    title="Too Many Requests",
+                    description=(
+                        f"This command was used too much recently, please try again in "
+                        f"**{round(error.retry_after)}** seconds."
+                    ),
+                    colour=0xFF0000,
+                )
+            )
+        elif isinstance(error, ImageQueueFull):
+            # If too many images are waiting then we don't add more so the wait doesn't get longer and longer
+            await ctx.send(
+                embed=discord.Embed(
+                    title="Too Busy",
+                    description=(
+                        f"There are already **{error.waiting}** images waiting to be processed, "
+                        "please try again in a few seconds."
+                    ),
+                    colour=0xFF0000,
+                )
+            )
+        elif isinstance(error, EffectBudgetExceeded):
+            # If the effects take too long we stop them so one chain can't keep a worker busy
+            await ctx.send(
+                embed=discord.Embed(
+                    title="Too Many Effects",
+                    description=(
+                        f"Those effects took more than **{error.budget:g}** seconds to apply, "
+                        "please use less effects or a smaller image."
+                    ),
+                    colour=0xFF0000,
+                )
+            )
         elif isinstance(error, commands.CommandOnCooldown):
             # If the command is on cooldown then we send a message
             embed = discord.Embed(
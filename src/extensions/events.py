@@ -42,15 +42,8 @@ class Events(commands.Cog):
         embed.set_thumbnail(url=guild.icon.url if guild.icon else None)
         # We send the message to the bot owner
         await self.bot.owner.send(embed=embed)
-        # We add the prefix to our database
-        await self.bot.db.execute(
-            """
-            INSERT INTO guilds (id, prefix)
-            VALUES ($1, $2)
-            """,
-            guild.id,
-            ",",
-        )
+        # We add the prefix to our database and the prefix cache
+        await self.bot.ensure_guild(guild.id)
 
     @commands.Cog.listener()
     async def on_guild_remove(self, guild):
@@ -85,15 +78,16 @@ class Events(commands.Cog):
 
         # If the message had invoked a command and was deleted, we delete the response to that message
         # If the response was not found or deleted then we just ignore it
-        if message in self.bot.command_uses:
+        response = self.bot.command_uses.pop(message.id)
+        if response is not None:
             self.logger.info("A message with a command %s was deleted by %s" % (message.content, message.author))
             try:
-                await self.bot.command_uses[message].delete()
+                await response.delete()
             except discord.NotFound:
                 pass
 
-        # We add the message to our snipes dictionary,
-        self.bot.snipes[message.channel.id] = message
+        # We add the message to our snipes,
+        self.bot.snipes.add(message)
 
     @commands.Cog.listener()
     async def on_message_edit(self, before, after):
@@ -110,9 +104,13 @@ class Events(commands.Cog):
 
         # If the message had invoked a command and was edited, we delete the response
         # to that message and send a new response
-        if before in self.bot.command_uses:
+        response = self.bot.command_uses.pop(before.id)
+        if response is not None:
             self.logger.info("A message with a command %s was edited by %s" % (before.content, before.author))
-            await self.bot.command_uses[before].delete()
+            try:
+                await response.delete()
+            except discord.NotFound:
+                pass
             await self.bot.process_commands(after)
 
     @commands.Cog.listener()
@@ -137,7 +135,11 @@ class Events(commands.Cog):
         if not message.mentions:
             return
 
-        user_ids = [user.id for user in message.mentions]
+        # We only query the database if one of the mentioned users is afk according to our cache
+        user_ids = [user.id for user in message.mentions if user.id in self.bot.afk_users]
+        if not user_ids:
+            return
+
         afk_people = await self.bot.db.fetch(
             """
             SELECT *
@@ -146,6 +148,10 @@ class Events(commands.Cog):
             """,
             user_ids,
         )
+        # We update the cache in case the afk status was removed by another process
+        for user_id in user_ids:
+            self.bot.afk_users.pop(user_id, None)
+        self.bot.afk_users.update({record["user_id"]: record for record in afk_people})
 
         # If the list is empty then we don't do anything
         if not afk_people:
@@ -169,16 +175,9 @@ class Events(commands.Cog):
             or len(new.guild.members) < 500  # The server is a big server
         ):
             return
+        # This is saved to the database in bulk by the last seen writer
         time_now = datetime.datetime.now(datetime.timezone.utc)
-        await self.bot.db.execute(
-            """
-            INSERT INTO status (last_seen, user_id)
-            VALUES ($1, $2)
-            ON CONFLICT (user_id) DO UPDATE SET last_seen = EXCLUDED.last_seen;
-            """,
-            time_now,
-            new.id,
-        )
+        self.bot.last_seen_writer.add(new.id, time_now)
 
 
 async def setup(bot):
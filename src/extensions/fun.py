@@ -1,9 +1,8 @@
 import asyncio
 import datetime
-import json
 import random
 import unicodedata
-from typing import Union
+from typing import Optional, Union
 
 import discord
 from discord.ext import commands
@@ -26,6 +25,33 @@ class Fun(commands.Cog):
         self.bot = bot
         self.rickroll = read_file("assets/data/rickroll.txt")
 
+    async def cog_load(self):
+        # These are fetched in the background so the commands can reply instantly
+        # adviceslip returns the same advice for 2 seconds so we wait longer than that between fetches
+        self.bot.prefetch.add("fun.advice", self.fetch_advice, interval=2.5)
+        self.bot.prefetch.add("fun.topic", self.fetch_topic)
+        self.bot.prefetch.add("fun.meme", self.fetch_meme)
+
+    async def cog_unload(self):
+        for name in ("fun.advice", "fun.topic", "fun.meme"):
+            self.bot.prefetch.remove(name)
+
+    async def fetch_advice(self):
+        """Returns a random advice"""
+        resp = await self.bot.web.get_json("https://api.adviceslip.com/advice")
+        return resp["slip"]["advice"]
+
+    async def fetch_topic(self):
+        """Returns a random topic"""
+        resp = await self.bot.web.get_json("https://dinosaur.ml/random/topic/")
+        return resp["topic"]
+
+    async def fetch_meme(self):
+        """Returns the title, link and image of a random meme"""
+        # I know I can use the reddit api but I did this like a long time ago and I am too lazy to fix it
+        fj = await self.bot.web.get_json("https://meme-api.herokuapp.com/gimme")
+        return fj["title"], fj["postLink"], fj["url"]
+
     @commands.command(
         aliases=["randomuser", "randomdude", "randomperson", "ruser", "rdude", "rperson", "randomidentity"]
     )
@@ -144,19 +170,24 @@ class Fun(commands.Cog):
 
     @commands.command()
     @commands.guild_only()
-    async def snipe(self, ctx, channel: discord.TextChannel = None):
-        """Sends the last deleted message in the channel, can be unavailable"""
+    async def snipe(self, ctx, channel: Optional[discord.TextChannel] = None, index: int = 1):
+        """Sends a recently deleted message in the channel, can be unavailable
+
+        Use the index to get older messages, 1 is the last deleted message, 2 is the one before that and so on
+        """
         # We get the info
         channel = channel or ctx.channel
-        snipes = self.bot.snipes
+        message = self.bot.snipes.get(channel.id, index - 1)
 
         # If there isn't any sniped messages we notify the user
-        if not snipes.get(channel.id):
-            return await ctx.send("No messages to snipe")
+        if message is None:
+            count = self.bot.snipes.count(channel.id)
+            if not count:
+                return await ctx.send("No messages to snipe")
+            return await ctx.send(f"There are only {count} messages to snipe")
 
         # We get the info
-        message = snipes[channel.id]
-        author = message.author
+        author = ctx.guild.get_member(message.author_id) or self.bot.get_user(message.author_id)
 
         # We make the embed
         embed = discord.Embed(
@@ -165,11 +196,15 @@ class Fun(commands.Cog):
             timestamp=message.created_at,
             color=discord.Colour.green(),
         )
-        # We set the thumbnail
-        embed.set_thumbnail(url=author.display_avatar.url)
-        # We set the name
-        name = f"{author} ({author.display_name})" if author.nick else author.name
-        embed.set_author(icon_url=author.display_avatar.url, name=name)
+        if message.attachments:
+            embed.add_field(name="Attachments", value="\n".join(message.attachments)[:1024])
+        # We set the thumbnail and the name
+        if author is None:
+            embed.set_author(name=f"Unknown User ({message.author_id})")
+        else:
+            embed.set_thumbnail(url=author.display_avatar.url)
+            name = f"{author} ({author.display_name})" if getattr(author, "nick", None) else author.name
+            embed.set_author(icon_url=author.display_avatar.url, name=name)
         # We send the message
         await ctx.send(embed=embed)
 
@@ -224,16 +259,14 @@ class Fun(commands.Cog):
     @commands.command()
     async def advice(self, ctx):
         """Gives a random advice"""
-        async with self.bot.session.get("https://api.adviceslip.com/advice") as r:
-            resp = json.loads(await r.text())
-            await ctx.send(embed=discord.Embed(title="Advice", description=resp["slip"]["advice"], color=0x2F3136))
+        advice = await self.bot.prefetch.get("fun.advice")
+        await ctx.send(embed=discord.Embed(title="Advice", description=advice, color=0x2F3136))
 
     @commands.command()
     async def topic(self, ctx):
         """Gives a random topic to discuss"""
-        async with self.bot.session.get("https://dinosaur.ml/random/topic/") as r:
-            resp = await r.json()
-            await ctx.send(discord.Embed(title="Topic", description=resp["topic"], color=0x2F3136))
+        topic = await self.bot.prefetch.get("fun.topic")
+        await ctx.send(embed=discord.Embed(title="Topic", description=topic, color=0x2F3136))
 
     @commands.command(aliases=["bsm", "bsmap", "map"])
     @commands.cooldown(1, 2, commands.BucketType.default)
@@ -310,11 +343,9 @@ class Fun(commands.Cog):
     @commands.command(aliases=["mem"])
     async def meme(self, ctx):
         """Sends a random meme"""
-        # I know I can use the reddit api but I did this like a long time ago and I am too lazy to fix it
-        async with self.bot.session.get("https://meme-api.herokuapp.com/gimme") as r:
-            fj = json.loads(await r.text())
-        embed = discord.Embed(title=fj["title"], url=fj["postLink"], color=0xFF5700)
-        embed.set_image(url=fj["url"])
+        title, link, image = await self.bot.prefetch.get("fun.meme")
+        embed = discord.Embed(title=title, url=link, color=0xFF5700)
+        embed.set_image(url=image)
         await ctx.send(embed=embed)
 
     @commands.command(aliases=["rps"])
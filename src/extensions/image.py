@@ -1,3 +1,5 @@
+import contextlib
+import functools
 import io
 import typing
 
@@ -5,7 +7,9 @@ import asyncdagpi
 import discord
 from discord.ext import commands
 
-from utils.functions import executor_function, get_image, get_random_color
+from utils.converters import CustomLiteral
+from utils.effects import EFFECTS, MAX_CHAIN, ImageEffects
+from utils.functions import get_image, get_random_color
 
 
 class Image(commands.Cog):
@@ -14,6 +18,8 @@ class Image(commands.Cog):
 
     def __init__(self, bot):
         self.bot = bot
+        # The simple effects are rendered here instead of by dagpi, dagpi is only a fallback for them
+        self.effects = ImageEffects(bot.images, bot.image_pool, bot.dagpi, cache=bot.renders)
 
     @commands.command(aliases=["qr"], extras={"image": ""})
     async def qrcode(self, ctx, text):
@@ -29,22 +35,50 @@ class Image(commands.Cog):
                 file=discord.File(io.BytesIO(resp), filename="qr.png"),
             )
 
-    @executor_function
-    def rounden(self, img, ellipse: tuple):
-        from PIL import Image, ImageDraw, ImageOps
-
-        size = (1024, 1024)
-        mask = Image.new("L", size, 255)
-        draw = ImageDraw.Draw(mask)
-        draw.ellipse(ellipse + size, fill=0)
-        img = Image.open(img)
-        output = ImageOps.fit(img, mask.size, centering=(0.5, 0.5))
-        output.putalpha(500)
-        output.paste(0, mask=mask)
-        output.convert("P", palette=Image.ADAPTIVE)
-        buffer = io.BytesIO()
-        output.save(buffer, format="png")
-        return discord.File(io.BytesIO(buffer.getvalue()), "circular.png")
+    async def render(self, ctx, name: str, url: str, **kwargs) -> discord.File:
+        """Applies a effect to a image, telling the user their position in the queue if they have to wait"""
+        return await self.run_queued(ctx, functools.partial(self.effects.process, name, url, **kwargs))
+
+    async def run_queued(self, ctx, process) -> discord.File:
+        """Runs a method of ImageEffects, telling the user their position in the queue if they have to wait"""
+        message = None
+
+        async def queued(position):
+            nonlocal message
+            message = await ctx.send(f"Your image is **#{position}** in the queue, it will be sent soon")
+
+        try:
+            image, fmt = await process(on_queued=queued)
+        finally:
+            if message is not None:
+                with contextlib.suppress(discord.HTTPException):
+                    await message.delete()
+        return discord.File(image, f"{ctx.command.name}.{fmt}")
+
+    @commands.command(aliases=["pipeline"])
+    @commands.cooldown(1, 15, commands.BucketType.user)
+    async def chain(
+        self,
+        ctx,
+        # Shortened names are not allowed so a short member name after the effects isn't taken as a effect
+        effects: commands.Greedy[CustomLiteral(*EFFECTS, exact=True)],
+        member: typing.Union[discord.Emoji, discord.PartialEmoji, discord.Member, str] = None,
+    ):
+        """Applies several effects one after the other, eg. `chain pixel invert rounden @user`
+
+        The image is only processed once for all the effects so it is faster than using the commands one by one.
+        The effects that can be chained are invert, pixel, sobel, triangle, colors, communism, america, wasted,
+        magik, paint and rounden
+        """
+        if not effects:
+            return await ctx.send(f"Give between 1 and {MAX_CHAIN} effects, eg. `{ctx.clean_prefix}chain pixel invert`")
+        url = await get_image(ctx, member)
+
+        names = [name.lower() for name in effects]
+        file = await self.run_queued(ctx, functools.partial(self.effects.chain, names, str(url)))
+        em = discord.Embed(color=get_random_color(), description=" → ".join(names))
+        em.set_image(url=f"attachment://{file.filename}")
+        await ctx.send(file=file, embed=em)
 
     @commands.command(name="rounden", aliases=["circle", "round", "circular"])
     @commands.cooldown(1, 15, commands.BucketType.user)
@@ -55,12 +89,10 @@ class Image(commands.Cog):
     ):
         url = await get_image(ctx, member)
 
-        img = await self.bot.session.get(str(url))
-        img = await img.read()
-        res = await self.rounden(io.BytesIO(img), (0, 0))
+        file = await self.render(ctx, "rounden", str(url))
         em = discord.Embed(color=get_random_color())
-        em.set_image(url="attachment://circular.png")
-        await ctx.send(file=res, embed=em)
+        em.set_image(url=f"attachment://{file.filename}")
+        await ctx.send(file=file, embed=em)
 
     @commands.command()
     @commands.cooldown(1, 10, commands.BucketType.user)
@@ -71,10 +103,9 @@ class Image(commands.Cog):
     ):
         url = await get_image(ctx, member)
 
-        img = await self.bot.dagpi.image_process(asyncdagpi.ImageFeatures.pixel(), url=str(url))
-        file = discord.File(img.image, f"{ctx.command.name}.png")
+        file = await self.render(ctx, "pixel", str(url))
         em = discord.Embed(color=get_random_color())
-        em.set_image(url=f"attachment://{ctx.command.name}.png")
+        em.set_image(url=f"attachment://{file.filename}")
         await ctx.send(file=file, embed=em)
 
     @commands.command(aliases=["amhu"])
@@ -133,10 +164,9 @@ class Image(commands.Cog):
     ):
         url = await get_image(ctx, member)
 
-        img = await self.bot.dagpi.image_process(asyncdagpi.ImageFeatures.america(), url=str(url))
-        file = discord.File(img.image, f"{ctx.command.name}.png")
+        file = await self.render(ctx, "america", str(url))
         em = discord.Embed(color=get_random_color())
-        em.set_image(url=f"attachment://{ctx.command.name}.png")
+        em.set_image(url=f"attachment://{file.filename}")
         await ctx.send(file=file, embed=em)
 
     @commands.command()
@@ -163,10 +193,9 @@ class Image(commands.Cog):
     ):
         url = await get_image(ctx, member)
 
-        img = await self.bot.dagpi.image_process(asyncdagpi.ImageFeatures.colors(), url=str(url))
-        file = discord.File(img.image, f"{ctx.command.name}.gif")
+        file = await self.render(ctx, "colors", str(url))
         em = discord.Embed(color=get_random_color())
-        em.set_image(url=f"attachment://{ctx.command.name}.gif")
+        em.set_image(url=f"attachment://{file.filename}")
         await ctx.send(file=file, embed=em)
 
     @commands.command()
@@ -178,10 +207,9 @@ class Image(commands.Cog):
     ):
         url = await get_image(ctx, member)
 
-        img = await self.bot.dagpi.image_process(asyncdagpi.ImageFeatures.communism(), url=str(url))
-        file = discord.File(img.image, f"{ctx.command.name}.gif")
+        file = await self.render(ctx, "communism", str(url))
         em = discord.Embed(color=get_random_color())
-        em.set_image(url=f"attachment://{ctx.command.name}.gif")
+        em.set_image(url=f"attachment://{file.filename}")
         await ctx.send(file=file, embed=em)
 
     @commands.command()
@@ -193,10 +221,9 @@ class Image(commands.Cog):
     ):
         url = await get_image(ctx, member)
 
-        img = await self.bot.dagpi.image_process(asyncdagpi.ImageFeatures.wasted(), url=str(url))
-        file = discord.File(img.image, f"{ctx.command.name}.png")
+        file = await self.render(ctx, "wasted", str(url))
         em = discord.Embed(color=get_random_color())
-        em.set_image(url=f"attachment://{ctx.command.name}.png")
+        em.set_image(url=f"attachment://{file.filename}")
         await ctx.send(file=file, embed=em)
 
     @commands.command()
@@ -246,10 +273,9 @@ class Image(commands.Cog):
     ):
         url = await get_image(ctx, member)
 
-        img = await self.bot.dagpi.image_process(asyncdagpi.ImageFeatures.invert(), url=str(url))
-        file = discord.File(img.image, f"{ctx.command.name}.png")
+        file = await self.render(ctx, "invert", str(url))
         em = discord.Embed(color=get_random_color())
-        em.set_image(url=f"attachment://{ctx.command.name}.png")
+        em.set_image(url=f"attachment://{file.filename}")
         await ctx.send(file=file, embed=em)
 
     @commands.command()
@@ -276,10 +302,9 @@ class Image(commands.Cog):
     ):
         url = await get_image(ctx, member)
 
-        img = await self.bot.dagpi.image_process(asyncdagpi.ImageFeatures.sobel(), url=str(url))
-        file = discord.File(img.image, f"{ctx.command.name}.png")
+        file = await self.render(ctx, "sobel", str(url))
         em = discord.Embed(color=get_random_color())
-        em.set_image(url=f"attachment://{ctx.command.name}.png")
+        em.set_image(url=f"attachment://{file.filename}")
         await ctx.send(file=file, embed=em)
 
     @commands.command()
@@ -291,10 +316,9 @@ class Image(commands.Cog):
     ):
         url = await get_image(ctx, member)
 
-        img = await self.bot.dagpi.image_process(asyncdagpi.ImageFeatures.triangle(), url=str(url))
-        file = discord.File(img.image, f"{ctx.command.name}.png")
+        file = await self.render(ctx, "triangle", str(url))
         em = discord.Embed(color=get_random_color())
-        em.set_image(url=f"attachment://{ctx.command.name}.png")
+        em.set_image(url=f"attachment://{file.filename}")
         await ctx.send(file=file, embed=em)
 
     @commands.command()
@@ -306,10 +330,9 @@ class Image(commands.Cog):
     ):
         url = await get_image(ctx, member)
 
-        img = await self.bot.dagpi.image_process(asyncdagpi.ImageFeatures.angel(), url=str(url))
-        file = discord.File(img.image, f"{ctx.command.name}.png")
+        file = await self.render(ctx, "angel", str(url))
         em = discord.Embed(color=get_random_color())
-        em.set_image(url=f"attachment://{ctx.command.name}.png")
+        em.set_image(url=f"attachment://{file.filename}")
         await ctx.send(file=file, embed=em)
 
     @commands.command(aliases=["s8n"])
@@ -321,10 +344,9 @@ class Image(commands.Cog):
     ):
         url = await get_image(ctx, member)
 
-        img = await self.bot.dagpi.image_process(asyncdagpi.ImageFeatures.satan(), url=str(url))
-        file = discord.File(img.image, f"{ctx.command.name}.png")
+        file = await self.render(ctx, "satan", str(url))
         em = discord.Embed(color=get_random_color())
-        em.set_image(url=f"attachment://{ctx.command.name}.png")
+        em.set_image(url=f"attachment://{file.filename}")
         await ctx.send(file=file, embed=em)
 
     @commands.command()
@@ -336,10 +358,9 @@ class Image(commands.Cog):
     ):
         url = await get_image(ctx, member)
 
-        img = await self.bot.dagpi.image_process(asyncdagpi.ImageFeatures.delete(), url=str(url))
-        file = discord.File(img.image, f"{ctx.command.name}.png")
+        file = await self.render(ctx, "delete", str(url))
         em = discord.Embed(color=get_random_color())
-        em.set_image(url=f"attachment://{ctx.command.name}.png")
+        em.set_image(url=f"attachment://{file.filename}")
         await ctx.send(file=file, embed=em)
 
     @commands.command()
@@ -351,10 +372,9 @@ class Image(commands.Cog):
     ):
         url = await get_image(ctx, member)
 
-        img = await self.bot.dagpi.image_process(asyncdagpi.ImageFeatures.fedora(), url=str(url))
-        file = discord.File(img.image, f"{ctx.command.name}.png")
+        file = await self.render(ctx, "fedora", str(url))
         em = discord.Embed(color=get_random_color())
-        em.set_image(url=f"attachment://{ctx.command.name}.png")
+        em.set_image(url=f"attachment://{file.filename}")
         await ctx.send(file=file, embed=em)
 
     @commands.command(aliases=["hitler", "wth"])
@@ -366,10 +386,9 @@ class Image(commands.Cog):
     ):
         url = await get_image(ctx, member)
 
-        img = await self.bot.dagpi.image_process(asyncdagpi.ImageFeatures.hitler(), url=str(url))
-        file = discord.File(img.image, f"{ctx.command.name}.png")
+        file = await self.render(ctx, "hitler", str(url))
         em = discord.Embed(color=get_random_color())
-        em.set_image(url=f"attachment://{ctx.command.name}.png")
+        em.set_image(url=f"attachment://{file.filename}")
         await ctx.send(file=file, embed=em)
 
     @commands.command()
@@ -381,10 +400,9 @@ class Image(commands.Cog):
     ):
         url = await get_image(ctx, member)
 
-        img = await self.bot.dagpi.image_process(asyncdagpi.ImageFeatures.wanted(), url=str(url))
-        file = discord.File(img.image, f"{ctx.command.name}.png")
+        file = await self.render(ctx, "wanted", str(url))
         em = discord.Embed(color=get_random_color())
-        em.set_image(url=f"attachment://{ctx.command.name}.png")
+        em.set_image(url=f"attachment://{file.filename}")
         await ctx.send(file=file, embed=em)
 
     @commands.command(aliases=["ytcomment"])
@@ -424,26 +442,11 @@ class Image(commands.Cog):
         ctx,
         member: typing.Union[discord.Emoji, discord.PartialEmoji, discord.Member, str] = None,
     ):
-        if member is None:
-            if ctx.message.attachments:
-                if (
-                    ctx.message.attachments[0].url.endswith("png")
-                    or ctx.message.attachments[0].url.endswith("jpg")
-                    or ctx.message.attachments[0].url.endswith("jpeg")
-                    or ctx.message.attachments[0].url.endswith("webp")
-                ):
-                    url = ctx.message.attachments[0].proxy_url or ctx.message.attachments[0].url
-                else:
-                    url = ctx.author.display_avatar.with_format("png")
-            else:
-                url = ctx.author.display_avatar.with_format("png")
-        else:
-            url = member.display_avatar.with_format("png")
-
-            img = await self.bot.dagpi.image_process(asyncdagpi.ImageFeatures.jail(), url=str(url))
-            file = discord.File(img.image, f"{ctx.command.name}.png")
-            em = discord.Embed(color=get_random_color())
-            em.set_image(url=f"attachment://{ctx.command.name}.png")
+        url = await get_image(ctx, member)
+
+        file = await self.render(ctx, "jail", str(url))
+        em = discord.Embed(color=get_random_color())
+        em.set_image(url=f"attachment://{file.filename}")
         await ctx.send(file=file, embed=em)
 
     @commands.command()
@@ -456,10 +459,9 @@ class Image(commands.Cog):
     ):
         url = await get_image(ctx, member)
 
-        img = await self.bot.dagpi.image_process(asyncdagpi.ImageFeatures.pride(), url=str(url), flag=flag)
-        file = discord.File(img.image, f"{ctx.command.name}.png")
+        file = await self.render(ctx, "pride", str(url), flag=flag)
         em = discord.Embed(color=get_random_color())
-        em.set_image(url=f"attachment://{ctx.command.name}.png")
+        em.set_image(url=f"attachment://{file.filename}")
         await ctx.send(file=file, embed=em)
 
     @commands.command()
@@ -471,10 +473,9 @@ class Image(commands.Cog):
     ):
         url = await get_image(ctx, member)
 
-        img = await self.bot.dagpi.image_process(asyncdagpi.ImageFeatures.trash(), url=str(url))
-        file = discord.File(img.image, f"{ctx.command.name}.png")
+        file = await self.render(ctx, "trash", str(url))
         em = discord.Embed(color=get_random_color())
-        em.set_image(url=f"attachment://{ctx.command.name}.png")
+        em.set_image(url=f"attachment://{file.filename}")
         await ctx.send(file=file, embed=em)
 
     @commands.command()
@@ -486,10 +487,9 @@ class Image(commands.Cog):
     ):
         url = await get_image(ctx, member)
 
-        img = await self.bot.dagpi.image_process(asyncdagpi.ImageFeatures.magik(), url=str(url))
-        file = discord.File(img.image, f"{ctx.command.name}.png")
+        file = await self.render(ctx, "magik", str(url))
         em = discord.Embed(color=get_random_color())
-        em.set_image(url=f"attachment://{ctx.command.name}.png")
+        em.set_image(url=f"attachment://{file.filename}")
         await ctx.send(file=file, embed=em)
 
     @commands.command()
@@ -501,10 +501,9 @@ class Image(commands.Cog):
     ):
         url = await get_image(ctx, member)
 
-        img = await self.bot.dagpi.image_process(asyncdagpi.ImageFeatures.paint(), url=str(url))
-        file = discord.File(img.image, f"{ctx.command.name}.png")
+        file = await self.render(ctx, "paint", str(url))
         em = discord.Embed(color=get_random_color())
-        em.set_image(url=f"attachment://{ctx.command.name}.png")
+        em.set_image(url=f"attachment://{file.filename}")
         await ctx.send(file=file, embed=em)
 
     @commands.command()
@@ -527,8 +526,7 @@ class Image(commands.Cog):
     @commands.cooldown(1, 5, commands.BucketType.user)
     async def clyde(self, ctx, *, message):
 
-        res = await self.bot.session.get(f"https://nekobot.xyz/api/imagegen?type=clyde", params={"text": message})
-        res = await res.json()
+        res = await self.bot.web.get_json(f"https://nekobot.xyz/api/imagegen?type=clyde", params={"text": message})
         res = res["message"]
         em = discord.Embed(color=get_random_color())
         em.set_image(url=res)
@@ -543,8 +541,7 @@ class Image(commands.Cog):
     ):
         url = await get_image(ctx, member)
 
-        res = await self.bot.session.get(f"https://nekobot.xyz/api/imagegen?type=stickbug&url={url}")
-        res = await res.json()
+        res = await self.bot.web.get_json(f"https://nekobot.xyz/api/imagegen?type=stickbug&url={url}")
         res = res["message"]
         img = await self.bot.session.get(res)
         img = await img.read()
@@ -558,10 +555,9 @@ class Image(commands.Cog):
     async def changemymind(self, ctx, *, message):
         message = message.replace(" ", "%20")
 
-        res = await self.bot.session.get(
+        res = await self.bot.web.get_json(
             f"https://nekobot.xyz/api/imagegen?type=changemymind", params={"text": message}
         )
-        res = await res.json()
         res = res["message"]
         em = discord.Embed(color=get_random_color())
         em.set_image(url=res)
@@ -571,11 +567,10 @@ class Image(commands.Cog):
     @commands.cooldown(1, 5, commands.BucketType.user)
     async def phcomment(self, ctx, member: discord.Member, *, message):
 
-        res = await self.bot.session.get(
+        res = await self.bot.web.get_json(
             f"https://nekobot.xyz/api/imagegen?type=phcomment&image={member.display_avatar.with_format('png')}&username={member.display_name}",
             params={"text": message},
         )
-        res = await res.json()
         res = res["message"]
         em = discord.Embed(color=get_random_color())
         em.set_image(url=res)
@@ -590,8 +585,7 @@ class Image(commands.Cog):
     ):
         url = await get_image(ctx, member)
 
-        res = await self.bot.session.get(f"https://nekobot.xyz/api/imagegen?type=iphonex&url={url}")
-        res = await res.json()
+        res = await self.bot.web.get_json(f"https://nekobot.xyz/api/imagegen?type=iphonex&url={url}")
         image = res["message"]
         em = discord.Embed(color=get_random_color())
         em.set_image(url=image)
@@ -606,8 +600,7 @@ class Image(commands.Cog):
     ):
         url = await get_image(ctx, member)
 
-        res = await self.bot.session.get(f"https://nekobot.xyz/api/imagegen?type=jpeg&url={url}")
-        res = await res.json()
+        res = await self.bot.web.get_json(f"https://nekobot.xyz/api/imagegen?type=jpeg&url={url}")
         image = res["message"]
         em = discord.Embed(color=get_random_color())
         em.set_image(url=image)
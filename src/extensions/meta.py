@@ -267,7 +267,7 @@ class Meta(commands.Cog):
             "```"
         )
 
-    @commands.command(aliases=["p"], description="Shows the bot's speed")
+    @commands.command(aliases=["p"], description="Shows the bot's speed", extras={"typing": False})
     async def ping(self, ctx):
         start = time.time()
         embed = discord.Embed(
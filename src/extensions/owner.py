@@ -1,13 +1,17 @@
 import ast
+import asyncio
 import io
 import pprint
 import textwrap
 import traceback
 
 import discord
+import humanize
 from discord.ext import commands
+from tabulate import tabulate
 
 import utils
+from utils import effects
 from utils.converters import CodeblockConverter
 from utils.functions import get_agreement
 from utils.paginator import Paginator
@@ -100,12 +104,13 @@ class Owner(commands.Cog):
             """,
             user.id,
         )
+        await self.bot.publish_block(user.id, True)
         await ctx.send("Done")
 
     @blockfrombot.command(name="remove", aliases=["r", "delete", "d"])
     async def blockfrombot_remove(self, ctx, user: discord.User):
         """Deletes the specified user from the bot's blocked users."""
-        user = await self.bot.db.fetchrow(
+        record = await self.bot.db.fetchrow(
             """
             DELETE FROM blocks
             WHERE user_id=$1
@@ -113,8 +118,9 @@ class Owner(commands.Cog):
             """,
             user.id,
         )
-        if not user:
+        if not record:
             return await ctx.send("He was not blocked")
+        await self.bot.publish_block(user.id, False)
         await ctx.send("Done")
 
     @blockfrombot.command(name="list", aliases=["all", "l"])
@@ -143,6 +149,125 @@ class Owner(commands.Cog):
             )
         )
 
+    @commands.command(aliases=["apiusage"])
+    @commands.is_owner()
+    async def quotas(self, ctx):
+        """Shows how much of the quota of each API was used and how much is left"""
+        rows = [
+            (
+                name,
+                f"{stats['limit']}/{humanize.naturaldelta(stats['period'])}",
+                stats["headroom"],
+                "?" if stats["remote_remaining"] is None else stats["remote_remaining"],
+                stats["used"],
+                stats["queued"],
+                stats["shed"],
+            )
+            for name, stats in self.bot.quotas.stats.items()
+        ]
+        tabular = tabulate(
+            rows, headers=["API", "Limit", "Headroom", "Remaining", "Used", "Queued", "Shed"], tablefmt="simple"
+        )
+        await ctx.send(f"```\n{tabular}\n```")
+
+    @commands.command(aliases=["prefetchstats"])
+    @commands.is_owner()
+    async def prefetch(self, ctx):
+        """Shows the hit rate and refill lag of the prefetched results of the random content commands"""
+        rows = [
+            (
+                name,
+                f"{stats['ready']}/{stats['size']}",
+                f"{stats['hit_rate']:.0%}",
+                stats["misses"],
+                f"{stats['average_refill_lag']:.2f}s",
+                stats["failures"],
+            )
+            for name, stats in self.bot.prefetch.stats.items()
+        ]
+        tabular = tabulate(rows, headers=["Pool", "Ready", "Hit Rate", "Misses", "Refill Lag", "Failures"])
+        await ctx.send(f"```\n{tabular}\n```")
+
+    @commands.command(aliases=["redditstats"])
+    @commands.is_owner()
+    async def redditcache(self, ctx):
+        """Shows how many subreddit listings were served from the cache"""
+        cog = self.bot.get_cog("Reddit")
+        if cog is None:
+            return await ctx.send("The Reddit cog is not loaded")
+        tabular = tabulate(cog.listings.stats.items(), headers=["Stat", "Value"])
+        await ctx.send(f"```\n{tabular}\n```")
+
+    @commands.command(aliases=["imageworkers"])
+    @commands.is_owner()
+    async def imagepool(self, ctx):
+        """Shows how busy the image worker processes are and how long the images wait and take"""
+        stats = self.bot.image_pool.stats
+        rows = [
+            ("Workers", f"{stats['running']}/{stats['workers']} busy"),
+            ("Waiting", f"{stats['waiting']}/{stats['max_queue']}"),
+            ("Jobs", stats["jobs"]),
+            ("Failures", stats["failures"]),
+            ("Had to Wait", stats["queued"]),
+            ("Rejected", stats["rejected"]),
+            ("Restarts", stats["restarts"]),
+            ("Average Wait", f"{stats['average_wait'] * 1000:.0f}ms"),
+            ("Longest Wait", f"{stats['max_wait'] * 1000:.0f}ms"),
+            ("Average CPU Time", f"{stats['average_cpu'] * 1000:.0f}ms"),
+            ("Average Run Time", f"{stats['average_run'] * 1000:.0f}ms"),
+        ]
+        await ctx.send(f"```\n{tabulate(rows)}\n```")
+
+    @commands.command(aliases=["imagecachestats"])
+    @commands.is_owner()
+    async def imagecache(self, ctx):
+        """Shows how many of the images used by the image commands were downloaded and how many were cached"""
+        stats = self.bot.images.stats
+        stats["bytes"] = f"{humanize.naturalsize(stats['bytes'])}/{humanize.naturalsize(stats.pop('max_bytes'))}"
+        await ctx.send(f"```\n{tabulate(stats.items(), headers=['Stat', 'Value'])}\n```")
+
+    @commands.command(aliases=["renderstats"])
+    @commands.is_owner()
+    async def rendercache(self, ctx):
+        """Shows how often the results of each image effect were cached and how much time that saved"""
+        stats = self.bot.renders.stats
+        if not stats:
+            return await ctx.send("No image effects were used yet")
+        rows = [
+            (
+                name,
+                f"{effect['hits']} ({effect['disk_hits']} from disk)",
+                effect["misses"],
+                f"{effect['hit_ratio']:.0%}",
+                f"{effect['cpu_saved']:.2f}s",
+                f"{effect['seconds_saved']:.2f}s",
+            )
+            for name, effect in stats.items()
+        ]
+        tabular = tabulate(rows, headers=["Effect", "Hits", "Misses", "Hit Ratio", "CPU Saved", "Time Saved"])
+        images, memory, disk = self.bot.renders.size
+        size = f"{images} images using {humanize.naturalsize(memory)} in memory"
+        if disk is not None:
+            size += f" and {humanize.naturalsize(disk)} on disk"
+        await ctx.send(f"{size}\n```\n{tabular}\n```")
+
+    @commands.command(aliases=["effectsbench"])
+    @commands.is_owner()
+    async def effectbench(self, ctx, size: int = 512):
+        """Measures how long each local image effect takes to render on a test image"""
+        results = await asyncio.to_thread(effects.benchmark, size)
+        tabular = tabulate(results, headers=["Effect", "Fastest", "Average", "With Encoding"], floatfmt=".1f")
+        await ctx.send(f"All times are in milliseconds\n```\n{tabular}\n```")
+
+    @commands.command(aliases=["pokepreload"])
+    @commands.is_owner()
+    async def pokedex_preload(self, ctx):
+        """Downloads every pokemon, species and evolution chain that is not cached yet so pokedex doesn't have to"""
+        await ctx.send("Preloading the pokemon, this can take a few minutes")
+        fetched, failed = await self.bot.pokeapi.preload()
+        failures = f", {failed} could not be downloaded and will be tried again next time" if failed else ""
+        await ctx.send(f"Done, {fetched} resources were downloaded{failures}")
+
     @commands.command(aliases=["rein"])
     async def reinvoke(self, ctx, message: discord.Message = None):
         """Re-invokes the command gotten from the message
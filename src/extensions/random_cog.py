@@ -89,7 +89,7 @@ class Random(commands.Cog):
         ]
         await ctx.send(f"`Question:` {question}\n`Answer:` {random.choice(answers)}")
 
-    @commands.command(aliases=["pick", "choice", "ch"])
+    @commands.command(aliases=["pick", "choice", "ch"], extras={"typing": False})
     async def choose(self, ctx, *, choices):
         """Chooses a random item from a list of items."""
         # We split it by comma and a comma followed by a space
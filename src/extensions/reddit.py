@@ -1,15 +1,21 @@
-import random
 from datetime import datetime, timezone
 
 import discord
 from discord.ext import commands
 
+from utils.reddit import BASE_URL, RedditListings
+
 
 class Reddit(commands.Cog):
     """Needs to be worked upon"""
 
     def __init__(self, bot):
         self.bot = bot
+        # Listings are kept for a while so popular subreddits don't make a request every time
+        self.listings = RedditListings(bot.web)
+
+    async def cog_unload(self):
+        self.listings.stop()
 
     @commands.command(name="subreddit", aliases=["sr"])
     async def _subreddit(self, ctx, subreddit, post_filter=None):
@@ -20,50 +26,35 @@ class Reddit(commands.Cog):
         `subreddit r/memes hot`
 
         """
-        # We format the subreddit name
-        if not "r/" in subreddit:
-            subreddit = "r/" + subreddit
-        if len(subreddit.lstrip("r/")) > 21:
+        name = self.listings.normalize(subreddit)
+        if not name or len(name) > 21:
             return await ctx.send("Invalid subreddit")
-
-        base = "https://www.reddit.com/"
-        # We generate the url
-        if post_filter is None:
-            url = f"{base}{subreddit}.json"
-        elif post_filter in ("hot", "top"):
-            url = f"{base}{subreddit}/{post_filter}.json"
-        else:
+        if post_filter not in (None, "hot", "top"):
             return await ctx.send("Invalid post filter")
 
-        async with self.bot.session.get(url, allow_redirects=True) as resp:
-            response = await resp.json()
-
-        # The reason key is only present in errors
-        if response.get("reason"):
-            return await ctx.send(response["reason"])
-
-        data = response["data"]["children"]
         # If this not a nsfw channel then we only pick posts that are not marked nsfw
-        if ctx.guild and not ctx.channel.is_nsfw():
-            data = [i for i in data if not i["data"]["over_18"]]
-        # We pick a random post
-        post = random.choice(data)["data"]
+        nsfw = not ctx.guild or ctx.channel.is_nsfw()
+        listing, post = await self.listings.random_post(name, post_filter, channel_id=ctx.channel.id, nsfw=nsfw)
+        if listing.reason is not None:
+            return await ctx.send(listing.reason)
+        if post is None:
+            return await ctx.send("There are no posts that can be sent here")
 
         embed = discord.Embed(
-            title=post["title"],
-            description=post["selftext"],
-            timestamp=datetime.fromtimestamp(post["created"], tz=timezone.utc),
-            url=base + post["permalink"],
+            title=post.title,
+            description=post.selftext,
+            timestamp=datetime.fromtimestamp(post.created, tz=timezone.utc),
+            url=BASE_URL + post.permalink.lstrip("/"),
             color=0xFF5700,
         )
-        if (url := post.get("url_overridden_by_dest")) is not None:
-            embed.set_image(url=url)
+        if post.image is not None:
+            embed.set_image(url=post.image)
         embed.set_author(
-            name=f'Uploaded by u/{post["author"]}',
-            url=f"https://www.reddit.com/u/{post['author']}",
+            name=f"Uploaded by u/{post.author}",
+            url=f"https://www.reddit.com/u/{post.author}",
         )
 
-        await ctx.send(base + post["permalink"], embed=embed)
+        await ctx.send(BASE_URL + post.permalink.lstrip("/"), embed=embed)
 
 
 async def setup(bot):
@@ -1,5 +1,4 @@
 import datetime
-import json
 import re
 import textwrap
 from io import BytesIO
@@ -27,6 +26,23 @@ class Search(commands.Cog):
     def __init__(self, bot):
         self.bot = bot
 
+    async def cog_load(self):
+        # The pictures are downloaded in the background so the command can reply instantly
+        # They are around 300 KB each so we keep less of them than the other pools
+        self.bot.prefetch.add("search.random_image", lambda: self.fetch_random_image(False), size=3)
+        self.bot.prefetch.add("search.random_image.vertical", lambda: self.fetch_random_image(True), size=3)
+
+    async def cog_unload(self):
+        self.bot.prefetch.remove("search.random_image")
+        self.bot.prefetch.remove("search.random_image.vertical")
+
+    async def fetch_random_image(self, vertical: bool) -> bytes:
+        """Returns a random picture from picsum"""
+        response = await self.bot.web.get(
+            "https://picsum.photos/1920/1080" if not vertical else "https://picsum.photos/1080/1920"
+        )
+        return response.body
+
     @commands.command(name="wikipedia", aliases=["wiki", "searchwiki"])
     async def _wikipedia(self, ctx, *, search_term):
         """Searches wikipedia for specific search term"""
@@ -96,11 +112,8 @@ class Search(commands.Cog):
     @commands.command(aliases=["randomimage", "rndi", "randompicture", "randompic", "rp"])
     async def random_image(self, ctx, vertical: bool = False):
         """Sends a random image, if vertical is True, sends a vertical image"""
-        async with self.bot.session.get(
-            "https://picsum.photos/1920/1080" if not vertical else "https://picsum.photos/1080/1920"
-        ) as response:
-            resp = await response.read()
-            file = discord.File(BytesIO(resp), filename="random_picture.png")
+        resp = await self.bot.prefetch.get("search.random_image.vertical" if vertical else "search.random_image")
+        file = discord.File(BytesIO(resp), filename="random_picture.png")
 
         await ctx.send(
             embed=discord.Embed(title="A random picture :)", url="https://picsum.photos").set_image(
@@ -183,11 +196,10 @@ class Search(commands.Cog):
             raise NoAPIKey
         search_term = query
 
-        async with self.bot.session.get(
-            f"https://api.tenor.com/v1/search", params={"q": search_term, "key": apikey, "contentfilter": "high"}
-        ) as response:
-            gifs = json.loads(await response.text())
-            gif = gifs["results"][0]["media"][0]["gif"]["url"]
+        gifs = await self.bot.web.get_json(
+            "https://api.tenor.com/v1/search", params={"q": search_term, "key": apikey, "contentfilter": "high"}
+        )
+        gif = gifs["results"][0]["media"][0]["gif"]["url"]
 
         embed = discord.Embed(color=0x2F3136)
         embed.set_image(url=gif)
@@ -23,13 +23,15 @@ class Server(commands.Cog):
         """Changes the prefix for a server"""
         await self.bot.db.execute(
             """
-            UPDATE guilds
-            SET prefix = $2
-            WHERE id = $1;
+            INSERT INTO guilds (id, prefix)
+            VALUES ($1, $2)
+            ON CONFLICT (id) DO UPDATE SET prefix = EXCLUDED.prefix;
             """,
             ctx.guild.id,
             prefix,
         )
+        # We also update the cached prefix so that get_prefix uses the new one
+        self.bot.prefixes[ctx.guild.id] = prefix
         await ctx.send(f"prefix set to `{prefix}`")
 
     @commands.command(aliases=["guildinfo", "si", "gi"])
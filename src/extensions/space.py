@@ -1,13 +1,12 @@
-import json
 import random
 from datetime import datetime
-from io import BytesIO
-from typing import Literal, Optional
+from typing import Literal
 
 import discord
 from discord.ext import commands
 
-from utils.converters import CustomLiteral
+from utils.converters import CustomLiteral, DateConverter
+from utils.nasa import NASA
 from utils.paginator import Paginator
 
 
@@ -16,29 +15,28 @@ class Space(commands.Cog):
 
     def __init__(self, bot):
         self.bot = bot
-        self.api_key = bot.api_keys["nasa"] or "DEMO_KEY"
+        # Responses for past dates are stored forever so they only use our nasa quota once
+        self.nasa = NASA(bot.web, bot.api_keys["nasa"] or "DEMO_KEY", "cache/nasa.sqlite3")
+
+    async def cog_unload(self):
+        self.nasa.close()
 
     @commands.command(aliases=["apod", "astrography-photo-of-the-day"])
-    async def astrographyphotooftheday(self, ctx, date=None):
-        params = dict(api_key=self.api_key)
-        if date:
-            params["date"] = date
-        async with self.bot.session.get("https://api.nasa.gov/planetary/apod", params=params) as r:
-            resp = await r.json()
-            _copyright = f"\n©️ {resp['copyright']}" if resp.get("copyright") else ""
+    async def astrographyphotooftheday(self, ctx, date: DateConverter = None):
+        resp = await self.nasa.apod(date)
+        if resp is None:
+            return await ctx.send("There is no picture for that date")
+        _copyright = f"\n©️ {resp['copyright']}" if resp.get("copyright") else ""
         embed = discord.Embed(title=resp["title"], description=resp["explanation"], color=discord.Colour.random())
         embed.set_image(url=resp.get("hdurl") or resp.get("url"))
         embed.set_footer(text=f"Taken at {resp['date']}{_copyright}")
         await ctx.send(embed=embed)
 
     @commands.command(aliases=["neo", "near-earth-object"])
-    async def nearearthobject(self, ctx, date=None):
-        params = dict(api_key=self.api_key)
-        if date:
-            params["start_date"] = date
-            params["end_date"] = date
-        async with self.bot.session.get("https://api.nasa.gov/neo/rest/v1/feed", params=params) as r:
-            resp = await r.json()
+    async def nearearthobject(self, ctx, date: DateConverter = None):
+        resp = await self.nasa.neo_feed(date)
+        if resp is None:
+            return await ctx.send("There is no data for that date")
         embeds = []
         for obj in list(resp["near_earth_objects"].items())[0][1]:
             embed = discord.Embed(
@@ -75,10 +73,13 @@ class Space(commands.Cog):
         filter: Literal[
             "natural", "natural/all", "natural/available", "enhanced", "enhanced/all", "enhanced/available"
         ] = "natural",
+        date: DateConverter = None,
     ):
-        params = dict(api_key=self.api_key)
-        async with self.bot.session.get("https://api.nasa.gov/EPIC/api/" + filter, params=params) as r:
-            resp = await r.json()
+        if date is not None and filter not in ("natural", "enhanced"):
+            return await ctx.send("A date can only be used with the natural and enhanced filters")
+        resp = await self.nasa.epic(filter, date)
+        if not resp:
+            return await ctx.send("There are no images for that date")
         embeds = []
 
         for image in resp:
@@ -114,20 +115,9 @@ class Space(commands.Cog):
     @commands.command(aliases=["rmrp", "remote-monitoring-repository"])
     async def randommarsroverphoto(self, ctx, rover_name: CustomLiteral("curiosity", "opportunity", "spirit") = None):
         rover_name = rover_name or random.choice(("curiosity", "opportunity", "spirit"))
-        params = dict(
-            api_key=self.api_key,
-            # sol stands for Solar Date
-            sol=random.randint(
-                0,
-                # curiosity is still running so the latest number can be higher than this.
-                # spirit and opportunity is not running so the images taken by those are gonna stay the same
-                {"curiosity": 3234, "spirit": 2208, "opportunity": 5107}[rover_name],
-            ),
-        )
-        async with self.bot.session.get(
-            f"https://api.nasa.gov/mars-photos/api/v1/rovers/{rover_name}/photos", params=params
-        ) as r:
-            resp = await r.json()
+        # sol stands for Solar Date, the sol is picked from the rover's manifest so it always has photos
+        sol, resp = await self.nasa.random_rover_photos(rover_name)
+        rover = resp["rover"]
         embeds = []
         for image in resp["photos"]:
             earth_date = datetime.fromisoformat(image["earth_date"])
@@ -137,13 +127,13 @@ class Space(commands.Cog):
                 name="Date",
                 value=f"{discord.utils.format_dt(earth_date, 'f')} ({discord.utils.format_dt(earth_date, 'R')})",
             )
-            rover = image["rover"]
             camera = image["camera"]
             rover_str = f"**Name**: {rover['name']}\n**Status**: {rover['status'].title()}\n**Launch**: {rover['launch_date']}\n**Landing**: {rover['landing_date']}"
             camera_str = f"**Name**: {camera['full_name']} ({camera['name']})"
             
             embed.add_field(name="Rover", value=rover_str, inline=False)
             embed.add_field(name="Camera", value=camera_str, inline=False)
+            embed.set_footer(text=f"Sol {sol}")
             embeds.append(embed)
         pag = Paginator(embeds)
         await pag.start(ctx)
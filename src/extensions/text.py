@@ -273,7 +273,7 @@ class Text(commands.Cog):
 
         await ctx.send(f"```{result}```", delete_after=10)
 
-    @commands.command(description="Morse code :nerd:")
+    @commands.command(description="Morse code :nerd:", extras={"typing": False})
     async def morse(self, ctx, *, text: str):
         cipher = " ".join(self.morse_dict[char] for char in text.upper())
         await ctx.send(embed=discord.Embed(title=str(ctx.author), description=cipher, color=0x2F3136))
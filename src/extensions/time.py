@@ -1,7 +1,4 @@
-import asyncio
 import datetime
-import difflib
-import json
 from typing import Union
 
 import discord
@@ -9,6 +6,7 @@ import humanize
 from discord.ext import commands
 
 from utils.converters import TimeConverter
+from utils.timezones import TIMEZONES
 
 
 class Time(commands.Cog):
@@ -16,83 +14,66 @@ class Time(commands.Cog):
 
     def __init__(self, bot):
         self.bot = bot
-        self.timezones_cache = {}
 
     @commands.command()
     async def remind(self, ctx, time: TimeConverter, *, text: str):
         """Remind you to do something after the specified time."""
         natural_time = humanize.naturaldelta(datetime.timedelta(seconds=int(time)))
+        when = discord.utils.utcnow() + datetime.timedelta(seconds=time)
+        # The reminder is saved to the database and sent by the reminder scheduler
+        await self.bot.reminders.create(ctx.author.id, when, text, channel_id=ctx.channel.id)
         await ctx.send(f"Gonna remind you `{text}` in {natural_time}")
-        await asyncio.sleep(time)
-        await ctx.author.send(text)
 
     @commands.command(
         aliases=["tzs", "timezoneset", "settimezone", "stz", "ts"],
     )
     async def timeset(self, ctx, *, timezone: str):
-        """Set your time zone to be used in the time command"""
-        location = timezone
+        """Set your time zone to be used in the time command
 
+        You can use the name of the time zone (Asia/Dhaka), its city (Dhaka) or a common alias (EST)
+        """
         # Validate that the person did not just send a continent
         continents = ["asia", "europe", "oceania", "australia", "africa"]
-        if location.lower() in continents:
+        if timezone.lower() in continents:
             return await ctx.send("I need a area not a continent 🤦‍♂️")
 
-        async with self.bot.session.get(f"http://worldtimeapi.org/api/timezone/{location}") as resp:
-            fj = json.loads(await resp.text())
-
-        # The error key exists only when there is a error
-        if fj.get("error"):
-            if fj["error"] == "unknown location":
-                async with self.bot.session.get("http://worldtimeapi.org/api/timezone") as resp:
-                    locations = await resp.json()
-
-                suggestions = difflib.get_close_matches(location, locations, n=5, cutoff=0.3)
-                suggestions = "\n".join(suggestions)
+        location = TIMEZONES.resolve(timezone)
+        if location is None:
+            return await ctx.send(embed=self.unknown_location_embed(timezone))
 
-                embed = discord.Embed(
-                    title="Unknown Location",
-                    description="The location couldn't be found",
-                    color=14885931,
+        previous = self.bot.user_timezones.get(ctx.author.id)
+        if previous == location:
+            return await ctx.send(
+                embed=discord.Embed(
+                    title="Failure",
+                    description=f"Time zone not changed, it was already set to {location}",
+                    color=discord.Colour.red(),
                 )
-                embed.add_field(name="Did you mean?", value=suggestions)
-
-                await ctx.send(embed=embed)
-            else:
-                await ctx.send(fj["error"])
+            )
 
-        result = await self.bot.db.fetchrow(
+        await self.bot.db.execute(
             """
             INSERT INTO timezones (user_id, timezone)
                 VALUES ($1, $2)
             ON CONFLICT (user_id) DO UPDATE
-                SET timezone = EXCLUDED.timezone
-            RETURNING *;
+                SET timezone = EXCLUDED.timezone;
             """,
             ctx.author.id,
-            timezone,
+            location,
         )
-        self.timezones_cache[ctx.author.id] = timezone
-        if result:
-            if result["timezone"] == timezone:
-                embed = discord.Embed(
-                    title="Failure",
-                    description=f"Time zone not changed, it was already set to {timezone}",
-                    color=discord.Colour.red(),
-                )
-            else:
-                embed = discord.Embed(
-                    title="Success",
-                    description=f"Time zone changed from `{result['timezone']}` to `{timezone}`",
-                    color=discord.Colour.yellow(),
-                )
+        self.bot.user_timezones[ctx.author.id] = location
+        if previous:
+            embed = discord.Embed(
+                title="Success",
+                description=f"Time zone changed from `{previous}` to `{location}`",
+                color=discord.Colour.yellow(),
+            )
         else:
             embed = discord.Embed(
                 title="Success",
-                description=f"Time zone set to `{timezone}`",
+                description=f"Time zone set to `{location}`",
                 color=discord.Colour.green(),
             )
-
         await ctx.send(embed=embed)
 
     @commands.command(aliases=["tm"], description="See time")
@@ -104,50 +85,40 @@ class Time(commands.Cog):
         if location is None:
             location = ctx.author
 
-        # If the item provided is a member then we get their location from the database
+        # If the item provided is a member then we get their location from the cache of the timezones table
         if isinstance(location, discord.Member):
-            if location.id in self.timezones_cache:
-                location = self.timezones_cache[location.id]
-            else:
-                result = await self.bot.db.fetchrow(
-                    """
-                    SELECT * FROM timezones
-                    WHERE user_id = $1""",
-                    location.id,
+            timezone = self.bot.user_timezones.get(location.id)
+            if timezone is None:
+                embed = discord.Embed(
+                    title=f"{location} Has not yet set is location",
+                    description="He needs to set his timezone using the timeset command",
+                    color=14885931,
                 )
-                if result is None:
-                    embed = discord.Embed(
-                        title=f"{location} Has not yet set is location",
-                        description="He needs to set his timezone using the timeset command",
-                        color=14885931,
-                    )
-                    return await ctx.send(embed=embed)
-                location = result["timezone"]
-                self.timezones_cache[result["user_id"]] = location
-
-        # We get the time
-        async with self.bot.session.get(f"http://worldtimeapi.org/api/timezone/{location}") as r:
-            fj = json.loads(await r.text())
-
-        # If there was a error then we notify the user
-        if fj.get("error") == "unknown location":
-            async with self.bot.session.get("http://worldtimeapi.org/api/timezone") as resp:
-                locations = await resp.json()
-            suggestions = difflib.get_close_matches(location, locations, n=5, cutoff=0.3)
-            suggestions = "\n".join(suggestions)
-            embed = discord.Embed(
-                title="Unknown Location", description="The location couldn't be found", color=14885931
-            )
-            embed.add_field(name="Did you mean?", value=suggestions)
-            return await ctx.send(embed=embed)
-
-        currenttime = datetime.datetime.strptime(fj["datetime"][:-13], "%Y-%m-%dT%H:%M:%S")
+                return await ctx.send(embed=embed)
+        else:
+            timezone = TIMEZONES.resolve(location)
+            # If the location is unknown then we notify the user
+            if timezone is None:
+                return await ctx.send(embed=self.unknown_location_embed(location))
+
+        # We get the time, this is done locally with the tz database so it never needs a request
+        currenttime = datetime.datetime.now(TIMEZONES.zone(timezone))
+        offset = currenttime.strftime("%z")
         embed = discord.Embed(title="Time", color=0x2F3136)
-        embed.add_field(name=location, value=currenttime.strftime("%a, %d %B %Y, %H:%M:%S"))
-        embed.add_field(name="UTC Offset", value=fj["utc_offset"])
+        embed.add_field(name=timezone, value=currenttime.strftime("%a, %d %B %Y, %H:%M:%S"))
+        embed.add_field(name="UTC Offset", value=f"{offset[:3]}:{offset[3:]}")
 
         await ctx.send(embed=embed)
 
+    @staticmethod
+    def unknown_location_embed(location: str) -> discord.Embed:
+        """Makes the embed that is sent when a location is not a known time zone"""
+        embed = discord.Embed(title="Unknown Location", description="The location couldn't be found", color=14885931)
+        suggestions = TIMEZONES.suggest(location)
+        if suggestions:
+            embed.add_field(name="Did you mean?", value="\n".join(suggestions))
+        return embed
+
 
 async def setup(bot):
     """Adds the cog to the bot"""
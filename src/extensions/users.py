@@ -25,6 +25,7 @@ class Users(commands.Cog):
             """,
             ctx.author.id,
         )
+        self.bot.afk_users.pop(ctx.author.id, None)
         if not is_afk:
             return await ctx.send("You are not afk")
         await ctx.send("Removed your afk status")
@@ -33,7 +34,7 @@ class Users(commands.Cog):
     @commands.cooldown(1, 5, commands.BucketType.user)
     async def awayfromkeyboard(self, ctx, *, reason: commands.clean_content = None):
         """Sets your afk status"""
-        await self.bot.db.fetchrow(
+        record = await self.bot.db.fetchrow(
             """
             INSERT INTO afk (user_id, last_seen, reason)
                 VALUES ($1, $2, $3)
@@ -46,6 +47,7 @@ class Users(commands.Cog):
             datetime.datetime.now(datetime.timezone.utc),
             reason,
         )
+        self.bot.afk_users[ctx.author.id] = record
 
         await ctx.send(f"You are now afk{' for '+ reason if reason else ''} :)")
 
@@ -0,0 +1,242 @@
+"""File for things that buffer database writes in memory and save them in batches."""
+import asyncio
+import datetime
+import time
+from collections import Counter
+
+from discord.ext import tasks
+
+from .errors import print_error
+
+__all__ = ("BatchWriter", "LastSeenWriter", "UsageCounter")
+
+
+class BatchWriter:
+    """Base class for things that collect writes in memory and save them periodically.
+
+    Subclasses implement ``_flush`` which should save the pending data and
+    return True, or put the data back and return False if it failed.
+    """
+
+    def __init__(self, bot, *, interval: float = 5.0):
+        """Makes a instance of BatchWriter
+
+        Parameters
+        ----------
+        bot : WMBot
+            The bot to get the database from
+        interval : float, optional
+            How often the pending data is saved to the database in seconds, by default 5
+        """
+        self.bot = bot
+        self.interval = interval
+        self.flushes = 0
+        self.last_flush_duration = 0.0
+        self._lock = asyncio.Lock()
+        self._flush_loop = tasks.loop(seconds=interval)(self.flush)
+
+    def start(self) -> None:
+        """Starts saving the pending data periodically"""
+        if not self._flush_loop.is_running():
+            self._flush_loop.start()
+
+    async def stop(self) -> None:
+        """Stops the periodic saving and saves whatever is left"""
+        self._flush_loop.cancel()
+        await self.flush()
+
+    async def flush(self) -> None:
+        """Saves all the pending data to the database"""
+        async with self._lock:
+            start = time.perf_counter()
+            if await self._flush():
+                self.flushes += 1
+                self.last_flush_duration = time.perf_counter() - start
+
+    async def _flush(self) -> bool:
+        raise NotImplementedError
+
+
+class UsageCounter(BatchWriter):
+    """Counts command usages in memory and saves them to the database every few seconds.
+
+    Increments for the same user or command are merged together so a burst of
+    commands only costs one query per table when it is flushed.
+    """
+
+    def __init__(self, bot, *, interval: float = 5.0):
+        """Makes a instance of UsageCounter
+
+        Parameters
+        ----------
+        bot : WMBot
+            The bot to get the database from
+        interval : float, optional
+            How often the counts are saved to the database in seconds, by default 5
+        """
+        super().__init__(bot, interval=interval)
+        self.users = Counter()
+        self.commands = Counter()
+        # Statistics, these are never reset
+        self.increments = 0
+        self.flushed_increments = 0
+        self.flushed_rows = 0
+
+    @property
+    def pending_rows(self) -> int:
+        """The number of rows that will be written in the next flush"""
+        return len(self.users) + len(self.commands)
+
+    @property
+    def pending_increments(self) -> int:
+        """The number of usages that haven't been saved yet"""
+        return sum(self.users.values()) + sum(self.commands.values())
+
+    @property
+    def rows_saved(self) -> int:
+        """The number of writes that were avoided by merging the usages"""
+        return self.flushed_increments - self.flushed_rows
+
+    def add_user(self, user_id: int) -> None:
+        """Counts a usage for a user
+
+        Parameters
+        ----------
+        user_id : int
+            The id of the user that used a command
+        """
+        self.users[user_id] += 1
+        self.increments += 1
+
+    def add_command(self, name: str) -> None:
+        """Counts a usage for a command
+
+        Parameters
+        ----------
+        name : str
+            The qualified name of the command that was used
+        """
+        self.commands[name] += 1
+        self.increments += 1
+
+    async def _flush(self) -> bool:
+        """Saves all the pending counts to the database"""
+        if not self.users and not self.commands:
+            return False
+        # We swap the counters before awaiting so usages counted during the flush go to the next one
+        users, self.users = self.users, Counter()
+        commands, self.commands = self.commands, Counter()
+        try:
+            if users:
+                await self.bot.db.execute(
+                    """
+                    INSERT INTO users (usage, user_id)
+                    SELECT * FROM unnest($1::integer[], $2::bigint[])
+                    ON CONFLICT (user_id) DO UPDATE SET usage = users.usage + EXCLUDED.usage;
+                    """,
+                    list(users.values()),
+                    list(users.keys()),
+                )
+                # If the second query fails we must not write the users again
+                self._record_flush(users)
+                users = Counter()
+            if commands:
+                await self.bot.db.execute(
+                    """
+                    INSERT INTO usages (usage, name)
+                    SELECT * FROM unnest($1::integer[], $2::text[])
+                    ON CONFLICT (name) DO UPDATE SET usage = usages.usage + EXCLUDED.usage;
+                    """,
+                    list(commands.values()),
+                    list(commands.keys()),
+                )
+                self._record_flush(commands)
+        except Exception as exc:
+            # We put the counts back so they are retried in the next flush
+            self.users.update(users)
+            self.commands.update(commands)
+            print_error(f"Could not save the command usages: {exc}")
+            return False
+        return True
+
+    def _record_flush(self, counts: Counter) -> None:
+        self.flushed_rows += len(counts)
+        self.flushed_increments += sum(counts.values())
+
+
+class LastSeenWriter(BatchWriter):
+    """Keeps the latest last seen time of each user in memory and saves them to the status table in bulk.
+
+    A user that is seen several times between two flushes, for example through
+    every guild they share with the bot, is only written once.
+    """
+
+    def __init__(self, bot, *, interval: float = 30.0):
+        """Makes a instance of LastSeenWriter
+
+        Parameters
+        ----------
+        bot : WMBot
+            The bot to get the database from
+        interval : float, optional
+            How often the last seen times are saved to the database in seconds, by default 30
+        """
+        super().__init__(bot, interval=interval)
+        self.pending = {}
+        # Statistics, these are never reset
+        self.updates = 0
+        self.flushed_updates = 0
+        self.flushed_rows = 0
+
+    @property
+    def queue_depth(self) -> int:
+        """The number of rows that will be written in the next flush"""
+        return len(self.pending)
+
+    @property
+    def rows_saved(self) -> int:
+        """The number of writes that were avoided by merging the updates"""
+        return self.flushed_updates - self.flushed_rows
+
+    def add(self, user_id: int, last_seen: datetime.datetime) -> None:
+        """Records that a user was last seen at the given time
+
+        Parameters
+        ----------
+        user_id : int
+            The id of the user
+        last_seen : datetime.datetime
+            When the user was seen
+        """
+        self.updates += 1
+        current = self.pending.get(user_id)
+        if current is None or last_seen > current:
+            self.pending[user_id] = last_seen
+
+    async def _flush(self) -> bool:
+        """Saves all the pending last seen times to the database"""
+        if not self.pending:
+            return False
+        # We swap the dict before awaiting so updates made during the flush go to the next one
+        pending, self.pending = self.pending, {}
+        updates = self.updates
+        try:
+            await self.bot.db.execute(
+                """
+                INSERT INTO status (last_seen, user_id)
+                SELECT * FROM unnest($1::timestamptz[], $2::bigint[])
+                ON CONFLICT (user_id) DO UPDATE SET last_seen = GREATEST(status.last_seen, EXCLUDED.last_seen);
+                """,
+                list(pending.values()),
+                list(pending.keys()),
+            )
+        except Exception as exc:
+            # We put the times back so they are retried in the next flush, newer times win
+            for user_id, last_seen in pending.items():
+                if user_id not in self.pending or last_seen > self.pending[user_id]:
+                    self.pending[user_id] = last_seen
+            print_error(f"Could not save the last seen times: {exc}")
+            return False
+        self.flushed_rows += len(pending)
+        self.flushed_updates = updates
+        return True
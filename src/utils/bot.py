@@ -2,8 +2,7 @@
 import asyncio
 import datetime
 import os
-from operator import attrgetter
-from typing import Generator, List, Union
+from typing import Generator, List, Optional, Union
 
 from gpytranslate import Translator as GoogleTranslator
 import aiohttp
@@ -17,13 +16,31 @@ from discord.ext import commands
 from dotenv import load_dotenv
 from playsound3 import PlaysoundException, playsound
 
-from utils.classes import Config, CustomEmojis, NoneClass
+from utils.batching import LastSeenWriter, UsageCounter
+from utils.caches import ExpiringLRU, SnipeStore
+from utils.classes import NoneClass
+from utils.config import CONFIG, EMOJIS, ConfigNode
 from utils.converters import CodeblockConverter
 from utils.errors import BlackListed, print_error
-from utils.functions import load_json, read_file
+from utils.functions import load_json
+from utils.http import WebClient
+from utils.pokeapi import PokeAPI
+from utils.prefetch import PrefetchManager
+from utils.quotas import QuotaManager
+from utils.renders import RenderCache
+from utils.sources import SourceImageCache
+from utils.timers import ReminderScheduler
+from utils.timezones import TIMEZONES
+from utils.workers import ImageWorkerPool
 
 __all__ = ("WMBot", "WMBotContext")
 
+# How many seconds a command has to respond before the typing indicator is sent
+TYPING_DELAY = 0.3
+
+# The postgres channel used to tell other processes that the blocks table changed
+BLOCKS_CHANNEL = "blocks"
+
 
 async def get_prefix(_bot, message):
     """Use this to fetch the current servers prefix from the db.
@@ -45,16 +62,12 @@ async def get_prefix(_bot, message):
     if message.author == _bot.owner:
         return _bot.config.owner_prefix
 
-    prefix_for_this_guild = await _bot.db.fetchval(
-        """
-            INSERT INTO guilds (id, prefix)
-            VALUES ($1, $2)
-            ON CONFLICT (id) DO UPDATE SET id = guilds.id
-            RETURNING prefix;
-            """,
-        message.guild.id,
-        _bot.config.default_prefix,
-    )
+    prefix_for_this_guild = _bot.prefixes.get(message.guild.id)
+    if prefix_for_this_guild is None:
+        # The guild is not in our cache yet so we use the default prefix for now
+        # and add the guild to the database in the background
+        prefix_for_this_guild = _bot.prefixes[message.guild.id] = _bot.config.default_prefix
+        _bot.create_background_task(_bot.ensure_guild(message.guild.id))
 
     prefix_return = str(prefix_for_this_guild)
     return commands.when_mentioned_or(prefix_return)(_bot, message)
@@ -82,11 +95,6 @@ class WMBot(commands.Bot):
         load_dotenv("config/apis/tokens.env")
         load_dotenv("config/database/db.env")
 
-        # Read the emoji file
-        self.emoji_config = CustomEmojis.from_json(read_file("config/general/emojis.json"))
-        # Read the config file
-        self.config = Config.from_json(read_file("config/general/config.json"))
-
         # Set the HTTPException error codes dict to a custom property for easy access
         self.httpexception_codes = load_json("assets/data/httpexception_codes.json", make_keys_int=True)
 
@@ -96,6 +104,9 @@ class WMBot(commands.Bot):
         # APIs
         # Initialize these as None here; they will be set up in setup_hook
         self.session = None
+        self.web = None
+        self.pokeapi = None
+        self.images = None
         self.cleverbot = None
         self.dagpi = None
         self.google_api = None
@@ -103,12 +114,43 @@ class WMBot(commands.Bot):
         self.aki = AsyncAkinator()
         self.apis = ["OMDB", "tenor", "owlbot", "gender_api", "nasa"]
         self.api_keys = {api: os.environ[api.lower()] for api in self.apis}
+        # Requests to these APIs are counted so a burst of commands doesn't use up a whole day of quota
+        self.quotas = QuotaManager()
+        # Results of the random content commands that are fetched before they are used
+        self.prefetch = PrefetchManager()
+        # Worker processes for the CPU heavy image commands
+        self.image_pool = ImageWorkerPool()
+        # The results of the image effects, so using a effect on the same image again doesn't make it again
+        self.renders = RenderCache("cache/effects")
 
         # For the snipe command
-        self.snipes = {}
-
-        # For tracking commands
-        self.command_uses = {}
+        self.snipes = SnipeStore()
+
+        # For tracking commands, maps the ids of the messages that invoked a command to the response
+        # Commands are only re-run or cleaned up if the message is edited or deleted within 15 minutes
+        self.command_uses = ExpiringLRU(maxsize=5000, ttl=15 * 60)
+
+        # For on_command and on_command_completion, saves the usages in batches
+        self.usage_counter = UsageCounter(self)
+        # For on_presence_update, saves the last seen times in batches
+        self.last_seen_writer = LastSeenWriter(self)
+        # For the remind command, sends the reminders that are stored in the database
+        self.reminders = ReminderScheduler(self)
+
+        # For get_prefix, maps guild ids to their prefix
+        self.prefixes = {}
+
+        # For bot_check, the ids of the users that are blocked from using the bot
+        self.blocked_users = set()
+        # For the afk detection in on_message, maps user ids to their row in the afk table
+        self.afk_users = {}
+        # For the time command, maps user ids to the IANA name of their timezone
+        self.user_timezones = {}
+        # The connection that listens for changes made by other processes
+        self._listener_connection = None
+
+        # Strong references to tasks created with create_background_task
+        self._background_tasks = set()
 
         super().__init__(
             command_prefix=get_prefix,
@@ -118,15 +160,25 @@ class WMBot(commands.Bot):
             owner_ids=self.config.owner_ids,
         )
 
-        # For before_invoke
+        # For before_invoke and after_invoke
         self._before_invoke = self.before_invoke
+        self._after_invoke = self.after_invoke
         # For blacklisted check
         self.add_check(self.bot_check)
 
     async def setup_hook(self) -> None:
         """Async initialization for the bot."""
-        self.session = aiohttp.ClientSession()
+        # The connection limits are a safety net, the per-host limits of the WebClient are usually lower
+        connector = aiohttp.TCPConnector(limit=100, limit_per_host=20, ttl_dns_cache=300)
+        self.session = aiohttp.ClientSession(connector=connector, timeout=aiohttp.ClientTimeout(total=30))
+        # Cogs should use this instead of the session for GET requests to other APIs since it caches the responses
+        self.web = WebClient(self.session, disk_path="cache/http", quotas=self.quotas)
+        self.pokeapi = PokeAPI(self.web, "cache/pokeapi.sqlite3")
+        # The images that the image commands are used on, so using several commands on one image downloads it once
+        self.images = SourceImageCache(self.session)
         self.dagpi = asyncdagpi.Client(os.environ.get("dagpi", ""))
+        # We start the workers early so they don't copy the memory of everything that is loaded later
+        self.image_pool.start()
         
         self.cleverbot = async_cleverbot.Cleverbot(
             os.environ.get("cleverbot", ""),
@@ -140,12 +192,143 @@ class WMBot(commands.Bot):
         return await super().get_context(message, cls=cls or WMBotContext)
 
     async def close(self):
+        if self._listener_connection is not None:
+            connection, self._listener_connection = self._listener_connection, None
+            connection.remove_termination_listener(self._on_listener_terminated)
+            await connection.remove_listener(BLOCKS_CHANNEL, self._on_blocks_notification)
+            await self.db.release(connection)
+        self.reminders.stop()
+        self.prefetch.stop()
+        self.image_pool.stop()
+        await self.usage_counter.stop()
+        await self.last_seen_writer.stop()
         await self.session.close()
+        if self.pokeapi is not None:
+            self.pokeapi.close()
         await super().close()
 
+    def create_background_task(self, coro) -> asyncio.Task:
+        """Schedules a coroutine to run in the background without awaiting it.
+
+        Parameters
+        ----------
+        coro : Coroutine
+            The coroutine to run
+
+        Returns
+        -------
+        asyncio.Task
+            The task that was created
+        """
+        task = asyncio.create_task(coro)
+        # We keep a reference to the task so that it doesn't get garbage collected before it's done
+        self._background_tasks.add(task)
+        task.add_done_callback(self._background_tasks.discard)
+        return task
+
+    async def populate_caches(self) -> None:
+        """Loads the data that is cached in memory from the database."""
+        guilds = await self.db.fetch("SELECT id, prefix FROM guilds;")
+        self.prefixes = {record["id"]: record["prefix"] for record in guilds}
+        afk_users = await self.db.fetch("SELECT * FROM afk;")
+        self.afk_users = {record["user_id"]: record for record in afk_users}
+        timezones = await self.db.fetch("SELECT user_id, timezone FROM timezones;")
+        self.user_timezones = {}
+        for record in timezones:
+            # Old versions of timeset saved whatever the user typed, so the names are resolved again here.
+            # Users whose name can't be resolved are asked to use timeset again by the time command
+            timezone = TIMEZONES.resolve(record["timezone"])
+            if timezone is not None:
+                self.user_timezones[record["user_id"]] = timezone
+        await self.listen_for_changes()
+
+    async def listen_for_changes(self) -> None:
+        """Keeps a connection open that listens for changes to the blocks table made by other processes.
+
+        The blocked users are reloaded every time the connection is (re)established
+        because notifications sent while we weren't listening are lost.
+        """
+        connection = await self.db.acquire()
+        await connection.add_listener(BLOCKS_CHANNEL, self._on_blocks_notification)
+        connection.add_termination_listener(self._on_listener_terminated)
+        self._listener_connection = connection
+
+        blocks = await self.db.fetch("SELECT user_id FROM blocks;")
+        self.blocked_users = {record["user_id"] for record in blocks}
+
+    def _on_listener_terminated(self, connection) -> None:
+        """Reconnects the listener if the connection was closed by anything other than WMBot.close"""
+        if self._listener_connection is connection and not self.is_closed():
+            self._listener_connection = None
+            self.create_background_task(self.listen_for_changes())
+
+    def _on_blocks_notification(self, connection, pid, channel, payload) -> None:
+        """Updates the blocked users when a notification is sent by WMBot.publish_block"""
+        action, _, user_id = payload.partition(":")
+        if action == "add":
+            self.blocked_users.add(int(user_id))
+        elif action == "remove":
+            self.blocked_users.discard(int(user_id))
+
+    async def publish_block(self, user_id: int, blocked: bool) -> None:
+        """Updates the blocked users of this and every other process connected to the database.
+
+        Parameters
+        ----------
+        user_id : int
+            The id of the user that was blocked or unblocked
+        blocked : bool
+            Whether the user was blocked or unblocked
+        """
+        if blocked:
+            self.blocked_users.add(user_id)
+        else:
+            self.blocked_users.discard(user_id)
+        await self.db.execute(
+            "SELECT pg_notify($1, $2);",
+            BLOCKS_CHANNEL,
+            f"{'add' if blocked else 'remove'}:{user_id}",
+        )
+
+    async def ensure_guild(self, guild_id: int) -> str:
+        """Adds a guild to the database if it isn't there already and caches its prefix.
+
+        Parameters
+        ----------
+        guild_id : int
+            The id of the guild
+
+        Returns
+        -------
+        str
+            The prefix of the guild
+        """
+        prefix = await self.db.fetchval(
+            """
+            INSERT INTO guilds (id, prefix)
+            VALUES ($1, $2)
+            ON CONFLICT (id) DO UPDATE SET id = guilds.id
+            RETURNING prefix;
+            """,
+            guild_id,
+            self.config.default_prefix,
+        )
+        self.prefixes[guild_id] = prefix
+        return prefix
+
     async def fetch_banner(self, user: discord.User) -> str:
         return user.display_banner.url if user.display_banner else None
 
+    @property
+    def config(self) -> ConfigNode:
+        """The content of the config file, this is reloaded when the file is edited"""
+        return CONFIG.root
+
+    @property
+    def emoji_config(self) -> ConfigNode:
+        """The content of the emoji file, this is reloaded when the file is edited"""
+        return EMOJIS.root
+
     @property
     def owner(self) -> discord.User:
         """Call to get the owner of the bot."""
@@ -194,7 +377,7 @@ class WMBot(commands.Bot):
         str
             the emoji that it got, can be empty if it was not found
         """
-        return attrgetter(emoji_name)(self.emoji_config)
+        return EMOJIS.lookup(emoji_name)
 
     def get_user_named(self, name: str) -> Union[discord.User, None]:
         """Gets a user with the given name from the bot
@@ -258,46 +441,56 @@ class WMBot(commands.Bot):
         """
         Starts typing in the channel to let the user know that the bot received the command and is working on it.
 
+        The typing is only sent if the command didn't respond within TYPING_DELAY seconds
+        so that fast commands don't have to wait for it. Commands can opt out of it by
+        setting ``extras={"typing": False}``.
+
+        Parameters
+        ----------
+        ctx : commands.Context
+            Represents the context in which a command is being invoked under.
+        """
+        if ctx.command is not None and not ctx.command.extras.get("typing", True):
+            return
+        ctx.typing_task = self.create_background_task(self._delayed_typing(ctx))
+
+    async def after_invoke(self, ctx):
+        """Stops the typing from being sent if the command finished without responding.
+
         Parameters
         ----------
         ctx : commands.Context
             Represents the context in which a command is being invoked under.
         """
-        await ctx.bot.http.send_typing(ctx.channel.id)
+        if getattr(ctx, "typing_task", None) is not None:
+            ctx.typing_task.cancel()
+
+    async def _delayed_typing(self, ctx):
+        await asyncio.sleep(TYPING_DELAY)
+        try:
+            await self.http.send_typing(ctx.channel.id)
+        except discord.HTTPException:
+            # The typing indicator is not important enough to fail anything
+            pass
 
     async def on_command_completion(self, ctx):
-        """Saves the command usage to database"""
+        """Counts the command usage, it is saved to the database by the usage counter"""
         command_name = ctx.command.qualified_name
         
         if hasattr(self, "command_usages_cache"):
             self.command_usages_cache[command_name] = self.command_usages_cache.get(command_name, 0) + 1
-            
-        await self.db.execute(
-            """
-                INSERT INTO usages (usage, name)
-                VALUES (1, $1)
-                ON CONFLICT (name) DO UPDATE SET usage = usages.usage + 1;
-                """,
-            command_name,
-        )
+
+        self.usage_counter.add_command(command_name)
 
     async def on_command(self, ctx):
-        """Saves the details about the user of the command
+        """Counts the usage for the user of the command, it is saved to the database by the usage counter
 
         Parameters
         ----------
             ctx (commands.Context): Represents the context in which
             a command is being invoked under.
         """
-        user_id = ctx.author.id
-        await self.db.execute(
-            """
-                INSERT INTO users (usage, user_id)
-                VALUES (1, $1)
-                ON CONFLICT (user_id) DO UPDATE SET usage = users.usage + 1;
-                """,
-            user_id,
-        )
+        self.usage_counter.add_user(ctx.author.id)
 
     async def bot_check(self, ctx):
         """Checks if the user is blocked
@@ -314,15 +507,7 @@ class WMBot(commands.Bot):
         -------
             bool: if the user can use the command
         """
-        blocked = await self.db.fetchrow(
-            """
-            SELECT *
-            FROM blocks
-            WHERE user_id=$1
-            """,
-            ctx.author.id,
-        )
-        if blocked is None:
+        if ctx.author.id not in self.blocked_users:
             return True
         raise BlackListed
 
@@ -330,6 +515,9 @@ class WMBot(commands.Bot):
 class WMBotContext(commands.Context):
     """A subclass of commands.Context."""
 
+    # The task that sends the typing indicator, set in WMBot.before_invoke
+    typing_task: Optional[asyncio.Task] = None
+
     @property
     def owner(self) -> None:
         """Call to get the owner of the bot."""
@@ -371,6 +559,11 @@ class WMBotContext(commands.Context):
             discord.MessageReference or discord.PartialMessage.
 
         """
+        # The command responded so the typing indicator is not needed anymore
+        if self.typing_task is not None:
+            self.typing_task.cancel()
+            self.typing_task = None
+
         # Pop custom kwargs so they don't get forwarded to the Discord API
         no_reply = kwargs.pop("no_reply", False)
         no_upload = kwargs.pop("no_upload", False)
@@ -411,10 +604,11 @@ class WMBotContext(commands.Context):
                 else:
                     raise error
 
-        # We add the current message to the command_uses dictionary for tracking
+        # We add the current message to the command_uses mapping for tracking
+        # We only keep a partial message since the id and channel is all that's needed to delete it
         if not hasattr(self.bot, "command_uses"):
-            self.bot.command_uses = {}
-        self.bot.command_uses[self.message] = message
+            self.bot.command_uses = ExpiringLRU(maxsize=5000, ttl=15 * 60)
+        self.bot.command_uses[self.message.id] = message.channel.get_partial_message(message.id)
         return message
 
 
@@ -432,6 +626,14 @@ async def create_db_pool(bot):
     except Exception as e:
         bot.db = NoneClass("Database is not available, please check your configuration")
         print_error("Could not connect to the database, Most likely because the database credentials are invalid")
+    else:
+        # We load the caches so that we don't have to query the database for every message
+        await bot.populate_caches()
+        # We start saving the command usages and last seen times that are collected in memory
+        bot.usage_counter.start()
+        bot.last_seen_writer.start()
+        # We start sending the reminders
+        bot.reminders.start()
     # We try to play a sound to let the user know that the bot is online
     # If the sound playing fails we just ignore it
     try:
@@ -0,0 +1,331 @@
+"""File for the caches used by the bot."""
+import asyncio
+import datetime
+import os
+import sqlite3
+import sys
+import threading
+import time
+from collections import OrderedDict, deque
+from typing import Any, Hashable, Iterator, Optional, Set, Tuple
+
+__all__ = ("DiskStore", "ExpiringLRU", "SnipedMessage", "SnipeStore")
+
+_MISSING = object()
+
+
+class ExpiringLRU:
+    """A mapping with a maximum size where entries also expire after some time.
+
+    When the mapping is full the least recently used entry is removed.
+    Expired entries are removed lazily, when they are looked up or when a new
+    entry is added.
+    """
+
+    def __init__(self, maxsize: int, ttl: Optional[float] = None):
+        """Makes a instance of ExpiringLRU
+
+        Parameters
+        ----------
+        maxsize : int
+            The maximum amount of entries to keep
+        ttl : Optional[float], optional
+            How many seconds an entry is kept for, by default None which means forever
+        """
+        self.maxsize = maxsize
+        self.ttl = ttl
+        self._data = OrderedDict()
+        # Statistics
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.expirations = 0
+
+    def __len__(self) -> int:
+        return len(self._data)
+
+    def __iter__(self) -> Iterator[Hashable]:
+        return iter(self._data)
+
+    def __contains__(self, key: Hashable) -> bool:
+        return self._lookup(key) is not _MISSING
+
+    def __getitem__(self, key: Hashable) -> Any:
+        value = self._lookup(key)
+        if value is _MISSING:
+            raise KeyError(key)
+        return value
+
+    def __setitem__(self, key: Hashable, value: Any) -> None:
+        self._data[key] = (value, time.monotonic())
+        self._data.move_to_end(key)
+        self._evict()
+
+    def __delitem__(self, key: Hashable) -> None:
+        del self._data[key]
+
+    def get(self, key: Hashable, default: Any = None) -> Any:
+        """Returns the value for the key if it exists and is not expired, otherwise the default"""
+        value = self._lookup(key)
+        return default if value is _MISSING else value
+
+    def pop(self, key: Hashable, default: Any = None) -> Any:
+        """Removes the key and returns its value if it exists and is not expired, otherwise the default"""
+        value = self._lookup(key)
+        if value is _MISSING:
+            return default
+        del self._data[key]
+        return value
+
+    def clear(self) -> None:
+        """Removes all the entries"""
+        self._data.clear()
+
+    @property
+    def stats(self) -> dict:
+        """The size and hit/eviction counts of the cache"""
+        return {
+            "size": len(self._data),
+            "maxsize": self.maxsize,
+            "hits": self.hits,
+            "misses": self.misses,
+            "evictions": self.evictions,
+            "expirations": self.expirations,
+        }
+
+    def _expired(self, stored_at: float, now: float) -> bool:
+        return self.ttl is not None and now - stored_at > self.ttl
+
+    def _lookup(self, key: Hashable) -> Any:
+        try:
+            value, stored_at = self._data[key]
+        except KeyError:
+            self.misses += 1
+            return _MISSING
+        if self._expired(stored_at, time.monotonic()):
+            del self._data[key]
+            self.expirations += 1
+            self.misses += 1
+            return _MISSING
+        self._data.move_to_end(key)
+        self.hits += 1
+        return value
+
+    def _evict(self) -> None:
+        now = time.monotonic()
+        # The least recently used entries are at the start, we stop at the first one that
+        # isn't expired, the ones after it are removed when they are looked up
+        while self._data:
+            key, (_, stored_at) = next(iter(self._data.items()))
+            if not self._expired(stored_at, now):
+                break
+            del self._data[key]
+            self.expirations += 1
+        while len(self._data) > self.maxsize:
+            self._data.popitem(last=False)
+            self.evictions += 1
+
+
+class SnipedMessage:
+    """The parts of a deleted message that the snipe command shows."""
+
+    __slots__ = ("author_id", "content", "attachments", "created_at")
+
+    def __init__(self, author_id: int, content: str, attachments: Tuple[str, ...], created_at: datetime.datetime):
+        self.author_id = author_id
+        self.content = content
+        self.attachments = attachments
+        self.created_at = created_at
+
+    @classmethod
+    def from_message(cls, message) -> "SnipedMessage":
+        """Makes a SnipedMessage from a discord.Message"""
+        return cls(
+            message.author.id,
+            message.content,
+            tuple(attachment.url for attachment in message.attachments),
+            message.created_at,
+        )
+
+    @property
+    def size(self) -> int:
+        """A estimate of how many bytes this takes in memory"""
+        return (
+            sys.getsizeof(self)
+            + sys.getsizeof(self.content)
+            + sys.getsizeof(self.attachments)
+            + sum(sys.getsizeof(url) for url in self.attachments)
+        )
+
+
+class SnipeStore:
+    """Keeps the last few deleted messages of each channel.
+
+    The total amount of messages and bytes stored are capped, when either of
+    them is exceeded the channels that were not used for the longest time are
+    removed.
+    """
+
+    def __init__(self, per_channel: int = 5, *, max_entries: int = 10000, max_bytes: int = 8 * 1024 * 1024):
+        """Makes a instance of SnipeStore
+
+        Parameters
+        ----------
+        per_channel : int, optional
+            How many deleted messages are kept for each channel, by default 5
+        max_entries : int, optional
+            The maximum amount of messages to keep in total, by default 10000
+        max_bytes : int, optional
+            The maximum amount of bytes to use in total, by default 8 MiB
+        """
+        self.per_channel = per_channel
+        self.max_entries = max_entries
+        self.max_bytes = max_bytes
+        self._channels = OrderedDict()
+        self.entries = 0
+        self.bytes = 0
+        self.evicted_channels = 0
+
+    def __len__(self) -> int:
+        return self.entries
+
+    def add(self, message) -> None:
+        """Stores a deleted message
+
+        Parameters
+        ----------
+        message : discord.Message
+            The message that was deleted
+        """
+        sniped = SnipedMessage.from_message(message)
+        history = self._channels.get(message.channel.id)
+        if history is None:
+            history = self._channels[message.channel.id] = deque(maxlen=self.per_channel)
+        else:
+            self._channels.move_to_end(message.channel.id)
+
+        if len(history) == history.maxlen:
+            # The oldest message is pushed out of the ring by appendleft
+            self._forget(history[-1])
+        history.appendleft(sniped)
+        self.entries += 1
+        self.bytes += sniped.size
+
+        # We never evict the channel that we just added to
+        while (self.entries > self.max_entries or self.bytes > self.max_bytes) and len(self._channels) > 1:
+            _, cold_history = self._channels.popitem(last=False)
+            for old in cold_history:
+                self._forget(old)
+            self.evicted_channels += 1
+
+    def get(self, channel_id: int, index: int = 0) -> Optional[SnipedMessage]:
+        """Returns a deleted message from a channel
+
+        Parameters
+        ----------
+        channel_id : int
+            The id of the channel
+        index : int, optional
+            0 for the last deleted message, 1 for the one before that and so on, by default 0
+
+        Returns
+        -------
+        Optional[SnipedMessage]
+            The deleted message, None if there isn't one at that index
+        """
+        history = self._channels.get(channel_id)
+        if history is None or not 0 <= index < len(history):
+            return None
+        self._channels.move_to_end(channel_id)
+        return history[index]
+
+    def count(self, channel_id: int) -> int:
+        """Returns how many deleted messages are stored for a channel"""
+        return len(self._channels.get(channel_id, ()))
+
+    @property
+    def stats(self) -> dict:
+        """The size and eviction counts of the store"""
+        return {
+            "channels": len(self._channels),
+            "entries": self.entries,
+            "bytes": self.bytes,
+            "evicted_channels": self.evicted_channels,
+        }
+
+    def _forget(self, sniped: SnipedMessage) -> None:
+        self.entries -= 1
+        self.bytes -= sniped.size
+
+
+class DiskStore:
+    """A persistent key-value store in a sqlite database, for data that never changes.
+
+    The database is only opened when it is first used and every query runs in
+    a thread so the event loop is never blocked by the disk.
+    """
+
+    def __init__(self, path: str):
+        """Makes a instance of DiskStore
+
+        Parameters
+        ----------
+        path : str
+            The path of the sqlite database, the directory is made if it doesn't exist
+        """
+        self.path = path
+        self._db = None
+        # The connection is shared by the threads of asyncio.to_thread
+        self._lock = threading.Lock()
+
+    async def get(self, key: str) -> Optional[str]:
+        """Returns the value of a key, None if it is not stored"""
+        return await asyncio.to_thread(self._get, key)
+
+    async def set(self, key: str, value: str) -> None:
+        """Stores a value, replacing the old value of the key if there is one"""
+        await asyncio.to_thread(self._set, key, value)
+
+    async def keys(self, prefix: str = "") -> Set[str]:
+        """Returns every stored key that starts with the prefix"""
+        return await asyncio.to_thread(self._keys, prefix)
+
+    def close(self) -> None:
+        """Closes the database"""
+        with self._lock:
+            if self._db is not None:
+                self._db.close()
+                self._db = None
+
+    def _connect(self) -> sqlite3.Connection:
+        if self._db is None:
+            os.makedirs(os.path.dirname(self.path) or ".", exist_ok=True)
+            self._db = sqlite3.connect(self.path, check_same_thread=False)
+            self._db.execute(
+                """
+                CREATE TABLE IF NOT EXISTS entries (
+                    key TEXT PRIMARY KEY,
+                    value TEXT NOT NULL,
+                    stored_at REAL NOT NULL
+                )
+                """
+            )
+        return self._db
+
+    def _get(self, key: str) -> Optional[str]:
+        with self._lock:
+            row = self._connect().execute("SELECT value FROM entries WHERE key = ?", (key,)).fetchone()
+        return row[0] if row else None
+
+    def _set(self, key: str, value: str) -> None:
+        with self._lock:
+            db = self._connect()
+            db.execute("INSERT OR REPLACE INTO entries VALUES (?, ?, ?)", (key, value, time.time()))
+            db.commit()
+
+    def _keys(self, prefix: str) -> Set[str]:
+        with self._lock:
+            rows = self._connect().execute(
+                "SELECT key FROM entries WHERE substr(key, 1, ?) = ?", (len(prefix), prefix)
+            )
+            return {row[0] for row in rows}
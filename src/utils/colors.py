@@ -0,0 +1,157 @@
+"""File for naming colors and making color schemes locally."""
+import colorsys
+import functools
+import json
+from typing import Dict, List, Sequence, Tuple
+
+import numpy as np
+
+__all__ = ("ColorIndex", "COLORS", "SCHEMES")
+
+# The hue offsets of each scheme in degrees, the first color is always the base color
+SCHEMES: Dict[str, Tuple[int, ...]] = {
+    "complementary": (0, 180),
+    "analogous": (0, -30, 30),
+    "triadic": (0, 120, 240),
+    "split": (0, 150, 210),
+    "tetradic": (0, 90, 180, 270),
+}
+
+# sRGB to CIE XYZ under the D65 white point
+_RGB_TO_XYZ = np.array(
+    [
+        [0.4124564, 0.3575761, 0.1804375],
+        [0.2126729, 0.7151522, 0.0721750],
+        [0.0193339, 0.1191920, 0.9503041],
+    ]
+)
+_D65_WHITE = np.array([0.95047, 1.0, 1.08883])
+
+
+def _to_rgb(values: Sequence[int]) -> np.ndarray:
+    """Converts integer colors (0xRRGGBB) to a (n, 3) array of 0-255 values"""
+    values = np.asarray(values, dtype=np.int64)
+    return np.stack([(values >> 16) & 0xFF, (values >> 8) & 0xFF, values & 0xFF], axis=-1)
+
+
+def rgb_to_xyz(rgb: np.ndarray) -> np.ndarray:
+    """Converts a (n, 3) array of 0-255 sRGB values to CIE XYZ"""
+    srgb = rgb / 255
+    linear = np.where(srgb <= 0.04045, srgb / 12.92, ((srgb + 0.055) / 1.055) ** 2.4)
+    return linear @ _RGB_TO_XYZ.T
+
+
+def rgb_to_lab(rgb: np.ndarray) -> np.ndarray:
+    """Converts a (n, 3) array of 0-255 sRGB values to CIELAB"""
+    xyz = rgb_to_xyz(rgb) / _D65_WHITE
+    delta = 6 / 29
+    f = np.where(xyz > delta**3, np.cbrt(xyz), xyz / (3 * delta**2) + 4 / 29)
+    return np.stack(
+        [116 * f[:, 1] - 16, 500 * (f[:, 0] - f[:, 1]), 200 * (f[:, 1] - f[:, 2])],
+        axis=-1,
+    )
+
+
+class ColorIndex:
+    """The named colors of assets/data/color_names.json in CIELAB space.
+
+    The closest name of a color is the one with the smallest euclidean distance
+    in CIELAB, which is close to how different people see two colors. The
+    list only has about a thousand colors so comparing against all of them
+    at once with NumPy is faster than walking a tree in Python, and it works
+    the same for one color or a whole palette.
+    """
+
+    def __init__(self, path: str = "assets/data/color_names.json"):
+        """Makes a instance of ColorIndex
+
+        Parameters
+        ----------
+        path : str, optional
+            The json file that maps color names to hex codes, by default assets/data/color_names.json
+        """
+        self.path = path
+
+    @functools.cached_property
+    def _table(self) -> Tuple[List[str], np.ndarray, np.ndarray]:
+        """The names, integer values and CIELAB coordinates of the named colors, built on first use"""
+        with open(self.path, encoding="utf-8") as f:
+            named = json.load(f)
+        names = list(named)
+        values = np.array([int(code.lstrip("#"), 16) for code in named.values()], dtype=np.int64)
+        return names, values, rgb_to_lab(_to_rgb(values))
+
+    def nearest(self, values: Sequence[int]) -> List[Tuple[str, int]]:
+        """Returns the closest named color of each color
+
+        Parameters
+        ----------
+        values : Sequence[int]
+            The colors as integers, eg. 0xFF0000
+
+        Returns
+        -------
+        List[Tuple[str, int]]
+            The name and value of the closest named color, in the same order as the colors
+        """
+        names, named_values, named_lab = self._table
+        lab = rgb_to_lab(_to_rgb(values))
+        # The squared distance from every color to every named color, shaped (colors, named colors)
+        # |a - b|² = |a|² - 2a·b + |b|², |a|² is left out since it doesn't change which b is the closest
+        distances = (named_lab**2).sum(axis=1) - 2 * lab @ named_lab.T
+        closest = distances.argmin(axis=1)
+        return [(names[i], int(named_values[i])) for i in closest]
+
+    def name(self, value: int) -> str:
+        """Returns the name of the closest named color"""
+        return self.nearest([value])[0][0]
+
+    @staticmethod
+    def scheme(value: int, mode: str = "complementary") -> List[int]:
+        """Returns the colors of a scheme made from a color
+
+        Parameters
+        ----------
+        value : int
+            The base color
+        mode : str, optional
+            One of the keys of SCHEMES, by default complementary
+
+        Returns
+        -------
+        List[int]
+            The colors of the scheme, starting with the base color
+        """
+        r, g, b = (c / 255 for c in _to_rgb([value])[0])
+        hue, lightness, saturation = colorsys.rgb_to_hls(r, g, b)
+        colors = []
+        for offset in SCHEMES[mode]:
+            r, g, b = colorsys.hls_to_rgb((hue + offset / 360) % 1, lightness, saturation)
+            colors.append((round(r * 255) << 16) | (round(g * 255) << 8) | round(b * 255))
+        return colors
+
+    @staticmethod
+    def describe(value: int) -> Dict[str, str]:
+        """Returns a color in the common color formats, the same way thecolorapi.com formats them"""
+        rgb = _to_rgb([value])[0]
+        r, g, b = (int(c) for c in rgb)
+        hue, lightness, saturation = colorsys.rgb_to_hls(r / 255, g / 255, b / 255)
+        _, hsv_saturation, brightness = colorsys.rgb_to_hsv(r / 255, g / 255, b / 255)
+        key = 1 - max(r, g, b) / 255
+        if key < 1:
+            cyan, magenta, yellow = ((1 - c / 255 - key) / (1 - key) for c in (r, g, b))
+        else:
+            cyan = magenta = yellow = 0
+        x, y, z = rgb_to_xyz(rgb[None, :])[0] * 100
+        return {
+            "hex": f"#{value:06X}",
+            "rgb": f"rgb({r}, {g}, {b})",
+            "hsl": f"hsl({round(hue * 360)}, {round(saturation * 100)}%, {round(lightness * 100)}%)",
+            "hsv": f"hsv({round(hue * 360)}, {round(hsv_saturation * 100)}%, {round(brightness * 100)}%)",
+            "cmyk": f"cmyk({round(cyan * 100)}, {round(magenta * 100)}, {round(yellow * 100)}, {round(key * 100)})",
+            "xyz": f"XYZ({round(x)}, {round(y)}, {round(z)})",
+        }
+
+
+# This is shared by everything in the process so the index is only built once
+COLORS = ColorIndex()
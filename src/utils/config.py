@@ -0,0 +1,133 @@
+"""File for the config files that are shared by the whole process."""
+import json
+import os
+import time
+from collections.abc import Mapping
+from types import MappingProxyType
+from typing import Any, Dict, Iterator
+
+__all__ = ("ConfigFile", "ConfigNode", "CONFIG", "EMOJIS")
+
+
+def _freeze(value: Any) -> Any:
+    """Converts parsed json into immutable objects"""
+    if isinstance(value, dict):
+        return ConfigNode(value)
+    if isinstance(value, list):
+        return tuple(_freeze(item) for item in value)
+    return value
+
+
+class ConfigNode(Mapping):
+    """A immutable json object that allows attribute-style access."""
+
+    __slots__ = ("_values",)
+
+    def __init__(self, data: dict):
+        object.__setattr__(self, "_values", MappingProxyType({key: _freeze(value) for key, value in data.items()}))
+
+    def __getattr__(self, key: str) -> Any:
+        try:
+            return self._values[key]
+        except KeyError:
+            raise AttributeError(f"'ConfigNode' object has no attribute '{key}'") from None
+
+    def __setattr__(self, key: str, value: Any) -> None:
+        raise AttributeError("Config objects are read-only, edit the file instead")
+
+    def __getitem__(self, key: str) -> Any:
+        return self._values[key]
+
+    def __iter__(self) -> Iterator[str]:
+        return iter(self._values)
+
+    def __len__(self) -> int:
+        return len(self._values)
+
+    def __repr__(self) -> str:
+        return f"<ConfigNode {dict(self._values)!r}>"
+
+
+class ConfigFile:
+    """A json config file that is parsed once and reloaded only when the file changes.
+
+    Every dotted path (eg. ``paginator.first``) is computed when the file is
+    parsed so looking a value up is a single dictionary access.
+    """
+
+    __slots__ = ("path", "check_interval", "_root", "_paths", "_mtime", "_checked_at")
+
+    def __init__(self, path: str, *, check_interval: float = 1.0):
+        """Makes a instance of ConfigFile
+
+        Parameters
+        ----------
+        path : str
+            The path to the json file
+        check_interval : float, optional
+            How many seconds to wait between checking if the file changed, by default 1
+        """
+        self.path = path
+        self.check_interval = check_interval
+        self._root = None
+        self._paths = {}
+        self._mtime = None
+        self._checked_at = 0.0
+
+    @property
+    def root(self) -> ConfigNode:
+        """The parsed content of the file"""
+        self._reload_if_changed()
+        return self._root
+
+    def lookup(self, dotted_path: str) -> Any:
+        """Gets a value from the file using a dotted path
+
+        Parameters
+        ----------
+        dotted_path : str
+            The path to the value, eg. ``paginator.first``
+
+        Returns
+        -------
+        Any
+            The value
+
+        Raises
+        ------
+        AttributeError
+            The path does not exist in the file
+        """
+        self._reload_if_changed()
+        try:
+            return self._paths[dotted_path]
+        except KeyError:
+            raise AttributeError(f"{self.path} has no value at '{dotted_path}'") from None
+
+    def _reload_if_changed(self) -> None:
+        now = time.monotonic()
+        if self._root is not None and now - self._checked_at < self.check_interval:
+            return
+        self._checked_at = now
+        mtime = os.stat(self.path).st_mtime_ns
+        if mtime == self._mtime:
+            return
+        with open(self.path, encoding="utf-8") as f:
+            root = _freeze(json.load(f))
+        self._root, self._paths, self._mtime = root, _flatten(root), mtime
+
+
+def _flatten(node: ConfigNode, prefix: str = "") -> Dict[str, Any]:
+    """Maps every dotted path in a ConfigNode to its value"""
+    paths = {}
+    for key, value in node.items():
+        path = prefix + key
+        paths[path] = value
+        if isinstance(value, ConfigNode):
+            paths.update(_flatten(value, path + "."))
+    return paths
+
+
+# These are shared by everything in the process so each file is only parsed once
+CONFIG = ConfigFile("config/general/config.json")
+EMOJIS = ConfigFile("config/general/emojis.json")
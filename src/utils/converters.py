@@ -1,5 +1,6 @@
 """A file to keep all the converters."""
 import collections
+import datetime
 import inspect
 import re
 from typing import Deque, Optional
@@ -9,6 +10,7 @@ from discord.ext import commands
 __all__ = (
     "Codeblock",
     "CodeblockConverter",
+    "DateConverter",
     "LanguageConverter",
     "TagName",
     "TimeConverter",
@@ -87,6 +89,20 @@ class TimeConverter(WMBotConverter):
         return int(time)
 
 
+class DateConverter(WMBotConverter):
+    """Converts a date in the YYYY-MM-DD format to a datetime.date"""
+
+    async def convert(self, ctx: commands.Context, argument: str) -> datetime.date:
+        """Do the actual conversion."""
+        try:
+            return datetime.date.fromisoformat(argument)
+        except ValueError:
+            raise commands.BadArgument(
+                f'Converting to "Date" failed for parameter "{self.get_param_name(ctx)}":'
+                f"Dates must be in the YYYY-MM-DD format"
+            )
+
+
 class LanguageConverter(WMBotConverter):
     """Converts a language"""
 
@@ -194,11 +210,16 @@ class TagName(WMBotConverter):
 
 
 class CustomLiteral(WMBotConverter):
-    """Converts to any of the passed literal (case insensitive and shortening supported)"""
+    """Converts to any of the passed literal (case insensitive and shortening supported)
+
+    Use ``exact=True`` to turn off shortening, eg. for a Greedy parameter where
+    shortening could eat the argument after it
+    """
 
-    def __init__(self, *args):
+    def __init__(self, *args, exact: bool = False):
         super().__init__()
         self.literals = args
+        self.exact = exact
 
     async def convert(self, ctx: commands.Context, argument: str) -> str:
         """Do the actual conversion."""
@@ -206,7 +227,7 @@ class CustomLiteral(WMBotConverter):
         if argument.lower() in map(str.lower, self.literals):
             return argument
 
-        if (arg := [i for i in self.literals if i.startswith(argument)]) :
+        if not self.exact and (arg := [i for i in self.literals if i.startswith(argument)]):
             if len(arg) > 1:
                 await ctx.send(
                     f"There are more than one possible arguments (`{', '.join(self.literals)}`. "
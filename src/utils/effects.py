@@ -0,0 +1,562 @@
+"""File for the image effects that are rendered locally instead of by dagpi."""
+import io
+import time
+from typing import Any, Awaitable, Callable, Dict, List, NamedTuple, Optional, Tuple, Union
+
+import numpy as np
+from discord.ext import commands
+from PIL import Image, ImageDraw, ImageFont, UnidentifiedImageError
+
+from .errors import EffectBudgetExceeded, print_error
+from .renders import Rendered
+
+__all__ = (
+    "DETERMINISTIC_DAGPI",
+    "EFFECTS",
+    "MAX_CHAIN",
+    "Effect",
+    "ImageEffects",
+    "benchmark",
+    "render",
+    "render_chain",
+)
+
+# A effect returns a single frame or the frames of a animation
+Frames = Union[np.ndarray, List[np.ndarray]]
+# The dagpi features that always make the same image from the same image and arguments, so their results can be cached
+DETERMINISTIC_DAGPI = frozenset({"angel", "delete", "fedora", "hitler", "jail", "pride", "satan", "trash", "wanted"})
+# How many effects can be chained together
+MAX_CHAIN = 8
+
+
+class Effect(NamedTuple):
+    """A effect that takes a RGBA array of shape (height, width, 4)"""
+
+    func: Callable[[np.ndarray], Frames]
+    # The name of the asyncdagpi.ImageFeatures method that makes the same effect, used as a fallback
+    dagpi: Optional[str]
+
+
+EFFECTS: Dict[str, Effect] = {}
+
+
+def effect(name: str, *, dagpi: Optional[str] = None) -> Callable:
+    """Registers a function as a effect"""
+
+    def decorator(func: Callable[[np.ndarray], Frames]) -> Callable[[np.ndarray], Frames]:
+        EFFECTS[name] = Effect(func, dagpi)
+        return func
+
+    return decorator
+
+
+def _luminance(arr: np.ndarray) -> np.ndarray:
+    """Returns the brightness of every pixel from 0 to 1"""
+    return (arr[..., :3] @ np.array([0.299, 0.587, 0.114], dtype=np.float32)) / 255
+
+
+def _with_alpha(rgb: np.ndarray, arr: np.ndarray) -> np.ndarray:
+    """Puts the alpha channel of arr back on a RGB result"""
+    return np.dstack([np.clip(rgb, 0, 255).astype(np.uint8), arr[..., 3]])
+
+
+def _sobel(gray: np.ndarray) -> np.ndarray:
+    """Returns the edge strength of every pixel of a grayscale image, from 0 to 1"""
+    p = np.pad(gray, 1, mode="edge")
+    gx = (p[:-2, 2:] + 2 * p[1:-1, 2:] + p[2:, 2:]) - (p[:-2, :-2] + 2 * p[1:-1, :-2] + p[2:, :-2])
+    gy = (p[2:, :-2] + 2 * p[2:, 1:-1] + p[2:, 2:]) - (p[:-2, :-2] + 2 * p[:-2, 1:-1] + p[:-2, 2:])
+    magnitude = np.hypot(gx, gy)
+    return magnitude / max(float(magnitude.max()), 1e-6)
+
+
+def _box_blur(arr: np.ndarray, radius: int) -> np.ndarray:
+    """Blurs a (height, width, channels) float array with a summed-area table, the cost doesn't depend on the radius"""
+    k = 2 * radius + 1
+    padded = np.pad(arr, ((radius + 1, radius), (radius + 1, radius), (0, 0)), mode="edge")
+    table = padded.cumsum(axis=0).cumsum(axis=1)
+    return (table[k:, k:] - table[:-k, k:] - table[k:, :-k] + table[:-k, :-k]) / (k * k)
+
+
+def _hue_matrix(degrees: float) -> np.ndarray:
+    """Returns the matrix that rotates the hue of RGB colors while keeping their brightness"""
+    cos, sin = np.cos(np.radians(degrees)), np.sin(np.radians(degrees))
+    return np.array(
+        [
+            [0.213 + cos * 0.787 - sin * 0.213, 0.715 - cos * 0.715 - sin * 0.715, 0.072 - cos * 0.072 + sin * 0.928],
+            [0.213 - cos * 0.213 + sin * 0.143, 0.715 + cos * 0.285 + sin * 0.140, 0.072 - cos * 0.072 - sin * 0.283],
+            [0.213 - cos * 0.213 - sin * 0.787, 0.715 - cos * 0.715 + sin * 0.715, 0.072 + cos * 0.928 + sin * 0.072],
+        ],
+        dtype=np.float32,
+    )
+
+
+def _font(size: int) -> ImageFont.ImageFont:
+    try:
+        return ImageFont.load_default(size=size)
+    except TypeError:
+        # Pillow versions before 10.1 only have a small bitmap font
+        return ImageFont.load_default()
+
+
+@effect("invert", dagpi="invert")
+def invert(arr: np.ndarray) -> np.ndarray:
+    return _with_alpha(255 - arr[..., :3], arr)
+
+
+@effect("pixel", dagpi="pixel")
+def pixel(arr: np.ndarray) -> np.ndarray:
+    height, width = arr.shape[:2]
+    block = max(1, max(height, width) // 32)
+    # We pad the image to a multiple of the block size, average every block and then scale it back up
+    padded = np.pad(arr, ((0, -height % block), (0, -width % block), (0, 0)), mode="edge")
+    rows, columns = padded.shape[0] // block, padded.shape[1] // block
+    blocks = padded.reshape(rows, block, columns, block, 4).mean(axis=(1, 3)).astype(np.uint8)
+    return blocks.repeat(block, axis=0).repeat(block, axis=1)[:height, :width]
+
+
+@effect("sobel", dagpi="sobel")
+def sobel(arr: np.ndarray) -> np.ndarray:
+    edges = _sobel(_luminance(arr)) * 255
+    return _with_alpha(np.repeat(edges[..., None], 3, axis=2), arr)
+
+
+@effect("triangle", dagpi="triangle")
+def triangle(arr: np.ndarray) -> np.ndarray:
+    height, width = arr.shape[:2]
+    size = max(8, max(height, width) // 24)
+    ys, xs = np.indices((height, width))
+    cell_x, cell_y = xs // size, ys // size
+    u, v = (xs % size) / size, (ys % size) / size
+    # Every square is split in two triangles, the diagonal alternates so the triangles line up
+    upper = np.where((cell_x + cell_y) % 2 == 1, u + v < 1, u > v)
+    ids = ((cell_y * -(-width // size) + cell_x) * 2 + upper).ravel()
+    # The average color of every triangle
+    counts = np.maximum(np.bincount(ids), 1)
+    flat = arr.reshape(-1, 4)
+    means = np.stack([np.bincount(ids, weights=flat[:, channel]) / counts for channel in range(4)], axis=-1)
+    return means[ids].reshape(height, width, 4).astype(np.uint8)
+
+
+@effect("colors", dagpi="colors")
+def colors(arr: np.ndarray) -> List[np.ndarray]:
+    rgb = arr[..., :3].astype(np.float32)
+    # One frame every 30 degrees of hue makes a smooth loop
+    return [_with_alpha(rgb @ _hue_matrix(degrees).T, arr) for degrees in range(0, 360, 30)]
+
+
+@effect("communism", dagpi="communism")
+def communism(arr: np.ndarray) -> np.ndarray:
+    light = _luminance(arr)[..., None]
+    red, gold = np.array([140, 0, 0], dtype=np.float32), np.array([255, 215, 0], dtype=np.float32)
+    return _with_alpha(red * (1 - light) + gold * light, arr)
+
+
+@effect("america", dagpi="america")
+def america(arr: np.ndarray) -> np.ndarray:
+    height, width = arr.shape[:2]
+    flag = np.empty((height, width, 3), dtype=np.float32)
+    stripe = (np.arange(height) * 13 // height)[:, None]
+    flag[:] = np.where(stripe[..., None] % 2 == 0, [178, 34, 52], [255, 255, 255])
+    flag[: height * 7 // 13, : width * 2 // 5] = [60, 59, 110]
+    return _with_alpha(arr[..., :3] * 0.5 + flag * 0.5, arr)
+
+
+@effect("wasted", dagpi="wasted")
+def wasted(arr: np.ndarray) -> np.ndarray:
+    height, width = arr.shape[:2]
+    gray = _luminance(arr)[..., None] * np.array([200, 190, 190], dtype=np.float32)
+    band = slice(height * 2 // 5, height * 3 // 5)
+    gray[band] *= 0.4
+    image = Image.fromarray(_with_alpha(gray, arr))
+    draw = ImageDraw.Draw(image)
+    font = _font(max(12, height // 8))
+    draw.text((width / 2, height / 2), "WASTED", fill=(200, 30, 30, 255), font=font, anchor="mm")
+    return np.asarray(image)
+
+
+@effect("magik", dagpi="magik")
+def magik(arr: np.ndarray) -> np.ndarray:
+    height, width = arr.shape[:2]
+    center_y, center_x = (height - 1) / 2, (width - 1) / 2
+    ys, xs = np.indices((height, width), dtype=np.float32)
+    dy, dx = ys - center_y, xs - center_x
+    distance = np.hypot(dx, dy)
+    # The pixels are turned more the closer they are to the center
+    angle = np.arctan2(dy, dx) + 3 * np.clip(1 - distance / (min(height, width) / 2), 0, 1) ** 2
+    source_x = np.clip(np.rint(center_x + distance * np.cos(angle)), 0, width - 1).astype(np.intp)
+    source_y = np.clip(np.rint(center_y + distance * np.sin(angle)), 0, height - 1).astype(np.intp)
+    return arr[source_y, source_x]
+
+
+@effect("paint", dagpi="paint")
+def paint(arr: np.ndarray) -> np.ndarray:
+    smooth = _box_blur(arr[..., :3].astype(np.float32), max(1, max(arr.shape[:2]) // 256))
+    # Less colors and dark edges make it look painted
+    levels = 6
+    posterized = np.rint(smooth / 255 * (levels - 1)) * (255 / (levels - 1))
+    edges = _sobel(_luminance(arr))[..., None]
+    return _with_alpha(posterized * (1 - 0.6 * edges), arr)
+
+
+@effect("rounden")
+def rounden(arr: np.ndarray) -> np.ndarray:
+    height, width = arr.shape[:2]
+    side = min(height, width)
+    top, left = (height - side) // 2, (width - side) // 2
+    square = arr[top : top + side, left : left + side].copy()
+    # Everything outside of the circle becomes transparent
+    ys, xs = np.indices((side, side))
+    radius = side / 2
+    square[(xs + 0.5 - radius) ** 2 + (ys + 0.5 - radius) ** 2 > radius**2] = 0
+    return square
+
+
+def render(data: bytes, name: str, max_size: int = 512) -> Tuple[bytes, str]:
+    """Applies a effect to a image
+
+    This runs in the worker processes of ImageWorkerPool so it returns bytes, which
+    are cheaper to send back than a BytesIO.
+
+    Parameters
+    ----------
+    data : bytes
+        The image, in any format Pillow can read. Only the first frame of animations is used
+    name : str
+        The name of the effect, one of the keys of EFFECTS
+    max_size : int, optional
+        Images bigger than this are scaled down first, by default 512
+
+    Returns
+    -------
+    Tuple[bytes, str]
+        The result and its format, png or gif for animations
+
+    Raises
+    ------
+    commands.BadArgument
+        The data is not a image
+    """
+    return _encode(EFFECTS[name].func(_decode(data, max_size)))
+
+
+def render_chain(
+    data: bytes, names: Tuple[str, ...], max_size: int = 512, budget: Optional[float] = None
+) -> Tuple[bytes, str]:
+    """Applies several effects to a image one after the other
+
+    The image is only decoded and encoded once, every effect is applied to the
+    result of the previous one. Like render this runs in the worker processes.
+
+    Parameters
+    ----------
+    data : bytes
+        The image, in any format Pillow can read. Only the first frame of animations is used
+    names : Tuple[str, ...]
+        The names of the effects in the order they are applied, keys of EFFECTS
+    max_size : int, optional
+        Images bigger than this are scaled down first, by default 512
+    budget : Optional[float], optional
+        How many seconds of CPU time the effects can use, by default None which doesn't limit them
+
+    Returns
+    -------
+    Tuple[bytes, str]
+        The result and its format, png or gif if any of the effects is animated
+
+    Raises
+    ------
+    commands.BadArgument
+        The data is not a image
+    EffectBudgetExceeded
+        The effects used more than ``budget`` seconds of CPU time
+    """
+    start = time.process_time()
+
+    def check_budget() -> None:
+        # A effect can't be stopped halfway, so we check between effects and between the frames of animations
+        if budget is not None and time.process_time() - start > budget:
+            raise EffectBudgetExceeded(budget)
+
+    frames: Frames = _decode(data, max_size)
+    for name in names:
+        check_budget()
+        func = EFFECTS[name].func
+        if not isinstance(frames, list):
+            frames = func(frames)
+            continue
+        result = []
+        for index, frame in enumerate(frames):
+            check_budget()
+            applied = func(frame)
+            # A animated effect on a animation uses its own frame that matches the frame of the animation
+            result.append(applied[index % len(applied)] if isinstance(applied, list) else applied)
+        frames = result
+    check_budget()
+    return _encode(frames)
+
+
+def _decode(data: bytes, max_size: int) -> np.ndarray:
+    try:
+        image = Image.open(io.BytesIO(data))
+        # JPEGs can be decoded at a smaller size directly which is a lot faster than decoding and then resizing
+        image.draft("RGB", (max_size, max_size))
+        image = image.convert("RGBA")
+    except (UnidentifiedImageError, Image.DecompressionBombError, OSError) as exc:
+        raise commands.BadArgument("That is not a valid image") from exc
+    image.thumbnail((max_size, max_size))
+    return np.asarray(image)
+
+
+def _encode(frames: Frames) -> Tuple[bytes, str]:
+    buffer = io.BytesIO()
+    if isinstance(frames, list):
+        # Pillow's default quantizer takes seconds for a animation, the fast octree one takes milliseconds
+        images = [Image.fromarray(frame).convert("RGB").quantize(method=Image.Quantize.FASTOCTREE) for frame in frames]
+        images[0].save(buffer, format="gif", save_all=True, append_images=images[1:], duration=80, loop=0)
+        fmt = "gif"
+    else:
+        Image.fromarray(frames).save(buffer, format="png")
+        fmt = "png"
+    return buffer.getvalue(), fmt
+
+
+class ImageEffects:
+    """Renders the image effects of the Image cog.
+
+    The effects in EFFECTS are rendered locally in the worker processes so they
+    don't have to wait for dagpi to download, process and send back the image.
+    dagpi is still used for the effects we don't have, and for local effects if
+    rendering them fails.
+    """
+
+    def __init__(self, sources, pool, dagpi=None, *, cache=None, max_size: int = 512, chain_budget: float = 3.0):
+        """Makes a instance of ImageEffects
+
+        Parameters
+        ----------
+        sources : SourceImageCache
+            The cache the images are downloaded through
+        pool : ImageWorkerPool
+            The worker processes the effects are rendered in
+        dagpi : Optional[asyncdagpi.Client], optional
+            The dagpi client used as a fallback, by default None which disables the fallback
+        cache : Optional[RenderCache], optional
+            The cache of the results of the effects that always make the same image, by default None
+        max_size : int, optional
+            Images bigger than this are scaled down before the effect is applied, by default 512
+        chain_budget : float, optional
+            How many seconds of CPU time a chain of effects can use, by default 3
+        """
+        self.sources = sources
+        self.pool = pool
+        self.dagpi = dagpi
+        self.cache = cache
+        self.max_size = max_size
+        self.chain_budget = chain_budget
+        # Statistics
+        self.local = 0
+        self.local_seconds = 0.0
+        self.fallbacks = 0
+
+    @property
+    def stats(self) -> dict:
+        """How many images were rendered locally and how many by dagpi"""
+        return {
+            "local": self.local,
+            "average_local_seconds": self.local_seconds / self.local if self.local else 0.0,
+            "fallbacks": self.fallbacks,
+        }
+
+    async def process(
+        self,
+        name: str,
+        url: str,
+        *,
+        on_queued: Optional[Callable[[int], Awaitable[Any]]] = None,
+        **kwargs,
+    ) -> Tuple[io.BytesIO, str]:
+        """Applies a effect to the image at a url
+
+        The results of the local effects and of the dagpi features in DETERMINISTIC_DAGPI
+        are cached, so using the same effect on the same image again doesn't make it again.
+
+        Parameters
+        ----------
+        name : str
+            The name of the effect, a key of EFFECTS or the name of a asyncdagpi.ImageFeatures method
+        url : str
+            The url of the image
+        on_queued : Optional[Callable[[int], Awaitable[Any]]], optional
+            Called with the position in the queue if all the workers are busy, by default None
+        **kwargs
+            Extra arguments for dagpi, eg. the text of a meme
+
+        Returns
+        -------
+        Tuple[io.BytesIO, str]
+            The result and its format
+        """
+        local = EFFECTS.get(name)
+        if local is None and name not in DETERMINISTIC_DAGPI:
+            rendered = await self._render(name, url, on_queued=on_queued, **kwargs)
+            return io.BytesIO(rendered.data), rendered.fmt
+
+        # The local effects scale the image down so the size is part of the result
+        params = {"max_size": self.max_size} if local is not None else kwargs
+        return await self._cached(name, params, url, lambda: self._render(name, url, on_queued=on_queued, **kwargs))
+
+    async def chain(
+        self,
+        names: List[str],
+        url: str,
+        *,
+        on_queued: Optional[Callable[[int], Awaitable[Any]]] = None,
+    ) -> Tuple[io.BytesIO, str]:
+        """Applies several local effects to the image at a url one after the other
+
+        The image is decoded and encoded once for the whole chain instead of once for every
+        effect, and the effects are stopped if they use more than ``chain_budget`` seconds of CPU time.
+
+        Parameters
+        ----------
+        names : List[str]
+            The names of the effects in the order they are applied, keys of EFFECTS
+        url : str
+            The url of the image
+        on_queued : Optional[Callable[[int], Awaitable[Any]]], optional
+            Called with the position in the queue if all the workers are busy, by default None
+
+        Returns
+        -------
+        Tuple[io.BytesIO, str]
+            The result and its format
+
+        Raises
+        ------
+        commands.BadArgument
+            A effect doesn't exist or there are more than MAX_CHAIN effects
+        EffectBudgetExceeded
+            The effects used too much CPU time
+        """
+        unknown = [name for name in names if name not in EFFECTS]
+        if unknown:
+            raise commands.BadArgument(f"{', '.join(unknown)} can't be chained, the effects are {', '.join(EFFECTS)}")
+        if not 0 < len(names) <= MAX_CHAIN:
+            raise commands.BadArgument(f"Between 1 and {MAX_CHAIN} effects can be chained")
+
+        async def make() -> Rendered:
+            source = await self.sources.get(url)
+            start = time.perf_counter()
+            (data, fmt), cpu = await self.pool.run_timed(
+                render_chain, source, tuple(names), self.max_size, self.chain_budget, on_queued=on_queued
+            )
+            return Rendered(data, fmt, cpu, time.perf_counter() - start)
+
+        return await self._cached("chain", {"effects": names, "max_size": self.max_size}, url, make)
+
+    async def _cached(
+        self, name: str, params: Dict[str, Any], url: str, make: Callable[[], Awaitable[Rendered]]
+    ) -> Tuple[io.BytesIO, str]:
+        """Returns the cached result of a effect if there is one, otherwise makes and caches it"""
+        if self.cache is None:
+            rendered = await make()
+        else:
+            digest, _ = await self.sources.get_hashed(url)
+            key = self.cache.key_for(name, params, digest)
+            rendered = await self.cache.get(name, key)
+            if rendered is None:
+                rendered = await make()
+                await self.cache.put(key, rendered)
+        return io.BytesIO(rendered.data), rendered.fmt
+
+    async def _render(
+        self,
+        name: str,
+        url: str,
+        *,
+        on_queued: Optional[Callable[[int], Awaitable[Any]]] = None,
+        **kwargs,
+    ) -> Rendered:
+        local = EFFECTS.get(name)
+        if local is None:
+            return await self._dagpi(name, url, **kwargs)
+
+        source = await self.sources.get(url)
+        start = time.perf_counter()
+        try:
+            (data, fmt), cpu = await self.pool.run_timed(render, source, name, self.max_size, on_queued=on_queued)
+        except commands.CommandError:
+            # Invalid images and a full queue are not fixed by using dagpi
+            raise
+        except Exception as exc:
+            if self.dagpi is None or local.dagpi is None:
+                raise
+            print_error(f"Could not render {name} locally, using dagpi instead: {exc}")
+            self.fallbacks += 1
+            return await self._dagpi(local.dagpi, url, **kwargs)
+        seconds = time.perf_counter() - start
+        self.local += 1
+        self.local_seconds += seconds
+        return Rendered(data, fmt, cpu, seconds)
+
+    async def _dagpi(self, feature: str, url: str, **kwargs) -> Rendered:
+        import asyncdagpi
+
+        start = time.perf_counter()
+        image = await self.dagpi.image_process(getattr(asyncdagpi.ImageFeatures, feature)(), url=url, **kwargs)
+        # dagpi does the work so we didn't use any CPU time for it
+        return Rendered(image.image.getvalue(), image.format, 0.0, time.perf_counter() - start)
+
+
+def benchmark(size: int = 512, repeat: int = 5) -> List[Tuple[str, float, float, float]]:
+    """Measures how long each effect takes to render, without using the network
+
+    Parameters
+    ----------
+    size : int, optional
+        The width and height of the test image, by default 512
+    repeat : int, optional
+        How many times each effect is rendered, by default 5
+
+    Returns
+    -------
+    List[Tuple[str, float, float, float]]
+        The name of each effect, the fastest and average time of the effect alone and the
+        average time including decoding and encoding the image, in milliseconds
+    """
+    # A gradient with noise so the image isn't trivially compressible
+    rng = np.random.default_rng(0)
+    ys, xs = np.indices((size, size))
+    arr = np.dstack([xs * 255 // size, ys * 255 // size, (xs + ys) * 255 // (2 * size), np.full((size, size), 255)])
+    arr = np.clip(arr + rng.integers(-20, 20, arr.shape), 0, 255).astype(np.uint8)
+    buffer = io.BytesIO()
+    Image.fromarray(arr).save(buffer, format="png")
+    data = buffer.getvalue()
+
+    results = []
+    for name, local in EFFECTS.items():
+        effect_times, total_times = [], []
+        for _ in range(repeat):
+            start = time.perf_counter()
+            decoded = _decode(data, size)
+            before_effect = time.perf_counter()
+            frames = local.func(decoded)
+            after_effect = time.perf_counter()
+            _encode(frames)
+            effect_times.append((after_effect - before_effect) * 1000)
+            total_times.append((time.perf_counter() - start) * 1000)
+        results.append((name, min(effect_times), sum(effect_times) / repeat, sum(total_times) / repeat))
+    return results
+
+
+if __name__ == "__main__":
+    # python -m utils.effects
+    from tabulate import tabulate
+
+    print(
+        tabulate(
+            benchmark(),
+            headers=["Effect", "Fastest (ms)", "Average (ms)", "With decoding and encoding (ms)"],
+            floatfmt=".1f",
+        )
+    )
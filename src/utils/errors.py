@@ -4,7 +4,15 @@ import os
 import rich
 from discord.ext import commands
 
-__all__ = ("BlackListed", "NoAPIKey", "print_error")
+__all__ = (
+    "APIUnavailable",
+    "BlackListed",
+    "EffectBudgetExceeded",
+    "ImageQueueFull",
+    "NoAPIKey",
+    "QuotaExceeded",
+    "print_error",
+)
 
 
 class BlackListed(commands.CheckFailure):
@@ -15,6 +23,44 @@ class NoAPIKey(commands.CheckFailure):
     """The bot owner didn't setup a api key yet."""
 
 
+class APIUnavailable(commands.CommandError):
+    """A API that a command depends on is down or not responding."""
+
+    def __init__(self, host: str, retry_after: float = None):
+        self.host = host
+        self.retry_after = retry_after
+        super().__init__(f"{host} is not responding right now")
+
+
+class QuotaExceeded(commands.CommandError):
+    """The bot used up its quota of a API that a command depends on."""
+
+    def __init__(self, api: str, retry_after: float):
+        self.api = api
+        self.retry_after = retry_after
+        super().__init__(f"The quota of {api} is used up")
+
+
+class ImageQueueFull(commands.CommandError):
+    """Too many images are waiting to be processed already."""
+
+    def __init__(self, waiting: int):
+        self.waiting = waiting
+        super().__init__(f"{waiting} images are already waiting to be processed")
+
+
+class EffectBudgetExceeded(commands.CommandError):
+    """A chain of image effects used more CPU time than it is allowed to."""
+
+    def __init__(self, budget: float):
+        self.budget = budget
+        super().__init__(f"The effects took more than {budget} seconds")
+
+    def __reduce__(self):
+        # This is raised in the image worker processes, so it has to be pickled with the budget instead of the message
+        return type(self), (self.budget,)
+
+
 def print_error(error: str) -> None:
     """Prints a error with formatting
 
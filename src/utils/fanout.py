@@ -0,0 +1,148 @@
+"""File for running the upstream requests of a command concurrently."""
+import asyncio
+import time
+from typing import Any, Awaitable, Callable, Dict, Iterable, List, NamedTuple, Optional, Tuple
+
+from .errors import APIUnavailable
+
+__all__ = ("RequestGraph",)
+
+
+class _Node(NamedTuple):
+    func: Callable[..., Awaitable[Any]]
+    after: Tuple[str, ...]
+    optional: bool
+    host: Optional[str]
+
+
+class RequestGraph:
+    """A set of requests where some need the result of others.
+
+    Every request starts as soon as the requests it depends on are done, so
+    independent requests run at the same time. The whole graph has a deadline,
+    optional requests that fail or are not done by then are left out of the
+    results instead of failing the command.
+
+    Example
+    -------
+    .. code-block:: python
+
+        graph = RequestGraph(deadline=8)
+        graph.add("species", lambda: web.get_json(species_url), host="pokeapi.co")
+        graph.add("evolution", lambda species: web.get_json(species["evolution_chain"]["url"]), after=["species"])
+        graph.add("fact", lambda: web.get_json(fact_url), optional=True)
+        results = await graph.run()
+    """
+
+    def __init__(self, deadline: float = 10.0):
+        """Makes a instance of RequestGraph
+
+        Parameters
+        ----------
+        deadline : float, optional
+            How many seconds all the requests can take together, by default 10
+        """
+        self.deadline = deadline
+        self._nodes: Dict[str, _Node] = {}
+        # The optional requests that were left out of the last run
+        self.missing: List[str] = []
+        self.elapsed = 0.0
+
+    def add(
+        self,
+        name: str,
+        func: Callable[..., Awaitable[Any]],
+        *,
+        after: Iterable[str] = (),
+        optional: bool = False,
+        host: Optional[str] = None,
+    ) -> "RequestGraph":
+        """Adds a request to the graph
+
+        Parameters
+        ----------
+        name : str
+            The name of the request, its result has this key in the results
+        func : Callable[..., Awaitable[Any]]
+            The coroutine function that makes the request, it gets the results of
+            the requests in ``after`` as positional arguments
+        after : Iterable[str], optional
+            The requests that have to be done before this one starts, they must be added first
+        optional : bool, optional
+            If the command can be answered without this result, by default False
+        host : Optional[str], optional
+            The host the request is made to, it is shown to the user if the request times out.
+            By default None which shows the name of the request instead
+
+        Returns
+        -------
+        RequestGraph
+            The graph, so calls can be chained
+        """
+        after = tuple(after)
+        for dependency in after:
+            if dependency not in self._nodes:
+                raise ValueError(f"{name} depends on {dependency} which was not added before it")
+        self._nodes[name] = _Node(func, after, optional, host)
+        return self
+
+    async def run(self) -> Dict[str, Any]:
+        """Runs all the requests
+
+        Returns
+        -------
+        Dict[str, Any]
+            The result of each request, None for the optional requests that failed or timed out
+
+        Raises
+        ------
+        APIUnavailable
+            A request that is not optional did not finish before the deadline
+        """
+        start = time.monotonic()
+        tasks: Dict[str, asyncio.Task] = {}
+        for name, node in self._nodes.items():
+            tasks[name] = asyncio.create_task(self._run_node(node, [tasks[dep] for dep in node.after]))
+        required = {tasks[name] for name, node in self._nodes.items() if not node.optional}
+
+        pending = set(tasks.values())
+        try:
+            while pending:
+                timeout = start + self.deadline - time.monotonic()
+                if timeout <= 0:
+                    break
+                done, pending = await asyncio.wait(pending, timeout=timeout, return_when=asyncio.FIRST_COMPLETED)
+                for task in done:
+                    # A required request failing fails the whole graph right away
+                    if task in required and task.exception() is not None:
+                        # We retrieve the other errors so asyncio doesn't warn about them
+                        for other in done:
+                            other.exception()
+                        raise task.exception()
+        finally:
+            for task in pending:
+                task.cancel()
+        self.elapsed = time.monotonic() - start
+
+        # APIUnavailable is about hosts, so we use the hosts of the requests and not their names
+        timed_out = [
+            self._nodes[name].host or name for name, task in tasks.items() if task in pending and task in required
+        ]
+        if timed_out:
+            raise APIUnavailable(", ".join(dict.fromkeys(timed_out)))
+
+        results = {}
+        self.missing = []
+        for name, task in tasks.items():
+            if task in pending or task.exception() is not None:
+                results[name] = None
+                self.missing.append(name)
+            else:
+                results[name] = task.result()
+        return results
+
+    @staticmethod
+    async def _run_node(node: _Node, dependencies: List[asyncio.Task]) -> Any:
+        # If a dependency failed this raises the same error
+        args = [await dependency for dependency in dependencies]
+        return await node.func(*args)
@@ -7,7 +7,6 @@ import os
 import pprint
 import random
 import re
-from operator import attrgetter
 from typing import Any, AnyStr, Callable, Coroutine, Dict, Iterable, List, Union
 
 import discord
@@ -17,7 +16,8 @@ from discord.ext import commands
 from rich.console import Console
 from rich.syntax import Syntax
 
-from .classes import AttrDict, CustomEmojis
+from .classes import AttrDict
+from .config import EMOJIS
 
 VALID_JSON_TYPES = Union[str, int, bool, list, dict, None]
 
@@ -375,8 +375,7 @@ def get_custom_emoji(emoji: str) -> str:
     str
         The emoji that it got
     """
-    emoji_config = CustomEmojis.from_json(read_file("config/general/emojis.json"))
-    return attrgetter(emoji)(emoji_config)
+    return EMOJIS.lookup(emoji)
 
 
 def get_flag(flag: str) -> str:
@@ -443,8 +442,12 @@ async def get_image(
     # Check if it's a emoji
     if isinstance(item, str) and not is_image(item):
         item = f"https://twemoji.maxcdn.com/v/latest/72x72/{ord(item):x}.png"
-        # We return the item if it is valid
-        if (await ctx.bot.session.get(item)).status == 200:
+        # We return the item if it is valid, it goes through the image cache so the command doesn't download it again
+        try:
+            await ctx.bot.images.get(item)
+        except commands.BadArgument:
+            pass
+        else:
             return item
     # If the message is replying to another message
     if ctx.message.reference:
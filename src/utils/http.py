@@ -0,0 +1,561 @@
+"""File for the HTTP client that the cogs use to talk to other APIs."""
+import asyncio
+import contextlib
+import hashlib
+import json
+import email.utils
+import os
+import random
+import re
+import tempfile
+import threading
+import time
+from collections import OrderedDict
+from typing import Any, Dict, List, Mapping, Optional, Pattern, Tuple
+
+import aiohttp
+from yarl import URL
+
+from .errors import APIUnavailable, print_error
+from .quotas import QuotaManager
+
+__all__ = (
+    "CachedResponse",
+    "DEFAULT_HOST_LIMITS",
+    "DEFAULT_ROUTE_TIMEOUTS",
+    "DEFAULT_ROUTE_TTLS",
+    "HostState",
+    "WebClient",
+)
+
+# How long the responses of some routes can be cached for in seconds, the first pattern that matches the url is used.
+# Routes that are not here are not cached unless a ttl is passed to WebClient.get
+DEFAULT_ROUTE_TTLS: List[Tuple[Pattern, float]] = [
+    (re.compile(r"^https://owlbot\.info/api/v4/dictionary/"), 24 * 60 * 60),
+    (re.compile(r"^https://pypi\.org/pypi/"), 10 * 60),
+    (re.compile(r"^https://pypistats\.org/api/"), 60 * 60),
+    (re.compile(r"^https://api\.covid19api\.com/"), 10 * 60),
+    (re.compile(r"^https://api\.nasa\.gov/"), 60 * 60),
+    # These have a small quota so caching them matters more
+    (re.compile(r"^https?://www\.omdbapi\.com/"), 24 * 60 * 60),
+    (re.compile(r"^https://api\.tenor\.com/v1/search"), 60 * 60),
+    (re.compile(r"^https://gender-api\.com/get"), 30 * 24 * 60 * 60),
+]
+
+# How many requests can be made to a host at the same time, hosts that are not here use WebClient.default_host_limit
+DEFAULT_HOST_LIMITS: Dict[str, int] = {
+    "api.nasa.gov": 4,
+    "nekobot.xyz": 4,
+    "api.covid19api.com": 2,
+}
+
+# How many seconds requests to some routes can take, routes that are not here use WebClient.default_timeout
+DEFAULT_ROUTE_TIMEOUTS: List[Tuple[Pattern, float]] = [
+    (re.compile(r"^https://nekobot\.xyz/api/imagegen"), 20),
+    (re.compile(r"^https://api\.covid19api\.com/"), 15),
+    (re.compile(r"^https://api\.nasa\.gov/"), 15),
+]
+
+# The statuses that mean the request can be tried again later
+RETRY_STATUSES = frozenset({429, 500, 502, 503, 504})
+
+# The response headers that are kept in the cache
+_KEPT_HEADERS = ("Content-Type", "ETag", "Last-Modified")
+
+
+class CachedResponse:
+    """A response that was fully read, it can be stored in the cache and shared between requests."""
+
+    __slots__ = ("url", "status", "headers", "body", "expires_at")
+
+    def __init__(self, url: str, status: int, headers: Dict[str, str], body: bytes, expires_at: float = 0.0):
+        self.url = url
+        self.status = status
+        self.headers = headers
+        self.body = body
+        # A time.time() timestamp, after this the response needs to be revalidated
+        self.expires_at = expires_at
+
+    @property
+    def ok(self) -> bool:
+        """If the status is less than 400"""
+        return self.status < 400
+
+    @property
+    def size(self) -> int:
+        """A estimate of how many bytes this takes in memory"""
+        return len(self.body) + len(self.url) + sum(len(k) + len(v) for k, v in self.headers.items()) + 200
+
+    @property
+    def fresh(self) -> bool:
+        """If the response can be used without revalidating it"""
+        return time.time() < self.expires_at
+
+    def text(self, encoding: str = "utf-8") -> str:
+        """Returns the body as a string"""
+        return self.body.decode(encoding, errors="replace")
+
+    def json(self) -> Any:
+        """Returns the body parsed as json"""
+        return json.loads(self.body)
+
+    def to_bytes(self) -> bytes:
+        """Serializes the response for the disk cache"""
+        header = json.dumps(
+            {"url": self.url, "status": self.status, "headers": self.headers, "expires_at": self.expires_at}
+        )
+        return header.encode() + b"\n" + self.body
+
+    @classmethod
+    def from_bytes(cls, data: bytes) -> "CachedResponse":
+        """Deserializes a response from the disk cache"""
+        header, _, body = data.partition(b"\n")
+        meta = json.loads(header)
+        return cls(meta["url"], meta["status"], meta["headers"], body, meta["expires_at"])
+
+
+def _parse_retry_after(value: Optional[str]) -> Optional[float]:
+    """Converts a Retry-After header, which is either seconds or a date, to seconds"""
+    if value is None:
+        return None
+    try:
+        return max(float(value), 0.0)
+    except ValueError:
+        pass
+    try:
+        date = email.utils.parsedate_to_datetime(value)
+    except (TypeError, ValueError):
+        return None
+    return max(date.timestamp() - time.time(), 0.0)
+
+
+class HostState:
+    """The concurrency limit and circuit breaker of a host.
+
+    After ``failure_threshold`` failures in a row the circuit opens and requests
+    to the host fail immediately for ``reset_timeout`` seconds. After that one
+    failure is enough to open it again, and one success closes it.
+    """
+
+    __slots__ = ("semaphore", "failure_threshold", "reset_timeout", "failures", "opened_until", "times_opened")
+
+    def __init__(self, limit: int, failure_threshold: int, reset_timeout: float):
+        self.semaphore = asyncio.Semaphore(limit)
+        self.failure_threshold = failure_threshold
+        self.reset_timeout = reset_timeout
+        self.failures = 0
+        self.opened_until = 0.0
+        self.times_opened = 0
+
+    @property
+    def is_open(self) -> bool:
+        """If requests to the host should fail immediately"""
+        return time.monotonic() < self.opened_until
+
+    def check(self, host: str) -> None:
+        """Raises APIUnavailable if the circuit is open"""
+        remaining = self.opened_until - time.monotonic()
+        if remaining > 0:
+            raise APIUnavailable(host, remaining)
+
+    def record_success(self) -> None:
+        self.failures = 0
+
+    def record_failure(self) -> None:
+        self.failures += 1
+        if self.failures >= self.failure_threshold:
+            self.open_for(self.reset_timeout)
+
+    def open_for(self, seconds: float) -> None:
+        if not self.is_open:
+            self.times_opened += 1
+        self.opened_until = max(self.opened_until, time.monotonic() + seconds)
+
+
+class WebClient:
+    """A wrapper around a aiohttp.ClientSession that caches GET responses.
+
+    - Each route has a ttl (see DEFAULT_ROUTE_TTLS), responses of routes without a ttl are never cached
+    - Expired responses that have a ETag or Last-Modified header are revalidated with a conditional request
+    - Identical requests that are made at the same time share one request
+    - Responses are kept in memory up to a byte budget, and optionally on disk
+    - Each host has a limit on concurrent requests and a circuit breaker, each route has a timeout
+    - Requests to APIs with a quota (see utils.quotas) use a token from it, cache hits don't
+    - Timeouts, connection errors, 429 and 5xx responses are retried with a jittered exponential
+      backoff that respects the Retry-After header
+    """
+
+    def __init__(
+        self,
+        session: aiohttp.ClientSession,
+        *,
+        max_bytes: int = 32 * 1024 * 1024,
+        max_item_bytes: int = 2 * 1024 * 1024,
+        disk_path: Optional[str] = None,
+        max_disk_bytes: int = 256 * 1024 * 1024,
+        route_ttls: List[Tuple[Pattern, float]] = DEFAULT_ROUTE_TTLS,
+        host_limits: Dict[str, int] = DEFAULT_HOST_LIMITS,
+        default_host_limit: int = 8,
+        route_timeouts: List[Tuple[Pattern, float]] = DEFAULT_ROUTE_TIMEOUTS,
+        default_timeout: float = 10.0,
+        max_retries: int = 2,
+        base_backoff: float = 0.5,
+        max_backoff: float = 8.0,
+        max_retry_after: float = 10.0,
+        failure_threshold: int = 5,
+        reset_timeout: float = 30.0,
+        quotas: Optional[QuotaManager] = None,
+    ):
+        """Makes a instance of WebClient
+
+        Parameters
+        ----------
+        session : aiohttp.ClientSession
+            The session used to make the requests
+        max_bytes : int, optional
+            How many bytes of responses are kept in memory, by default 32 MiB
+        max_item_bytes : int, optional
+            Responses bigger than this are never cached, by default 2 MiB
+        disk_path : Optional[str], optional
+            The directory to store the responses in, by default None which disables the disk cache
+        max_disk_bytes : int, optional
+            How many bytes of responses are kept on disk, by default 256 MiB
+        route_ttls : List[Tuple[Pattern, float]], optional
+            The ttls for each route, by default DEFAULT_ROUTE_TTLS
+        host_limits : Dict[str, int], optional
+            How many requests can be made to each host at the same time, by default DEFAULT_HOST_LIMITS
+        default_host_limit : int, optional
+            The limit for hosts that are not in host_limits, by default 8
+        route_timeouts : List[Tuple[Pattern, float]], optional
+            The timeouts for each route, by default DEFAULT_ROUTE_TIMEOUTS
+        default_timeout : float, optional
+            The timeout for routes that are not in route_timeouts, by default 10 seconds
+        max_retries : int, optional
+            How many times a failed request is retried, by default 2
+        base_backoff : float, optional
+            The backoff of the first retry in seconds, it doubles for every retry, by default 0.5
+        max_backoff : float, optional
+            The maximum backoff in seconds, by default 8
+        max_retry_after : float, optional
+            If a Retry-After header asks us to wait longer than this we don't retry, by default 10 seconds
+        failure_threshold : int, optional
+            How many failures in a row open the circuit breaker of a host, by default 5
+        reset_timeout : float, optional
+            How many seconds the circuit breaker stays open for, by default 30
+        quotas : Optional[QuotaManager], optional
+            The quotas of the APIs that have one, by default None which doesn't limit anything
+        """
+        self.session = session
+        self.max_bytes = max_bytes
+        self.max_item_bytes = max_item_bytes
+        self.disk_path = disk_path
+        self.max_disk_bytes = max_disk_bytes
+        self.route_ttls = route_ttls
+        self.host_limits = host_limits
+        self.default_host_limit = default_host_limit
+        self.route_timeouts = route_timeouts
+        self.default_timeout = default_timeout
+        self.max_retries = max_retries
+        self.base_backoff = base_backoff
+        self.max_backoff = max_backoff
+        self.max_retry_after = max_retry_after
+        self.failure_threshold = failure_threshold
+        self.reset_timeout = reset_timeout
+        self.quotas = quotas
+        self._hosts: Dict[str, HostState] = {}
+        self._memory = OrderedDict()
+        self._memory_bytes = 0
+        self._disk_bytes = None
+        # The disk is written to from several threads, this keeps _disk_bytes and the files in sync
+        self._disk_lock = threading.Lock()
+        self._in_flight: Dict[str, asyncio.Task] = {}
+        if disk_path is not None:
+            os.makedirs(disk_path, exist_ok=True)
+        # Statistics
+        self.hits = 0
+        self.disk_hits = 0
+        self.misses = 0
+        self.revalidations = 0
+        self.coalesced = 0
+        self.retries = 0
+
+    @property
+    def stats(self) -> dict:
+        """The size and hit counts of the cache"""
+        return {
+            "entries": len(self._memory),
+            "bytes": self._memory_bytes,
+            "hits": self.hits,
+            "disk_hits": self.disk_hits,
+            "misses": self.misses,
+            "revalidations": self.revalidations,
+            "coalesced": self.coalesced,
+            "retries": self.retries,
+            "open_circuits": [host for host, state in self._hosts.items() if state.is_open],
+        }
+
+    def ttl_for(self, url: str) -> float:
+        """Returns how long the response of the url can be cached for"""
+        for pattern, ttl in self.route_ttls:
+            if pattern.match(url):
+                return ttl
+        return 0
+
+    async def get(
+        self,
+        url: str,
+        *,
+        params: Optional[Mapping[str, Any]] = None,
+        headers: Optional[Mapping[str, str]] = None,
+        ttl: Optional[float] = None,
+    ) -> CachedResponse:
+        """Makes a GET request, using the cache if possible
+
+        Parameters
+        ----------
+        url : str
+            The url to request
+        params : Optional[Mapping[str, Any]], optional
+            The query parameters, by default None
+        headers : Optional[Mapping[str, str]], optional
+            The request headers, by default None
+        ttl : Optional[float], optional
+            How long the response can be cached for in seconds, by default the ttl of the route.
+            Use 0 for routes that return something different every time
+
+        Returns
+        -------
+        CachedResponse
+            The response
+        """
+        full_url = str(URL(url).update_query(params)) if params else url
+        if ttl is None:
+            ttl = self.ttl_for(full_url)
+        if ttl <= 0:
+            return await self._fetch(full_url, headers, ttl)
+
+        key = self._make_key(full_url, headers)
+        cached = await self._lookup(key)
+        if cached is not None and cached.fresh:
+            self.hits += 1
+            return cached
+
+        # If the same request is already being made we wait for that one instead
+        in_flight = self._in_flight.get(key)
+        if in_flight is not None:
+            self.coalesced += 1
+        else:
+            in_flight = asyncio.create_task(self._fetch_and_store(key, full_url, headers, ttl, cached))
+            self._in_flight[key] = in_flight
+            in_flight.add_done_callback(lambda task: self._fetch_done(key, task))
+        # The request runs in its own task so one caller being cancelled doesn't cancel it for the others
+        return await asyncio.shield(in_flight)
+
+    async def get_json(self, url: str, **kwargs) -> Any:
+        """Same as WebClient.get but returns the body parsed as json"""
+        return (await self.get(url, **kwargs)).json()
+
+    async def get_text(self, url: str, **kwargs) -> str:
+        """Same as WebClient.get but returns the body as a string"""
+        return (await self.get(url, **kwargs)).text()
+
+    def timeout_for(self, url: str) -> float:
+        """Returns how many seconds a request to the url can take"""
+        for pattern, timeout in self.route_timeouts:
+            if pattern.match(url):
+                return timeout
+        return self.default_timeout
+
+    def host_state(self, host: str) -> "HostState":
+        """Returns the concurrency limit and circuit breaker of a host"""
+        state = self._hosts.get(host)
+        if state is None:
+            limit = self.host_limits.get(host, self.default_host_limit)
+            state = self._hosts[host] = HostState(limit, self.failure_threshold, self.reset_timeout)
+        return state
+
+    async def _fetch(
+        self,
+        url: str,
+        headers: Optional[Mapping[str, str]],
+        ttl: float,
+        *,
+        stale: Optional[CachedResponse] = None,
+    ) -> CachedResponse:
+        """Makes the actual request, revalidating the stale response if there is one
+
+        Failed requests are retried with a exponential backoff, and requests to hosts
+        that are known to be down fail immediately with APIUnavailable.
+        """
+        request_headers = dict(headers or {})
+        if stale is not None:
+            if "ETag" in stale.headers:
+                request_headers["If-None-Match"] = stale.headers["ETag"]
+            if "Last-Modified" in stale.headers:
+                request_headers["If-Modified-Since"] = stale.headers["Last-Modified"]
+
+        host = URL(url).host
+        state = self.host_state(host)
+        quota = self.quotas.for_host(host) if self.quotas is not None else None
+        timeout = aiohttp.ClientTimeout(total=self.timeout_for(url))
+        attempt = 0
+        while True:
+            state.check(host)
+            if quota is not None:
+                # Retries count against the quota too
+                await quota.acquire()
+            try:
+                async with state.semaphore:
+                    async with self.session.get(
+                        url, headers=request_headers, timeout=timeout, allow_redirects=True
+                    ) as response:
+                        retry_after = _parse_retry_after(response.headers.get("Retry-After"))
+                        if quota is not None:
+                            quota.update(response.status, response.headers)
+                        if response.status not in RETRY_STATUSES:
+                            state.record_success()
+                            return await self._read(url, response, ttl, stale)
+
+                        if response.status >= 500:
+                            state.record_failure()
+                        elif retry_after is not None and retry_after > self.max_retry_after:
+                            # The host told us to wait longer than we are willing to, so we stop sending requests until then
+                            state.open_for(retry_after)
+                        if attempt >= self.max_retries or (retry_after or 0) > self.max_retry_after:
+                            return await self._read(url, response, ttl, stale)
+            except (asyncio.TimeoutError, aiohttp.ClientConnectionError) as exc:
+                state.record_failure()
+                if attempt >= self.max_retries:
+                    raise APIUnavailable(host) from exc
+                retry_after = None
+
+            # We wait outside of the semaphore so other requests to the host can be made in the meantime
+            self.retries += 1
+            await asyncio.sleep(retry_after if retry_after is not None else self._backoff(attempt))
+            attempt += 1
+
+    def _backoff(self, attempt: int) -> float:
+        """Exponential backoff with full jitter"""
+        return random.uniform(0, min(self.max_backoff, self.base_backoff * 2**attempt))
+
+    async def _read(
+        self, url: str, response: aiohttp.ClientResponse, ttl: float, stale: Optional[CachedResponse]
+    ) -> CachedResponse:
+        if response.status == 304 and stale is not None:
+            self.revalidations += 1
+            stale.expires_at = time.time() + ttl
+            return stale
+        self.misses += 1
+        body = await response.read()
+        kept_headers = {name: response.headers[name] for name in _KEPT_HEADERS if name in response.headers}
+        return CachedResponse(url, response.status, kept_headers, body, time.time() + ttl)
+
+    async def _fetch_and_store(
+        self, key: str, url: str, headers: Optional[Mapping[str, str]], ttl: float, stale: Optional[CachedResponse]
+    ) -> CachedResponse:
+        response = await self._fetch(url, headers, ttl, stale=stale)
+        if response.status == 200:
+            await self._store(key, response)
+        return response
+
+    def _fetch_done(self, key: str, task: asyncio.Task) -> None:
+        del self._in_flight[key]
+        if not task.cancelled():
+            # We retrieve the exception so asyncio doesn't warn about it if every caller was cancelled
+            task.exception()
+
+    @staticmethod
+    def _make_key(url: str, headers: Optional[Mapping[str, str]]) -> str:
+        # The headers are part of the key because things like api keys can change the response
+        raw = url + "\n" + "\n".join(f"{k}:{v}" for k, v in sorted((headers or {}).items()))
+        return hashlib.sha256(raw.encode()).hexdigest()
+
+    async def _lookup(self, key: str) -> Optional[CachedResponse]:
+        response = self._memory.get(key)
+        if response is not None:
+            self._memory.move_to_end(key)
+            return response
+        if self.disk_path is None:
+            return None
+        response = await asyncio.to_thread(self._read_disk, key)
+        if response is not None:
+            self.disk_hits += 1
+            self._remember(key, response)
+        return response
+
+    async def _store(self, key: str, response: CachedResponse) -> None:
+        if response.size > self.max_item_bytes:
+            return
+        self._remember(key, response)
+        if self.disk_path is not None:
+            try:
+                await asyncio.to_thread(self._write_disk, key, response)
+            except OSError as exc:
+                # The request already succeeded so not being able to cache it doesn't fail it
+                print_error(f"Could not write a cached response: {exc}")
+
+    def _remember(self, key: str, response: CachedResponse) -> None:
+        old = self._memory.pop(key, None)
+        if old is not None:
+            self._memory_bytes -= old.size
+        self._memory[key] = response
+        self._memory_bytes += response.size
+        while self._memory_bytes > self.max_bytes and len(self._memory) > 1:
+            _, evicted = self._memory.popitem(last=False)
+            self._memory_bytes -= evicted.size
+
+    def _read_disk(self, key: str) -> Optional[CachedResponse]:
+        try:
+            with open(os.path.join(self.disk_path, key), "rb") as f:
+                return CachedResponse.from_bytes(f.read())
+        except FileNotFoundError:
+            return None
+        except (OSError, ValueError) as exc:
+            print_error(f"Could not read a cached response: {exc}")
+            return None
+
+    def _write_disk(self, key: str, response: CachedResponse) -> None:
+        path = os.path.join(self.disk_path, key)
+        data = response.to_bytes()
+        # We write to a temporary file first so a half written file is never read,
+        # every write has its own since the same response can be written by two requests at once
+        fd, temp_path = tempfile.mkstemp(suffix=".tmp", dir=self.disk_path)
+        try:
+            with os.fdopen(fd, "wb") as f:
+                f.write(data)
+            with self._disk_lock:
+                try:
+                    replaced = os.stat(path).st_size
+                except FileNotFoundError:
+                    replaced = 0
+                os.replace(temp_path, path)
+                if self._disk_bytes is None:
+                    self._disk_bytes = sum(entry.stat().st_size for entry in self._disk_entries())
+                else:
+                    # Overwriting a response only adds the difference in size
+                    self._disk_bytes += len(data) - replaced
+                if self._disk_bytes > self.max_disk_bytes:
+                    self._prune_disk()
+        except BaseException:
+            with contextlib.suppress(OSError):
+                os.remove(temp_path)
+            raise
+
+    def _disk_entries(self) -> List[os.DirEntry]:
+        # The temporary files are still being written so they are not part of the cache yet
+        return [entry for entry in os.scandir(self.disk_path) if not entry.name.endswith(".tmp")]
+
+    def _prune_disk(self) -> None:
+        """Removes the least recently used files until the disk cache is 80% of its budget"""
+        entries = sorted(self._disk_entries(), key=lambda entry: entry.stat().st_atime)
+        total = sum(entry.stat().st_size for entry in entries)
+        for entry in entries:
+            if total <= self.max_disk_bytes * 0.8:
+                break
+            size = entry.stat().st_size
+            try:
+                os.remove(entry.path)
+            except OSError:
+                continue
+            total -= size
+        self._disk_bytes = total
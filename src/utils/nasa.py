@@ -0,0 +1,205 @@
+"""File for the NASA API client that keeps the responses for past dates forever."""
+import datetime
+import json
+import random
+import time
+from typing import Any, Dict, Optional, Tuple
+
+from .caches import DiskStore
+from .errors import APIUnavailable
+
+__all__ = ("NASA",)
+
+BASE_URL = "https://api.nasa.gov/"
+
+
+class NASA:
+    """A client for the NASA APIs that the Space cog uses.
+
+    Responses for past dates never change so they are stored on disk forever
+    and only cost one request of the api key's quota. Responses for today can
+    still change so the WebClient only caches them for ``today_ttl`` seconds.
+
+    For the mars rover photos the manifest of each rover (how many photos were
+    taken on each sol) is stored, and so are the photos of every sol that was
+    fetched. Random photos are mostly picked from the sols that are already
+    stored, so after a while most random picks don't make any request.
+    """
+
+    def __init__(
+        self,
+        web,
+        api_key: str,
+        path: str = "cache/nasa.sqlite3",
+        *,
+        today_ttl: float = 10 * 60,
+        manifest_ttl: float = 24 * 60 * 60,
+        prefer_stored: float = 0.9,
+        min_stored_sols: int = 20,
+    ):
+        """Makes a instance of NASA
+
+        Parameters
+        ----------
+        web : WebClient
+            The client used to make the requests
+        api_key : str
+            The api key to use
+        path : str, optional
+            The path of the sqlite database, by default cache/nasa.sqlite3
+        today_ttl : float, optional
+            How many seconds the responses for today are cached for, by default 10 minutes
+        manifest_ttl : float, optional
+            How many seconds the manifest of a active rover is kept before it is fetched again, by default 1 day
+        prefer_stored : float, optional
+            The chance of a random rover photo being picked from the sols that are already stored, by default 90%
+        min_stored_sols : int, optional
+            How many sols of a rover need to be stored before prefer_stored is used, by default 20
+        """
+        self.web = web
+        self.api_key = api_key
+        self.store = DiskStore(path)
+        self.today_ttl = today_ttl
+        self.manifest_ttl = manifest_ttl
+        self.prefer_stored = prefer_stored
+        self.min_stored_sols = min_stored_sols
+        # The sols of each rover that are stored, and how many photos each of them has
+        self._stored_sols: Dict[str, Dict[int, int]] = {}
+        # Statistics
+        self.store_hits = 0
+        self.requests = 0
+
+    @staticmethod
+    def is_final(date: Optional[datetime.date]) -> bool:
+        """If the responses for a date can't change anymore"""
+        # NASA uses US time for the dates so we wait a extra day before trusting a date
+        today = datetime.datetime.now(datetime.timezone.utc).date()
+        return date is not None and date < today - datetime.timedelta(days=1)
+
+    async def apod(self, date: Optional[datetime.date] = None) -> Optional[Any]:
+        """Returns the astronomy picture of the day of a date, by default today"""
+        params = {"date": date.isoformat()} if date else {}
+        return await self._get(f"apod:{date}", "planetary/apod", params, date)
+
+    async def neo_feed(self, date: Optional[datetime.date] = None) -> Optional[Any]:
+        """Returns the near earth objects of a date, by default the week starting today"""
+        params = {"start_date": date.isoformat(), "end_date": date.isoformat()} if date else {}
+        return await self._get(f"neo:{date}", "neo/rest/v1/feed", params, date)
+
+    async def epic(self, collection: str, date: Optional[datetime.date] = None) -> Optional[Any]:
+        """Returns the EPIC images of a collection (eg. ``natural``) taken on a date, by default the latest ones"""
+        if date is None:
+            return await self._get(None, f"EPIC/api/{collection}", {}, None)
+        return await self._get(f"epic:{collection}:{date}", f"EPIC/api/{collection}/date/{date}", {}, date)
+
+    async def rover_manifest(self, rover: str) -> Any:
+        """Returns the manifest of a mars rover, which has how many photos were taken on each sol"""
+        key = f"mars:{rover}:manifest"
+        stored = await self.store.get(key)
+        if stored is not None:
+            stored = json.loads(stored)
+            manifest = stored["manifest"]
+            # The rovers that aren't active anymore will never take more photos
+            if manifest["status"] != "active" or time.time() - stored["fetched_at"] < self.manifest_ttl:
+                self.store_hits += 1
+                return manifest
+        try:
+            manifest = (await self._request(f"mars-photos/api/v1/manifests/{rover}", {}, 0))["photo_manifest"]
+        except APIUnavailable:
+            # A old manifest is better than nothing
+            if stored is not None:
+                return stored["manifest"]
+            raise
+        await self.store.set(key, json.dumps({"fetched_at": time.time(), "manifest": manifest}))
+        return manifest
+
+    async def rover_photos(self, rover: str, sol: int) -> Any:
+        """Returns the rover and the photos it took on a sol"""
+        key = f"mars:{rover}:sol:{sol}"
+        stored = await self.store.get(key)
+        if stored is not None:
+            self.store_hits += 1
+            return json.loads(stored)
+
+        manifest = await self.rover_manifest(rover)
+        resp = await self._request(f"mars-photos/api/v1/rovers/{rover}/photos", {"sol": sol}, 0)
+        # The rover is the same for every photo so we only keep it once
+        photos = resp["photos"] if resp else []
+        data = {
+            "rover": photos[0]["rover"] if photos else None,
+            "photos": [
+                {
+                    "id": photo["id"],
+                    "img_src": photo["img_src"],
+                    "earth_date": photo["earth_date"],
+                    "camera": {"name": photo["camera"]["name"], "full_name": photo["camera"]["full_name"]},
+                }
+                for photo in photos
+            ],
+        }
+        # A active rover can still send photos of its latest sol
+        if manifest["status"] != "active" or sol < manifest["max_sol"]:
+            await self.store.set(key, json.dumps(data))
+            (await self._sols(rover))[sol] = len(photos)
+        return data
+
+    async def random_rover_photos(self, rover: str) -> Tuple[int, Any]:
+        """Returns a random sol of a rover and the photos it took on that sol
+
+        Sols are picked with a chance proportional to how many photos they have
+        so sols without photos are never picked.
+        """
+        stored = await self._sols(rover)
+        stored = {sol: count for sol, count in stored.items() if count}
+        if len(stored) >= self.min_stored_sols and random.random() < self.prefer_stored:
+            sol = random.choices(list(stored), weights=list(stored.values()))[0]
+        else:
+            manifest = await self.rover_manifest(rover)
+            sols = [entry for entry in manifest["photos"] if entry["total_photos"]]
+            sol = random.choices(sols, weights=[entry["total_photos"] for entry in sols])[0]["sol"]
+        return sol, await self.rover_photos(rover, sol)
+
+    @property
+    def stats(self) -> dict:
+        """How many responses were served from the store and how many requests were made"""
+        return {
+            "store_hits": self.store_hits,
+            "requests": self.requests,
+            "stored_sols": {rover: len(sols) for rover, sols in self._stored_sols.items()},
+        }
+
+    def close(self) -> None:
+        """Closes the database"""
+        self.store.close()
+
+    async def _sols(self, rover: str) -> Dict[int, int]:
+        sols = self._stored_sols.get(rover)
+        if sols is None:
+            sols = self._stored_sols[rover] = {}
+            prefix = f"mars:{rover}:sol:"
+            for key in await self.store.keys(prefix):
+                sols[int(key[len(prefix) :])] = len(json.loads(await self.store.get(key))["photos"])
+        return sols
+
+    async def _get(self, key: Optional[str], path: str, params: dict, date: Optional[datetime.date]) -> Optional[Any]:
+        """Returns a response from the store if the date is final, otherwise makes the request"""
+        final = key is not None and self.is_final(date)
+        if final:
+            stored = await self.store.get(key)
+            if stored is not None:
+                self.store_hits += 1
+                return json.loads(stored)
+        data = await self._request(path, params, 0 if final else self.today_ttl)
+        if final and data is not None:
+            await self.store.set(key, json.dumps(data))
+        return data
+
+    async def _request(self, path: str, params: dict, ttl: float) -> Optional[Any]:
+        """Makes a request, returns None if NASA says the request is invalid (eg. a date before the first APOD)"""
+        self.requests += 1
+        response = await self.web.get(BASE_URL + path, params={**params, "api_key": self.api_key}, ttl=ttl)
+        if response.status in (400, 404):
+            return None
+        if response.status != 200:
+            raise APIUnavailable("api.nasa.gov")
+        return response.json()
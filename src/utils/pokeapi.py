@@ -0,0 +1,181 @@
+"""File for the local cache of PokeAPI resources."""
+import asyncio
+import difflib
+import json
+from typing import Any, List, Optional, Tuple
+
+from .caches import DiskStore, ExpiringLRU
+from .errors import APIUnavailable, print_error
+
+__all__ = ("PokeAPI",)
+
+BASE_URL = "https://pokeapi.co/api/v2/"
+# Big enough to list every resource of a kind in one page
+_ALL = "?limit=100000"
+
+
+class PokeAPI:
+    """A PokeAPI client that keeps every resource it fetched in a sqlite database.
+
+    PokeAPI data practically never changes so the resources are kept forever,
+    after the first lookup a resource is served from memory or from disk. The
+    names of all the pokemon are kept too so misspelled names can be suggested
+    without asking PokeAPI.
+    """
+
+    def __init__(self, web, path: str = "cache/pokeapi.sqlite3", *, memory_size: int = 64):
+        """Makes a instance of PokeAPI
+
+        Parameters
+        ----------
+        web : WebClient
+            The client used to fetch the resources that are not cached yet
+        path : str, optional
+            The path of the sqlite database, by default cache/pokeapi.sqlite3
+        memory_size : int, optional
+            How many parsed resources are kept in memory, by default 64.
+            Some resources like pokemon are a few hundred KB each so this is small
+        """
+        self.web = web
+        self.store = DiskStore(path)
+        self._memory = ExpiringLRU(memory_size)
+        self._names: Optional[List[str]] = None
+        self._names_lock = asyncio.Lock()
+        # Statistics
+        self.disk_hits = 0
+        self.fetches = 0
+        self.preloaded = 0
+
+    @property
+    def stats(self) -> dict:
+        """The hit counts of the cache"""
+        return {
+            "memory": self._memory.stats,
+            "disk_hits": self.disk_hits,
+            "fetches": self.fetches,
+            "preloaded": self.preloaded,
+        }
+
+    async def get(self, resource: str) -> Optional[Any]:
+        """Gets a resource, from the cache if possible
+
+        Parameters
+        ----------
+        resource : str
+            The url of the resource or its path relative to the api, eg. ``pokemon/pikachu``
+
+        Returns
+        -------
+        Optional[Any]
+            The resource parsed as json, None if it doesn't exist
+
+        Raises
+        ------
+        APIUnavailable
+            The resource is not cached and PokeAPI is not working
+        """
+        url = self._normalize(resource)
+        data = self._memory.get(url)
+        if data is not None:
+            return data
+
+        body = await self.store.get(url)
+        if body is not None:
+            self.disk_hits += 1
+        else:
+            # The WebClient doesn't need to cache it too
+            response = await self.web.get(url, ttl=0)
+            if response.status == 404:
+                return None
+            if response.status != 200:
+                raise APIUnavailable("pokeapi.co")
+            self.fetches += 1
+            body = response.text()
+            await self.store.set(url, body)
+
+        data = json.loads(body)
+        self._memory[url] = data
+        return data
+
+    async def names(self) -> List[str]:
+        """Returns the names of all the pokemon, including forms like deoxys-attack"""
+        async with self._names_lock:
+            if self._names is None:
+                listing = await self.get("pokemon" + _ALL)
+                self._names = [result["name"] for result in listing["results"]] if listing else []
+        return self._names
+
+    async def suggest(self, name: str, limit: int = 3) -> List[str]:
+        """Returns the pokemon names that are the closest to a name
+
+        Parameters
+        ----------
+        name : str
+            The misspelled name
+        limit : int, optional
+            The maximum amount of names to return, by default 3
+
+        Returns
+        -------
+        List[str]
+            The closest names, the closest one first
+        """
+        return difflib.get_close_matches(name.lower(), await self.names(), n=limit, cutoff=0.6)
+
+    async def preload(
+        self, kinds: Tuple[str, ...] = ("pokemon", "pokemon-species", "evolution-chain"), *, concurrency: int = 4
+    ) -> Tuple[int, int]:
+        """Fetches every resource of some kinds that is not cached yet
+
+        The resources are stored under the same urls the pokedex command uses, eg.
+        ``pokemon/pikachu``. Evolution chains don't have names so they use the url the
+        species link to.
+
+        Parameters
+        ----------
+        kinds : Tuple[str, ...], optional
+            The kinds of resources to fetch, by default pokemon, species and evolution chains
+        concurrency : int, optional
+            How many resources are fetched at the same time, by default 4
+
+        Returns
+        -------
+        Tuple[int, int]
+            How many resources were fetched and how many could not be fetched
+        """
+        cached = await self.store.keys(BASE_URL)
+        missing = []
+        for kind in kinds:
+            listing = await self.get(kind + _ALL)
+            for result in listing["results"] if listing else []:
+                url = self._normalize(f"{kind}/{result['name']}" if "name" in result else result["url"])
+                if url not in cached:
+                    missing.append(url)
+        semaphore = asyncio.Semaphore(concurrency)
+
+        async def fetch(url: str) -> None:
+            async with semaphore:
+                # We don't use get since the preloaded resources don't need to be parsed or kept in memory
+                response = await self.web.get(url, ttl=0)
+                if response.status != 200:
+                    raise APIUnavailable("pokeapi.co")
+                await self.store.set(url, response.text())
+                self.fetches += 1
+                self.preloaded += 1
+
+        # One resource failing doesn't stop the others, they are fetched next time
+        results = await asyncio.gather(*(fetch(url) for url in missing), return_exceptions=True)
+        failures = [result for result in results if isinstance(result, Exception)]
+        if failures:
+            print_error(f"Could not preload {len(failures)} PokeAPI resources, eg. {failures[0]!r}")
+        return len(missing) - len(failures), len(failures)
+
+    def close(self) -> None:
+        """Closes the database"""
+        self.store.close()
+
+    @staticmethod
+    def _normalize(resource: str) -> str:
+        # Urls in PokeAPI responses end with a slash but the ones we build don't
+        url = resource if resource.startswith("http") else BASE_URL + resource.lstrip("/")
+        return url.rstrip("/")
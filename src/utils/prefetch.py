@@ -0,0 +1,188 @@
+"""File for the pools of prefetched results that the random content commands reply from."""
+import asyncio
+import time
+from collections import deque
+from typing import Any, Awaitable, Callable, Dict, Optional
+
+from .errors import print_error
+
+__all__ = ("PrefetchManager", "PrefetchPool")
+
+
+class PrefetchPool:
+    """A small queue of results that is refilled in the background.
+
+    Commands take a result from the queue so they don't have to wait for the
+    upstream API, if the queue is empty the result is fetched like before.
+    A result is only fetched to replace one that was taken, with at least
+    ``interval`` seconds between two fetches, so a idle pool makes no requests.
+    """
+
+    def __init__(
+        self,
+        name: str,
+        fetch: Callable[[], Awaitable[Any]],
+        *,
+        size: int = 5,
+        interval: float = 1.0,
+        max_age: Optional[float] = 60 * 60,
+    ):
+        """Makes a instance of PrefetchPool
+
+        Parameters
+        ----------
+        name : str
+            The name of the pool, used in the stats and errors
+        fetch : Callable[[], Awaitable[Any]]
+            The coroutine function that fetches a single result
+        size : int, optional
+            How many results are kept ready, by default 5
+        interval : float, optional
+            The minimum amount of seconds between two background fetches, by default 1
+        max_age : Optional[float], optional
+            Results older than this many seconds are thrown away, by default 1 hour
+        """
+        self.name = name
+        self.fetch = fetch
+        self.size = size
+        self.interval = interval
+        self.max_age = max_age
+        self._items = deque()
+        # When each of the results that haven't been replaced yet were taken, for the refill lag
+        self._taken_at = deque(maxlen=size)
+        self._space = asyncio.Event()
+        self._task = None
+        # Statistics
+        self.hits = 0
+        self.misses = 0
+        self.expired = 0
+        self.refills = 0
+        self.failures = 0
+        self.last_refill_lag = 0.0
+        self._total_refill_lag = 0.0
+        self._refill_lag_samples = 0
+
+    def __len__(self) -> int:
+        return len(self._items)
+
+    def start(self) -> None:
+        """Starts refilling the pool in the background"""
+        if self._task is None or self._task.done():
+            self._task = asyncio.create_task(self._refill_loop())
+
+    def stop(self) -> None:
+        """Stops refilling the pool"""
+        if self._task is not None:
+            self._task.cancel()
+            self._task = None
+
+    async def get(self) -> Any:
+        """Returns a prefetched result, or fetches one if there are none ready"""
+        now = time.monotonic()
+        while self._items:
+            item, fetched_at = self._items.popleft()
+            self._taken_at.append(now)
+            self._space.set()
+            if self.max_age is None or now - fetched_at <= self.max_age:
+                self.hits += 1
+                return item
+            self.expired += 1
+        self.misses += 1
+        return await self.fetch()
+
+    @property
+    def stats(self) -> dict:
+        """The hit rate and refill lag of the pool"""
+        requests = self.hits + self.misses
+        return {
+            "ready": len(self._items),
+            "size": self.size,
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_rate": self.hits / requests if requests else 0.0,
+            "expired": self.expired,
+            "refills": self.refills,
+            "failures": self.failures,
+            "last_refill_lag": self.last_refill_lag,
+            "average_refill_lag": (
+                self._total_refill_lag / self._refill_lag_samples if self._refill_lag_samples else 0.0
+            ),
+        }
+
+    async def _refill_loop(self) -> None:
+        failures = 0
+        while True:
+            while len(self._items) >= self.size:
+                self._space.clear()
+                await self._space.wait()
+            try:
+                item = await self.fetch()
+            except Exception as exc:
+                failures += 1
+                self.failures += 1
+                if failures == 1:
+                    print_error(f"Could not prefetch {self.name}: {exc}")
+                # We back off while the upstream is failing so we don't add to its problems
+                await asyncio.sleep(min(self.interval * 2**failures, 300))
+                continue
+            failures = 0
+            now = time.monotonic()
+            self._items.append((item, now))
+            self.refills += 1
+            if self._taken_at:
+                self.last_refill_lag = now - self._taken_at.popleft()
+                self._total_refill_lag += self.last_refill_lag
+                self._refill_lag_samples += 1
+            await asyncio.sleep(self.interval)
+
+
+class PrefetchManager:
+    """Keeps every PrefetchPool of the bot by name so their stats can be seen in one place."""
+
+    def __init__(self):
+        self.pools: Dict[str, PrefetchPool] = {}
+
+    def __getitem__(self, name: str) -> PrefetchPool:
+        return self.pools[name]
+
+    def add(self, name: str, fetch: Callable[[], Awaitable[Any]], **kwargs) -> PrefetchPool:
+        """Makes a pool and starts refilling it, a existing pool with the same name is replaced
+
+        Parameters
+        ----------
+        name : str
+            The name of the pool
+        fetch : Callable[[], Awaitable[Any]]
+            The coroutine function that fetches a single result
+        **kwargs
+            Passed to PrefetchPool
+
+        Returns
+        -------
+        PrefetchPool
+            The pool that was made
+        """
+        self.remove(name)
+        pool = self.pools[name] = PrefetchPool(name, fetch, **kwargs)
+        pool.start()
+        return pool
+
+    def remove(self, name: str) -> None:
+        """Stops and removes a pool if it exists"""
+        pool = self.pools.pop(name, None)
+        if pool is not None:
+            pool.stop()
+
+    async def get(self, name: str) -> Any:
+        """Returns a result from the pool with the name"""
+        return await self.pools[name].get()
+
+    def stop(self) -> None:
+        """Stops refilling every pool"""
+        for pool in self.pools.values():
+            pool.stop()
+
+    @property
+    def stats(self) -> Dict[str, dict]:
+        """The stats of every pool"""
+        return {name: pool.stats for name, pool in self.pools.items()}
@@ -0,0 +1,214 @@
+"""File for the request quotas of the APIs that the bot has keys for."""
+import asyncio
+import time
+from typing import Dict, Mapping, NamedTuple, Optional
+
+from .errors import QuotaExceeded
+
+__all__ = ("APIQuota", "DEFAULT_QUOTAS", "QuotaLimit", "QuotaManager", "TokenBucket")
+
+
+class QuotaLimit(NamedTuple):
+    """How many requests can be made to a API in a period of time."""
+
+    host: str
+    limit: int
+    # In seconds
+    period: float
+
+
+# The quotas of the APIs in WMBot.apis, the keys are the same as the keys of WMBot.api_keys.
+# APIs that send their remaining quota in the response headers correct these as soon as they are used
+DEFAULT_QUOTAS: Dict[str, QuotaLimit] = {
+    "nasa": QuotaLimit("api.nasa.gov", 1000, 60 * 60),
+    "OMDB": QuotaLimit("www.omdbapi.com", 1000, 24 * 60 * 60),
+    # Tenor doesn't document a limit so we use a conservative one
+    "tenor": QuotaLimit("api.tenor.com", 50, 60),
+    # Neither does owlbot
+    "owlbot": QuotaLimit("owlbot.info", 1000, 24 * 60 * 60),
+    # The free plan is 100 requests a month
+    "gender_api": QuotaLimit("gender-api.com", 100, 30 * 24 * 60 * 60),
+}
+
+# The headers that APIs use to tell how much of the quota is left
+_REMAINING_HEADERS = ("X-RateLimit-Remaining", "RateLimit-Remaining")
+_LIMIT_HEADERS = ("X-RateLimit-Limit", "RateLimit-Limit")
+
+
+def _header_int(headers: Mapping[str, str], names) -> Optional[int]:
+    for name in names:
+        value = headers.get(name)
+        if value is not None:
+            try:
+                return int(value)
+            except ValueError:
+                return None
+    return None
+
+
+class TokenBucket:
+    """A bucket that holds up to ``capacity`` tokens and is refilled evenly over ``period`` seconds.
+
+    The tokens can go below zero, that is how requests that are waiting for a
+    token reserve their place in the queue.
+    """
+
+    __slots__ = ("capacity", "period", "tokens", "updated")
+
+    def __init__(self, capacity: int, period: float):
+        self.capacity = capacity
+        self.period = period
+        self.tokens = float(capacity)
+        self.updated = time.monotonic()
+
+    @property
+    def rate(self) -> float:
+        """How many tokens are added each second"""
+        return self.capacity / self.period
+
+    def refill(self) -> None:
+        """Adds the tokens for the time that passed since the last refill"""
+        now = time.monotonic()
+        self.tokens = min(self.capacity, self.tokens + (now - self.updated) * self.rate)
+        self.updated = now
+
+    def delay(self, reserve: float = 0.0) -> float:
+        """Returns how many seconds to wait until a token can be taken without going below the reserve"""
+        self.refill()
+        missing = reserve + 1 - self.tokens
+        return max(missing / self.rate, 0.0)
+
+
+class APIQuota:
+    """The quota of a single API.
+
+    A small part of the quota is kept in reserve so we stop before the API
+    starts rejecting the requests. Requests that would need to wait less than
+    ``max_wait`` seconds for a token are queued, the rest are shed with
+    QuotaExceeded.
+    """
+
+    def __init__(self, name: str, limit: QuotaLimit, *, reserve: float = 0.05, max_wait: float = 5.0):
+        """Makes a instance of APIQuota
+
+        Parameters
+        ----------
+        name : str
+            The name of the API, eg. ``nasa``
+        limit : QuotaLimit
+            The host and limit of the API
+        reserve : float, optional
+            The fraction of the quota that is never used, by default 5%
+        max_wait : float, optional
+            How many seconds a request can be queued for before it is shed, by default 5
+        """
+        self.name = name
+        self.host = limit.host
+        self.reserve = reserve
+        self.max_wait = max_wait
+        self.bucket = TokenBucket(limit.limit, limit.period)
+        # What the API told us in the last response, None if it doesn't send the headers
+        self.remote_remaining = None
+        # Statistics
+        self.used = 0
+        self.queued = 0
+        self.shed = 0
+        self.rejected = 0
+
+    @property
+    def headroom(self) -> int:
+        """How many requests can be made right now without waiting"""
+        self.bucket.refill()
+        return max(int(self.bucket.tokens - self.reserve * self.bucket.capacity), 0)
+
+    async def acquire(self) -> None:
+        """Waits until a request can be made
+
+        Raises
+        ------
+        QuotaExceeded
+            The request would have to wait longer than max_wait
+        """
+        delay = self.bucket.delay(self.reserve * self.bucket.capacity)
+        if delay > self.max_wait:
+            self.shed += 1
+            raise QuotaExceeded(self.name, delay)
+        self.bucket.tokens -= 1
+        if delay > 0:
+            self.queued += 1
+            try:
+                await asyncio.sleep(delay)
+            except asyncio.CancelledError:
+                # The place in the queue is given back
+                self.bucket.tokens += 1
+                raise
+        self.used += 1
+
+    def update(self, status: int, headers: Mapping[str, str]) -> None:
+        """Corrects the bucket with what the API told us in a response
+
+        Parameters
+        ----------
+        status : int
+            The status of the response
+        headers : Mapping[str, str]
+            The headers of the response
+        """
+        limit = _header_int(headers, _LIMIT_HEADERS)
+        if limit is not None and limit > 0 and limit != self.bucket.capacity:
+            # Keys can have a different limit than the default one, eg. the nasa DEMO_KEY
+            self.bucket.refill()
+            self.bucket.capacity = limit
+            self.bucket.tokens = min(self.bucket.tokens, limit)
+        remaining = _header_int(headers, _REMAINING_HEADERS)
+        if remaining is not None:
+            self.remote_remaining = remaining
+            # The key may be used by something else too so the API knows better than us
+            self.bucket.tokens = min(self.bucket.tokens, remaining)
+        if status == 429:
+            self.rejected += 1
+            self.bucket.tokens = min(self.bucket.tokens, 0)
+
+    @property
+    def stats(self) -> dict:
+        """The usage and headroom of the quota"""
+        return {
+            "host": self.host,
+            "limit": self.bucket.capacity,
+            "period": self.bucket.period,
+            "headroom": self.headroom,
+            "remote_remaining": self.remote_remaining,
+            "used": self.used,
+            "queued": self.queued,
+            "shed": self.shed,
+            "rejected": self.rejected,
+        }
+
+
+class QuotaManager:
+    """Keeps the quota of each API that the bot has a key for, looked up by the host of the request."""
+
+    def __init__(self, limits: Mapping[str, QuotaLimit] = DEFAULT_QUOTAS, **kwargs):
+        """Makes a instance of QuotaManager
+
+        Parameters
+        ----------
+        limits : Mapping[str, QuotaLimit], optional
+            The limits of each API, by default DEFAULT_QUOTAS
+        **kwargs
+            Passed to every APIQuota
+        """
+        self.quotas = {name: APIQuota(name, limit, **kwargs) for name, limit in limits.items()}
+        self._by_host = {quota.host: quota for quota in self.quotas.values()}
+
+    def __getitem__(self, name: str) -> APIQuota:
+        return self.quotas[name]
+
+    def for_host(self, host: str) -> Optional[APIQuota]:
+        """Returns the quota of the API on the host, None if the host has no quota"""
+        return self._by_host.get(host)
+
+    @property
+    def stats(self) -> Dict[str, dict]:
+        """The usage and headroom of every quota"""
+        return {name: quota.stats for name, quota in self.quotas.items()}
@@ -0,0 +1,261 @@
+"""File for the cache of subreddit listings that the Reddit cog picks posts from."""
+import asyncio
+import random
+import time
+from collections import deque
+from typing import Dict, List, NamedTuple, Optional, Tuple
+
+from .caches import ExpiringLRU
+from .errors import APIUnavailable, print_error
+
+__all__ = ("Listing", "RedditListings", "RedditPost")
+
+BASE_URL = "https://www.reddit.com/"
+# The description of a embed can't be longer than this so we don't keep the rest of the text
+MAX_SELFTEXT = 4096
+
+
+class RedditPost(NamedTuple):
+    """The parts of a reddit post that the commands use"""
+
+    id: str
+    title: str
+    selftext: str
+    author: str
+    permalink: str
+    created: float
+    image: Optional[str]
+    over_18: bool
+
+    @classmethod
+    def from_data(cls, data: dict) -> "RedditPost":
+        """Makes a RedditPost from the data of a post in a listing"""
+        return cls(
+            data["id"],
+            data["title"],
+            data["selftext"][:MAX_SELFTEXT],
+            data["author"],
+            data["permalink"],
+            data["created_utc"],
+            data.get("url_overridden_by_dest"),
+            data["over_18"],
+        )
+
+
+class Listing(NamedTuple):
+    """The posts of a subreddit listing, already split into SFW and NSFW posts"""
+
+    sfw: Tuple[RedditPost, ...]
+    nsfw: Tuple[RedditPost, ...]
+    # Why reddit refused to show the subreddit (eg. private or banned), None if it didn't
+    reason: Optional[str]
+    fetched_at: float
+
+
+class RedditListings:
+    """A cache of subreddit listings.
+
+    A listing is fresh for ``ttl`` seconds. After that it is still served for
+    up to ``stale_ttl`` seconds while a new one is fetched in the background,
+    so only the first request of a subreddit has to wait for reddit.
+
+    The posts that were sent in each channel are remembered so picking posts
+    from the same listing doesn't repeat them until every post was sent.
+    """
+
+    def __init__(
+        self,
+        web,
+        *,
+        ttl: float = 5 * 60,
+        stale_ttl: float = 60 * 60,
+        max_listings: int = 128,
+        limit: int = 100,
+        recent_size: int = 50,
+        max_channels: int = 1000,
+    ):
+        """Makes a instance of RedditListings
+
+        Parameters
+        ----------
+        web : WebClient
+            The client used to fetch the listings
+        ttl : float, optional
+            How many seconds a listing is used before it is refreshed, by default 5 minutes
+        stale_ttl : float, optional
+            How many seconds a listing can be served for while it is being refreshed, by default 1 hour
+        max_listings : int, optional
+            How many listings are kept, by default 128
+        limit : int, optional
+            How many posts are fetched for each listing, by default 100 which is the most reddit allows
+        recent_size : int, optional
+            How many of the posts sent in a channel are remembered, by default 50
+        max_channels : int, optional
+            How many channels the sent posts are remembered for, by default 1000
+        """
+        self.web = web
+        self.ttl = ttl
+        self.limit = limit
+        self.recent_size = recent_size
+        self._listings = ExpiringLRU(max_listings, stale_ttl)
+        self._recent = ExpiringLRU(max_channels, stale_ttl)
+        self._fetching: Dict[Tuple[str, Optional[str]], asyncio.Task] = {}
+        # Statistics
+        self.hits = 0
+        self.stale_hits = 0
+        self.fetches = 0
+        self.refreshes = 0
+        self.refresh_failures = 0
+
+    @staticmethod
+    def normalize(subreddit: str) -> str:
+        """Returns the name of a subreddit without the r/ prefix, eg. ``r/Memes`` -> ``memes``"""
+        subreddit = subreddit.strip().lower()
+        for prefix in ("/r/", "r/"):
+            if subreddit.startswith(prefix):
+                return subreddit[len(prefix) :]
+        return subreddit
+
+    async def get(self, subreddit: str, post_filter: Optional[str] = None) -> Listing:
+        """Returns the listing of a subreddit, from the cache if possible
+
+        Parameters
+        ----------
+        subreddit : str
+            The name of the subreddit, with or without r/
+        post_filter : Optional[str], optional
+            hot or top, by default None which is reddit's default listing
+
+        Returns
+        -------
+        Listing
+            The listing
+
+        Raises
+        ------
+        APIUnavailable
+            The listing is not cached and reddit is not working
+        """
+        key = (self.normalize(subreddit), post_filter)
+        listing = self._listings.get(key)
+        if listing is None:
+            # Commands that ask for the same subreddit at the same time share one request
+            return await asyncio.shield(self._start_fetch(key))
+
+        if time.monotonic() - listing.fetched_at < self.ttl:
+            self.hits += 1
+        else:
+            self.stale_hits += 1
+            self._start_fetch(key, refresh=True)
+        return listing
+
+    async def random_post(
+        self,
+        subreddit: str,
+        post_filter: Optional[str] = None,
+        *,
+        channel_id: int,
+        nsfw: bool = False,
+    ) -> Tuple[Listing, Optional[RedditPost]]:
+        """Picks a random post of a subreddit that was not sent in the channel recently
+
+        Parameters
+        ----------
+        subreddit : str
+            The name of the subreddit, with or without r/
+        post_filter : Optional[str], optional
+            hot or top, by default None which is reddit's default listing
+        channel_id : int
+            The channel the post will be sent in
+        nsfw : bool, optional
+            If NSFW posts can be picked, by default False
+
+        Returns
+        -------
+        Tuple[Listing, Optional[RedditPost]]
+            The listing and the post, the post is None if the listing doesn't have any posts that can be picked
+        """
+        listing = await self.get(subreddit, post_filter)
+        posts = listing.sfw + listing.nsfw if nsfw else listing.sfw
+        if not posts:
+            return listing, None
+
+        recent = self._recent.get(channel_id)
+        if recent is None:
+            recent = self._recent[channel_id] = deque(maxlen=self.recent_size)
+        unseen = [post for post in posts if post.id not in recent]
+        # Every post was sent recently so we start over
+        post = random.choice(unseen or posts)
+        recent.append(post.id)
+        # This keeps the channel from expiring while it is being used
+        self._recent[channel_id] = recent
+        return listing, post
+
+    def stop(self) -> None:
+        """Cancels the fetches that are running"""
+        for task in self._fetching.values():
+            task.cancel()
+
+    @property
+    def stats(self) -> dict:
+        """How many listings were served from the cache and how many were fetched"""
+        return {
+            "listings": len(self._listings),
+            "hits": self.hits,
+            "stale_hits": self.stale_hits,
+            "fetches": self.fetches,
+            "refreshes": self.refreshes,
+            "refresh_failures": self.refresh_failures,
+            "channels": len(self._recent),
+        }
+
+    def _start_fetch(self, key: Tuple[str, Optional[str]], *, refresh: bool = False) -> asyncio.Task:
+        task = self._fetching.get(key)
+        if task is None:
+            task = self._fetching[key] = asyncio.create_task(self._fetch(key))
+            task.add_done_callback(lambda task: self._fetch_done(key, task, refresh))
+        return task
+
+    def _fetch_done(self, key: Tuple[str, Optional[str]], task: asyncio.Task, refresh: bool) -> None:
+        del self._fetching[key]
+        if task.cancelled():
+            return
+        # We retrieve the error even if the commands waiting for it were cancelled so asyncio doesn't warn about it
+        exc = task.exception()
+        # Errors of fetches for missing listings are raised to the commands waiting for them
+        if not refresh:
+            return
+        if exc is None:
+            self.refreshes += 1
+        else:
+            # The stale listing is kept, the next request after ttl tries again
+            self.refresh_failures += 1
+            print_error(f"Could not refresh r/{key[0]}: {exc}")
+
+    async def _fetch(self, key: Tuple[str, Optional[str]]) -> Listing:
+        subreddit, post_filter = key
+        path = f"r/{subreddit}/{post_filter}.json" if post_filter else f"r/{subreddit}.json"
+        # We cache the compact listing ourselves so the WebClient doesn't need to keep the whole response
+        # raw_json makes reddit send the text without html escapes like &amp;
+        response = await self.web.get(BASE_URL + path, params={"limit": self.limit, "raw_json": 1}, ttl=0)
+        self.fetches += 1
+        try:
+            data = response.json()
+        except ValueError:
+            # Reddit sends a html page when it is having problems
+            raise APIUnavailable("reddit.com") from None
+
+        # The reason key is only present in errors, eg. private or banned subreddits
+        if response.status in (403, 404):
+            listing = Listing((), (), data.get("reason") or "That subreddit doesn't exist", time.monotonic())
+        elif response.status != 200:
+            raise APIUnavailable("reddit.com")
+        else:
+            sfw: List[RedditPost] = []
+            nsfw: List[RedditPost] = []
+            for child in data["data"]["children"]:
+                post = RedditPost.from_data(child["data"])
+                (nsfw if post.over_18 else sfw).append(post)
+            listing = Listing(tuple(sfw), tuple(nsfw), None, time.monotonic())
+        self._listings[key] = listing
+        return listing
@@ -0,0 +1,245 @@
+"""File for the cache of the images made by the image effects."""
+import asyncio
+import contextlib
+import hashlib
+import json
+import os
+import tempfile
+import threading
+from collections import OrderedDict, defaultdict
+from typing import Any, Dict, List, NamedTuple, Optional, Tuple
+
+from .errors import print_error
+
+__all__ = ("RenderCache", "Rendered")
+
+
+class Rendered(NamedTuple):
+    """A image made by a effect and how long it took to make"""
+
+    data: bytes
+    fmt: str
+    # CPU seconds for local effects, for dagpi we can only measure the seconds we waited for it
+    cpu: float
+    seconds: float
+
+    def to_bytes(self) -> bytes:
+        """Serializes the image for the disk cache"""
+        header = json.dumps({"fmt": self.fmt, "cpu": self.cpu, "seconds": self.seconds})
+        return header.encode() + b"\n" + self.data
+
+    @classmethod
+    def from_bytes(cls, data: bytes) -> "Rendered":
+        """Deserializes a image from the disk cache"""
+        header, _, body = data.partition(b"\n")
+        meta = json.loads(header)
+        return cls(body, meta["fmt"], meta["cpu"], meta["seconds"])
+
+
+class _EffectStats:
+    __slots__ = ("hits", "disk_hits", "misses", "cpu_saved", "seconds_saved")
+
+    def __init__(self):
+        self.hits = 0
+        self.disk_hits = 0
+        self.misses = 0
+        self.cpu_saved = 0.0
+        self.seconds_saved = 0.0
+
+
+class RenderCache:
+    """A cache of the images made by the image effects.
+
+    The effects always make the same image from the same source image and
+    parameters, so the result is stored by the effect, its parameters and the
+    sha256 of the source image. The most recently used images are kept in
+    memory and every image is also written to disk, so they survive restarts.
+
+    How long each image took to make is stored with it, so every hit can count
+    the CPU time it saved.
+    """
+
+    def __init__(
+        self,
+        disk_path: Optional[str] = None,
+        *,
+        max_bytes: int = 32 * 1024 * 1024,
+        max_item_bytes: int = 8 * 1024 * 1024,
+        max_disk_bytes: int = 256 * 1024 * 1024,
+    ):
+        """Makes a instance of RenderCache
+
+        Parameters
+        ----------
+        disk_path : Optional[str], optional
+            The directory to store the images in, by default None which disables the disk cache
+        max_bytes : int, optional
+            How many bytes of images are kept in memory, by default 32 MiB
+        max_item_bytes : int, optional
+            Images bigger than this are never cached, by default 8 MiB which is discord's upload limit
+        max_disk_bytes : int, optional
+            How many bytes of images are kept on disk, by default 256 MiB
+        """
+        self.disk_path = disk_path
+        self.max_bytes = max_bytes
+        self.max_item_bytes = max_item_bytes
+        self.max_disk_bytes = max_disk_bytes
+        self._memory: "OrderedDict[str, Rendered]" = OrderedDict()
+        self._memory_bytes = 0
+        self._disk_bytes = None
+        # The disk is written to from several threads, this keeps _disk_bytes and the files in sync
+        self._disk_lock = threading.Lock()
+        if disk_path is not None:
+            os.makedirs(disk_path, exist_ok=True)
+        # Statistics
+        self._effects: Dict[str, _EffectStats] = defaultdict(_EffectStats)
+
+    @property
+    def stats(self) -> Dict[str, dict]:
+        """The hits, misses and time saved of each effect"""
+        stats = {}
+        for name, effect in sorted(self._effects.items()):
+            lookups = effect.hits + effect.misses
+            stats[name] = {
+                "hits": effect.hits,
+                "disk_hits": effect.disk_hits,
+                "misses": effect.misses,
+                "hit_ratio": effect.hits / lookups if lookups else 0.0,
+                "cpu_saved": effect.cpu_saved,
+                "seconds_saved": effect.seconds_saved,
+            }
+        return stats
+
+    @property
+    def size(self) -> Tuple[int, int, Optional[int]]:
+        """How many images are in memory, how many bytes they use and how many bytes are on disk"""
+        return len(self._memory), self._memory_bytes, self._disk_bytes
+
+    @staticmethod
+    def key_for(effect: str, params: Dict[str, Any], digest: str) -> str:
+        """Returns the key of a effect used with some parameters on the image with the sha256 ``digest``"""
+        raw = json.dumps([effect, params, digest], sort_keys=True, default=str)
+        return hashlib.sha256(raw.encode()).hexdigest()
+
+    async def get(self, effect: str, key: str) -> Optional[Rendered]:
+        """Returns the cached image of a key, or None if it was not cached
+
+        Parameters
+        ----------
+        effect : str
+            The name of the effect, the statistics are counted for it
+        key : str
+            The key from RenderCache.key_for
+
+        Returns
+        -------
+        Optional[Rendered]
+            The image if it was cached
+        """
+        stats = self._effects[effect]
+        rendered = self._memory.get(key)
+        if rendered is not None:
+            self._memory.move_to_end(key)
+        elif self.disk_path is not None:
+            rendered = await asyncio.to_thread(self._read_disk, key)
+            if rendered is not None:
+                stats.disk_hits += 1
+                self._remember(key, rendered)
+
+        if rendered is None:
+            stats.misses += 1
+            return None
+        stats.hits += 1
+        stats.cpu_saved += rendered.cpu
+        stats.seconds_saved += rendered.seconds
+        return rendered
+
+    async def put(self, key: str, rendered: Rendered) -> None:
+        """Caches a image
+
+        Parameters
+        ----------
+        key : str
+            The key from RenderCache.key_for
+        rendered : Rendered
+            The image
+        """
+        if len(rendered.data) > self.max_item_bytes:
+            return
+        self._remember(key, rendered)
+        if self.disk_path is not None:
+            try:
+                await asyncio.to_thread(self._write_disk, key, rendered)
+            except OSError as exc:
+                # The image was already made so not being able to cache it doesn't fail the command
+                print_error(f"Could not write a cached image: {exc}")
+
+    def _remember(self, key: str, rendered: Rendered) -> None:
+        old = self._memory.pop(key, None)
+        if old is not None:
+            self._memory_bytes -= len(old.data)
+        self._memory[key] = rendered
+        self._memory_bytes += len(rendered.data)
+        while self._memory_bytes > self.max_bytes and len(self._memory) > 1:
+            _, evicted = self._memory.popitem(last=False)
+            self._memory_bytes -= len(evicted.data)
+
+    def _read_disk(self, key: str) -> Optional[Rendered]:
+        path = os.path.join(self.disk_path, key)
+        try:
+            with open(path, "rb") as f:
+                rendered = Rendered.from_bytes(f.read())
+            # Most filesystems don't update the access time on every read, so _prune_disk uses the modification time
+            # and we update it whenever a image is used
+            os.utime(path)
+            return rendered
+        except FileNotFoundError:
+            return None
+        except (OSError, ValueError, KeyError) as exc:
+            print_error(f"Could not read a cached image: {exc}")
+            return None
+
+    def _write_disk(self, key: str, rendered: Rendered) -> None:
+        path = os.path.join(self.disk_path, key)
+        data = rendered.to_bytes()
+        # We write to a temporary file first so a half written file is never read,
+        # every write has its own since two commands can cache the same image at once
+        fd, temp_path = tempfile.mkstemp(suffix=".tmp", dir=self.disk_path)
+        try:
+            with os.fdopen(fd, "wb") as f:
+                f.write(data)
+            with self._disk_lock:
+                try:
+                    replaced = os.stat(path).st_size
+                except FileNotFoundError:
+                    replaced = 0
+                os.replace(temp_path, path)
+                if self._disk_bytes is None:
+                    self._disk_bytes = sum(entry.stat().st_size for entry in self._disk_entries())
+                else:
+                    self._disk_bytes += len(data) - replaced
+                if self._disk_bytes > self.max_disk_bytes:
+                    self._prune_disk()
+        except BaseException:
+            with contextlib.suppress(OSError):
+                os.remove(temp_path)
+            raise
+
+    def _disk_entries(self) -> List[os.DirEntry]:
+        # The temporary files are still being written so they are not part of the cache yet
+        return [entry for entry in os.scandir(self.disk_path) if not entry.name.endswith(".tmp")]
+
+    def _prune_disk(self) -> None:
+        """Removes the least recently used files until the disk cache is 80% of its budget"""
+        entries = sorted(self._disk_entries(), key=lambda entry: entry.stat().st_mtime)
+        total = sum(entry.stat().st_size for entry in entries)
+        for entry in entries:
+            if total <= self.max_disk_bytes * 0.8:
+                break
+            size = entry.stat().st_size
+            try:
+                os.remove(entry.path)
+            except OSError:
+                continue
+            total -= size
+        self._disk_bytes = total
@@ -0,0 +1,241 @@
+"""File for the cache of the images that the image commands are used on."""
+import asyncio
+import hashlib
+import io
+import re
+from collections import OrderedDict
+from typing import Dict, Tuple
+
+import aiohttp
+from discord.ext import commands
+from PIL import Image, UnidentifiedImageError
+from yarl import URL
+
+from .caches import ExpiringLRU
+
+__all__ = ("SourceImageCache",)
+
+_DISCORD_HOSTS = ("cdn.discordapp.com", "media.discordapp.net")
+# The query parameters of discord's cdn that change the image, the others (like the ex, is and hm
+# signature of attachments) change over time without changing the image
+_DISCORD_PARAMS = ("size", "format", "width", "height")
+# eg. /avatars/<user id>/<avatar hash>.png or /guilds/<guild id>/users/<user id>/avatars/<avatar hash>.png
+_AVATAR_PATH = re.compile(r"^/(?:avatars/(\d+)|guilds/(\d+)/users/(\d+)/avatars)/(?:a_)?(\w+)\.\w+$")
+
+
+class SourceImageCache:
+    """A cache of downloaded images, so using several image commands on the
+    same avatar or attachment only downloads it once.
+
+    Images are stored by the sha256 of their content, so the same image at
+    different urls (eg. a attachment with a new signature) is stored once,
+    and the least recently used images are removed when the byte budget is
+    used up. Discord avatar urls have the avatar's hash in them, so when a user
+    changes their avatar the entry of their old avatar is removed.
+
+    Downloads are streamed and stopped as soon as they get bigger than
+    ``max_item_bytes``, and images that would be bigger than ``max_pixels``
+    once decoded are refused, so huge images can't use up the memory.
+    """
+
+    def __init__(
+        self,
+        session: aiohttp.ClientSession,
+        *,
+        max_bytes: int = 64 * 1024 * 1024,
+        max_item_bytes: int = 8 * 1024 * 1024,
+        max_pixels: int = 4096 * 4096,
+        ttl: float = 60 * 60,
+        max_urls: int = 4096,
+        timeout: float = 15.0,
+    ):
+        """Makes a instance of SourceImageCache
+
+        Parameters
+        ----------
+        session : aiohttp.ClientSession
+            The session used to download the images
+        max_bytes : int, optional
+            How many bytes of images are kept, by default 64 MiB
+        max_item_bytes : int, optional
+            Images bigger than this are not downloaded, by default 8 MiB which is discord's upload limit
+        max_pixels : int, optional
+            Images with more pixels than this are refused, by default 4096x4096
+        ttl : float, optional
+            How many seconds a url is trusted to have the same image, by default 1 hour
+        max_urls : int, optional
+            How many urls are remembered, by default 4096
+        timeout : float, optional
+            How many seconds a download can take, by default 15
+        """
+        self.session = session
+        self.max_bytes = max_bytes
+        self.max_item_bytes = max_item_bytes
+        self.max_pixels = max_pixels
+        self.timeout = timeout
+        # url key -> sha256 of the image
+        self._urls = ExpiringLRU(max_urls, ttl)
+        # sha256 -> image, the least recently used first
+        self._images: "OrderedDict[str, bytes]" = OrderedDict()
+        self._bytes = 0
+        # (guild id, user id) -> (avatar hash, url key) of the last avatar we saw of the user
+        self._avatars = ExpiringLRU(max_urls)
+        self._in_flight: Dict[str, asyncio.Task] = {}
+        # Statistics
+        self.hits = 0
+        self.misses = 0
+        self.coalesced = 0
+        self.deduplicated = 0
+        self.refused = 0
+        self.invalidations = 0
+        self.evictions = 0
+
+    @property
+    def stats(self) -> dict:
+        """The size and hit counts of the cache"""
+        return {
+            "images": len(self._images),
+            "bytes": self._bytes,
+            "max_bytes": self.max_bytes,
+            "hits": self.hits,
+            "misses": self.misses,
+            "coalesced": self.coalesced,
+            "deduplicated": self.deduplicated,
+            "refused": self.refused,
+            "invalidations": self.invalidations,
+            "evictions": self.evictions,
+        }
+
+    @staticmethod
+    def key_for(url: str) -> str:
+        """Returns the key of a url, urls with the same key have the same image"""
+        parsed = URL(url)
+        if parsed.host not in _DISCORD_HOSTS:
+            return url
+        query = "&".join(f"{name}={parsed.query[name]}" for name in _DISCORD_PARAMS if name in parsed.query)
+        return f"discord:{parsed.path}?{query}"
+
+    async def get(self, url: str) -> bytes:
+        """Same as SourceImageCache.get_hashed but only returns the image"""
+        return (await self.get_hashed(url))[1]
+
+    async def get_hashed(self, url: str) -> Tuple[str, bytes]:
+        """Returns the image at a url and the sha256 of it, downloading it if it is not cached
+
+        Parameters
+        ----------
+        url : str
+            The url of the image
+
+        Returns
+        -------
+        Tuple[str, bytes]
+            The hex sha256 of the image and the image
+
+        Raises
+        ------
+        commands.BadArgument
+            The image could not be downloaded, is not a image or is too big
+        """
+        key = self.key_for(url)
+        self._check_avatar(url, key)
+        digest = self._urls.get(key)
+        if digest is not None and digest in self._images:
+            self.hits += 1
+            self._images.move_to_end(digest)
+            return digest, self._images[digest]
+
+        # If the same image is already being downloaded we wait for that download instead
+        in_flight = self._in_flight.get(key)
+        if in_flight is not None:
+            self.coalesced += 1
+        else:
+            in_flight = asyncio.create_task(self._download_and_store(url, key))
+            self._in_flight[key] = in_flight
+            in_flight.add_done_callback(lambda task: self._download_done(key, task))
+        # The download runs in its own task so one caller being cancelled doesn't cancel it for the others
+        return await asyncio.shield(in_flight)
+
+    async def _download_and_store(self, url: str, key: str) -> Tuple[str, bytes]:
+        data = await self._download(url)
+        return self._store(key, data), data
+
+    def _download_done(self, key: str, task: asyncio.Task) -> None:
+        del self._in_flight[key]
+        if not task.cancelled():
+            # We retrieve the exception so asyncio doesn't warn about it if every caller was cancelled
+            task.exception()
+
+    async def _download(self, url: str) -> bytes:
+        self.misses += 1
+        try:
+            async with self.session.get(url, timeout=aiohttp.ClientTimeout(total=self.timeout)) as response:
+                if response.status != 200:
+                    raise commands.BadArgument("Could not download that image")
+                # We trust the Content-Length if there is one, but we still count the bytes since it can lie
+                if (response.content_length or 0) > self.max_item_bytes:
+                    self._refuse()
+                buffer = bytearray()
+                async for chunk in response.content.iter_chunked(64 * 1024):
+                    buffer += chunk
+                    if len(buffer) > self.max_item_bytes:
+                        self._refuse()
+        except (asyncio.TimeoutError, aiohttp.ClientError, ValueError) as exc:
+            raise commands.BadArgument("Could not download that image") from exc
+
+        data = bytes(buffer)
+        try:
+            # This only reads the header of the image, not the pixels
+            with Image.open(io.BytesIO(data)) as image:
+                width, height = image.size
+        except (UnidentifiedImageError, Image.DecompressionBombError, OSError) as exc:
+            raise commands.BadArgument("That is not a valid image") from exc
+        if width * height > self.max_pixels:
+            self._refuse()
+        return data
+
+    def _refuse(self) -> None:
+        self.refused += 1
+        raise commands.BadArgument(
+            f"That image is too big, it can be at most {self.max_item_bytes // (1024 * 1024)} MiB "
+            f"and {self.max_pixels:,} pixels"
+        )
+
+    def _store(self, key: str, data: bytes) -> str:
+        digest = hashlib.sha256(data).hexdigest()
+        self._urls[key] = digest
+        if digest in self._images:
+            self.deduplicated += 1
+            self._images.move_to_end(digest)
+            return digest
+        if len(data) > self.max_bytes:
+            return digest
+        self._images[digest] = data
+        self._bytes += len(data)
+        while self._bytes > self.max_bytes:
+            _, evicted = self._images.popitem(last=False)
+            self._bytes -= len(evicted)
+            self.evictions += 1
+        return digest
+
+    def _check_avatar(self, url: str, key: str) -> None:
+        """Removes the old avatar of a user if the url is of a new avatar"""
+        parsed = URL(url)
+        if parsed.host not in _DISCORD_HOSTS:
+            return
+        match = _AVATAR_PATH.match(parsed.path)
+        if match is None:
+            return
+        user_id, guild_id, member_id, avatar_hash = match.groups()
+        # Server avatars are separate from the normal avatar
+        owner = (guild_id, member_id) if guild_id else (None, user_id)
+        previous = self._avatars.get(owner)
+        self._avatars[owner] = (avatar_hash, key)
+        if previous is None or previous[0] == avatar_hash:
+            return
+        self.invalidations += 1
+        digest = self._urls.pop(previous[1])
+        if digest is not None:
+            image = self._images.pop(digest, None)
+            if image is not None:
+                self._bytes -= len(image)
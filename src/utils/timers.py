@@ -0,0 +1,220 @@
+"""File for the reminders that are stored in the database and sent by a single background task."""
+import asyncio
+import datetime
+import heapq
+from typing import List, NamedTuple, Optional, Set
+
+import discord
+
+from .caches import ExpiringLRU
+from .errors import print_error
+
+__all__ = ("Reminder", "ReminderScheduler")
+
+
+class Reminder(NamedTuple):
+    """A row of the reminders table, ordered by when it should be sent."""
+
+    expires_at: datetime.datetime
+    id: int
+    user_id: int
+    channel_id: Optional[int]
+    content: str
+
+
+class ReminderScheduler:
+    """Sends the reminders stored in the reminders table when they are due.
+
+    Only the reminders that are due within the next ``window`` seconds are kept
+    in memory (at most ``batch_size`` of them), in a heap ordered by when they
+    expire. The rest stay in the database until the window reaches them, so
+    pending reminders survive restarts and don't cost any memory.
+    """
+
+    def __init__(self, bot, *, window: float = 3600.0, batch_size: int = 100):
+        """Makes a instance of ReminderScheduler
+
+        Parameters
+        ----------
+        bot : WMBot
+            The bot to send the reminders with
+        window : float, optional
+            How far ahead the reminders are loaded from the database in seconds, by default 1 hour
+        batch_size : int, optional
+            The maximum amount of reminders loaded or sent at once, by default 100
+        """
+        self.bot = bot
+        self.window = datetime.timedelta(seconds=window)
+        self.batch_size = batch_size
+        self._heap: List[Reminder] = []
+        # The ids of the reminders in the heap, so a reminder is never added to it twice
+        self._queued: Set[int] = set()
+        # The ids of the reminders that were sent recently, a refill can load a reminder and send it before
+        # create returns or before its row is deleted, and it must not be added to the heap again after that
+        self._sent = ExpiringLRU(batch_size * 10, window)
+        # Every reminder that expires before this is in the heap
+        self._horizon = None
+        # Reminders created while the heap is being refilled, the refill query may not have seen them
+        self._created_during_refill = None
+        self._wakeup = asyncio.Event()
+        self._task = None
+        # Statistics
+        self.sent = 0
+        self.failed = 0
+
+    def __len__(self) -> int:
+        return len(self._heap)
+
+    def start(self) -> None:
+        """Starts the task that sends the reminders"""
+        if self._task is None or self._task.done():
+            self._task = asyncio.create_task(self._dispatch_loop())
+
+    def stop(self) -> None:
+        """Stops the task that sends the reminders, the pending ones are sent after the next start"""
+        if self._task is not None:
+            self._task.cancel()
+            self._task = None
+
+    async def create(
+        self, user_id: int, when: datetime.datetime, content: str, *, channel_id: Optional[int] = None
+    ) -> Reminder:
+        """Saves a new reminder
+
+        Parameters
+        ----------
+        user_id : int
+            The id of the user to remind
+        when : datetime.datetime
+            When to send the reminder, must be timezone aware
+        content : str
+            What to remind the user about
+        channel_id : Optional[int], optional
+            The channel the reminder was made in, by default None
+
+        Returns
+        -------
+        Reminder
+            The reminder that was saved
+        """
+        record = await self.bot.db.fetchrow(
+            """
+            INSERT INTO reminders (user_id, channel_id, expires_at, created_at, content)
+            VALUES ($1, $2, $3, $4, $5)
+            RETURNING *;
+            """,
+            user_id,
+            channel_id,
+            when,
+            discord.utils.utcnow(),
+            content,
+        )
+        reminder = self._from_record(record)
+        if self._created_during_refill is not None:
+            self._created_during_refill.append(reminder)
+        # If it's due before the loaded window ends we have to add it to the heap ourselves,
+        # unless a refill that finished before the insert returned already loaded it
+        elif self._horizon is not None and when <= self._horizon and not self._is_known(reminder.id):
+            heapq.heappush(self._heap, reminder)
+            self._queued.add(reminder.id)
+            self._wakeup.set()
+        return reminder
+
+    async def _dispatch_loop(self) -> None:
+        await self.bot.wait_until_ready()
+        while True:
+            self._wakeup.clear()
+            now = discord.utils.utcnow()
+            if self._horizon is None or now >= self._horizon:
+                try:
+                    await self._refill(now)
+                except Exception as exc:
+                    print_error(f"Could not load the reminders: {exc}")
+                    await asyncio.sleep(60)
+                    continue
+
+            due = []
+            while self._heap and self._heap[0].expires_at <= now and len(due) < self.batch_size:
+                reminder = heapq.heappop(self._heap)
+                self._queued.discard(reminder.id)
+                self._sent[reminder.id] = True
+                due.append(reminder)
+            if due:
+                await self._dispatch(due)
+                continue
+
+            next_wakeup = self._heap[0].expires_at if self._heap else self._horizon
+            try:
+                await asyncio.wait_for(self._wakeup.wait(), timeout=(next_wakeup - now).total_seconds())
+            except asyncio.TimeoutError:
+                pass
+
+    async def _refill(self, now: datetime.datetime) -> None:
+        """Loads the reminders that are due within the window into the heap"""
+        self._created_during_refill = []
+        try:
+            records = await self.bot.db.fetch(
+                """
+                SELECT *
+                FROM reminders
+                WHERE expires_at <= $1
+                ORDER BY expires_at
+                LIMIT $2;
+                """,
+                now + self.window,
+                self.batch_size,
+            )
+        finally:
+            created, self._created_during_refill = self._created_during_refill, None
+
+        heap = [self._from_record(record) for record in records if record["id"] not in self._sent]
+        if len(records) < self.batch_size:
+            self._horizon = now + self.window
+        else:
+            # There may be more reminders in the window, so we only trust the heap up to the last one we got
+            self._horizon = records[-1]["expires_at"]
+        loaded = {reminder.id for reminder in heap} | set(self._sent)
+        heap.extend(r for r in created if r.id not in loaded and r.expires_at <= self._horizon)
+        heapq.heapify(heap)
+        self._heap = heap
+        self._queued = {reminder.id for reminder in heap}
+
+    async def _dispatch(self, reminders: List[Reminder]) -> None:
+        """Sends a batch of reminders and removes them from the database"""
+        results = await asyncio.gather(*(self._send(reminder) for reminder in reminders), return_exceptions=True)
+        for result in results:
+            if result is True:
+                self.sent += 1
+            else:
+                self.failed += 1
+        try:
+            await self.bot.db.execute(
+                "DELETE FROM reminders WHERE id = ANY($1::bigint[]);",
+                [reminder.id for reminder in reminders],
+            )
+        except Exception as exc:
+            print_error(f"Could not delete the sent reminders: {exc}")
+
+    async def _send(self, reminder: Reminder) -> bool:
+        user = self.bot.get_user(reminder.user_id) or await self.bot.fetch_user(reminder.user_id)
+        try:
+            await user.send(reminder.content)
+        except discord.HTTPException:
+            # If the user has their dms closed we try the channel where the reminder was made
+            channel = self.bot.get_channel(reminder.channel_id) if reminder.channel_id else None
+            if channel is None:
+                return False
+            await channel.send(
+                f"{user.mention}, {reminder.content}", allowed_mentions=discord.AllowedMentions(users=True)
+            )
+        return True
+
+    def _is_known(self, reminder_id: int) -> bool:
+        """If a reminder is already in the heap or was sent recently"""
+        return reminder_id in self._queued or reminder_id in self._sent
+
+    @staticmethod
+    def _from_record(record) -> Reminder:
+        return Reminder(
+            record["expires_at"], record["id"], record["user_id"], record["channel_id"], record["content"]
+        )
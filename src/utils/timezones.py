@@ -0,0 +1,106 @@
+"""File for resolving timezone names locally with zoneinfo."""
+import difflib
+import functools
+import zoneinfo
+from typing import Dict, List, Optional
+
+__all__ = ("TimezoneIndex", "TIMEZONES")
+
+# Names people use that are not in the IANA database
+# Abbreviations like IST mean different zones in different places so we only have the common meaning
+ALIASES: Dict[str, str] = {
+    "utc": "UTC",
+    "gmt": "Etc/GMT",
+    "est": "America/New_York",
+    "edt": "America/New_York",
+    "cst": "America/Chicago",
+    "cdt": "America/Chicago",
+    "mst": "America/Denver",
+    "mdt": "America/Denver",
+    "pst": "America/Los_Angeles",
+    "pdt": "America/Los_Angeles",
+    "bst": "Europe/London",
+    "cet": "Europe/Paris",
+    "ist": "Asia/Kolkata",
+    "jst": "Asia/Tokyo",
+    "aest": "Australia/Sydney",
+    "uk": "Europe/London",
+    "india": "Asia/Kolkata",
+    "bangladesh": "Asia/Dhaka",
+    "pakistan": "Asia/Karachi",
+    "japan": "Asia/Tokyo",
+    "china": "Asia/Shanghai",
+    "germany": "Europe/Berlin",
+    "france": "Europe/Paris",
+    "new york city": "America/New_York",
+    "nyc": "America/New_York",
+    "la": "America/Los_Angeles",
+    "san francisco": "America/Los_Angeles",
+    "delhi": "Asia/Kolkata",
+    "new delhi": "Asia/Kolkata",
+    "mumbai": "Asia/Kolkata",
+    "bombay": "Asia/Kolkata",
+    "beijing": "Asia/Shanghai",
+}
+
+
+def _normalize(name: str) -> str:
+    return " ".join(name.lower().replace("_", " ").split())
+
+
+class TimezoneIndex:
+    """A index of every IANA timezone name and the names of their cities.
+
+    The index is built the first time it is used, after that resolving a name
+    is a dictionary lookup and no request is ever made.
+    """
+
+    @functools.cached_property
+    def _names(self) -> Dict[str, str]:
+        """Maps every normalized name we accept to a IANA timezone name"""
+        available = zoneinfo.available_timezones()
+        zones = sorted(available)
+        names = {}
+        for zone in zones:
+            # The city, eg. America/Argentina/Buenos_Aires -> buenos aires
+            # Names that are ambiguous like "Central" go to the first zone in alphabetical order
+            city = _normalize(zone.rsplit("/", 1)[-1])
+            names.setdefault(city, zone)
+        for zone in zones:
+            names[_normalize(zone)] = zone
+        # The aliases win over zones like EST, which don't have daylight saving time unlike what people mean by EST
+        for alias, zone in ALIASES.items():
+            if zone in available:
+                names[alias] = zone
+        return names
+
+    def resolve(self, name: str) -> Optional[str]:
+        """Returns the IANA name of a timezone from its name, the name of its city or a common alias
+
+        Parameters
+        ----------
+        name : str
+            The name, eg. ``asia/dhaka``, ``Dhaka`` or ``EST``
+
+        Returns
+        -------
+        Optional[str]
+            The IANA name, eg. ``Asia/Dhaka``, None if it is unknown
+        """
+        return self._names.get(_normalize(name))
+
+    def suggest(self, name: str, limit: int = 5) -> List[str]:
+        """Returns the IANA names of the timezones that are the closest to a name"""
+        matches = difflib.get_close_matches(_normalize(name), self._names, n=limit * 2, cutoff=0.5)
+        # Several names can point to the same zone
+        return list(dict.fromkeys(self._names[match] for match in matches))[:limit]
+
+    @staticmethod
+    def zone(name: str) -> zoneinfo.ZoneInfo:
+        """Returns the ZoneInfo of a IANA name"""
+        # ZoneInfo keeps the zones it loaded so this only reads the tz database once per zone
+        return zoneinfo.ZoneInfo(name)
+
+
+# This is shared by everything in the process so the index is only built once
+TIMEZONES = TimezoneIndex()
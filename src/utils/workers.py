@@ -0,0 +1,282 @@
+"""File for the process pool that the CPU heavy image work runs in."""
+import asyncio
+import multiprocessing
+import os
+import time
+from collections import deque
+from concurrent.futures import Future, ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+from multiprocessing import resource_tracker
+from multiprocessing.shared_memory import SharedMemory
+from typing import Any, Awaitable, Callable, NamedTuple, Optional, Tuple
+
+from .errors import ImageQueueFull, print_error
+
+__all__ = ("ImageWorkerPool",)
+
+
+class _SharedBuffer(NamedTuple):
+    """A buffer that was put in shared memory, it is sent to the worker instead of the data itself"""
+
+    name: str
+    size: int
+
+
+def _noop() -> None:
+    pass
+
+
+def _work(func: Callable[..., Any], data: Any, args: tuple) -> Tuple[Any, float]:
+    """Runs a job in a worker process and returns the result and how much CPU time it took"""
+    start = time.process_time()
+    if isinstance(data, _SharedBuffer):
+        shared = SharedMemory(data.name)
+        try:
+            data = bytes(shared.buf[: data.size])
+        finally:
+            shared.close()
+    result = func(data, *args)
+    return result, time.process_time() - start
+
+
+def _cpu_count() -> int:
+    try:
+        # The cores this process is allowed to use, which can be less than the cores of the machine
+        return len(os.sched_getaffinity(0))
+    except AttributeError:
+        return os.cpu_count() or 1
+
+
+class ImageWorkerPool:
+    """A pool of worker processes for CPU heavy image work like Pillow and NumPy.
+
+    Running the work in processes means it doesn't fight with the bot's event
+    loop for the GIL, and it doesn't share the default thread pool with things
+    like the regex and text to speech commands.
+
+    At most ``workers`` jobs run at a time and at most ``max_queue`` jobs wait
+    for a worker, more jobs than that are rejected with ImageQueueFull instead
+    of piling up. Big inputs are sent to the workers through shared memory
+    instead of being pickled through a pipe.
+    """
+
+    def __init__(
+        self,
+        workers: Optional[int] = None,
+        *,
+        max_queue: Optional[int] = None,
+        shared_memory_threshold: int = 64 * 1024,
+    ):
+        """Makes a instance of ImageWorkerPool
+
+        Parameters
+        ----------
+        workers : Optional[int], optional
+            How many worker processes to use, by default the amount of cores
+        max_queue : Optional[int], optional
+            How many jobs can wait for a worker, by default 4 for each worker
+        shared_memory_threshold : int, optional
+            Inputs that are at least this many bytes are sent through shared memory, by default 64 KiB
+        """
+        self.workers = workers or _cpu_count()
+        self.max_queue = max_queue if max_queue is not None else self.workers * 4
+        self.shared_memory_threshold = shared_memory_threshold
+        self._executor: Optional[ProcessPoolExecutor] = None
+        self._running = 0
+        self._waiting = deque()
+        # Statistics
+        self.jobs = 0
+        self.failures = 0
+        self.rejected = 0
+        self.queued = 0
+        self.restarts = 0
+        self.total_wait = 0.0
+        self.max_wait = 0.0
+        self.total_cpu = 0.0
+        self.total_run = 0.0
+
+    def start(self) -> None:
+        """Starts the worker processes"""
+        # The bot has threads (eg. the ones of asyncio.to_thread) so forking it could copy a lock that a thread
+        # holds and deadlock the worker. The workers are forked from a forkserver instead, which imports the
+        # effects once so the workers don't have to. Python 3.11 doesn't give the forkserver the path of main.py
+        # so there each worker imports it, which is safe since main.py only runs the bot under __main__
+        if "forkserver" in multiprocessing.get_all_start_methods():
+            context = multiprocessing.get_context("forkserver")
+            context.set_forkserver_preload(["__main__", "utils.workers", "utils.effects"])
+        else:
+            # Windows can only spawn
+            context = multiprocessing.get_context("spawn")
+        if os.name == "posix":
+            # The workers need to use the same resource tracker as us, otherwise every worker thinks
+            # the shared memory it opened was leaked by it and warns about it when it exits
+            resource_tracker.ensure_running()
+        self._executor = ProcessPoolExecutor(self.workers, mp_context=context)
+        # The workers are only made when the first job is submitted, so we make them now instead
+        # of making the first command wait for it
+        self._executor.submit(_noop)
+
+    def stop(self) -> None:
+        """Stops the worker processes, the jobs that are waiting for a worker are cancelled"""
+        if self._executor is not None:
+            self._executor.shutdown(wait=False, cancel_futures=True)
+            self._executor = None
+        while self._waiting:
+            self._waiting.popleft().cancel()
+
+    @property
+    def stats(self) -> dict:
+        """How many jobs ran and how long they waited and took"""
+        return {
+            "workers": self.workers,
+            "running": self._running,
+            "waiting": len(self._waiting),
+            "max_queue": self.max_queue,
+            "jobs": self.jobs,
+            "failures": self.failures,
+            "queued": self.queued,
+            "rejected": self.rejected,
+            "restarts": self.restarts,
+            "average_wait": self.total_wait / self.jobs if self.jobs else 0.0,
+            "max_wait": self.max_wait,
+            "average_cpu": self.total_cpu / self.jobs if self.jobs else 0.0,
+            "average_run": self.total_run / self.jobs if self.jobs else 0.0,
+        }
+
+    async def run(
+        self,
+        func: Callable[..., Any],
+        data: Any,
+        *args: Any,
+        on_queued: Optional[Callable[[int], Awaitable[Any]]] = None,
+    ) -> Any:
+        """Same as ImageWorkerPool.run_timed but only returns what the function returned"""
+        return (await self.run_timed(func, data, *args, on_queued=on_queued))[0]
+
+    async def run_timed(
+        self,
+        func: Callable[..., Any],
+        data: Any,
+        *args: Any,
+        on_queued: Optional[Callable[[int], Awaitable[Any]]] = None,
+    ) -> Tuple[Any, float]:
+        """Runs ``func(data, *args)`` in a worker process
+
+        Parameters
+        ----------
+        func : Callable[..., Any]
+            The function to run, it has to be defined at the top level of a module so it can be pickled
+        data : Any
+            The first argument of the function, bytes are sent through shared memory if they are big
+        *args : Any
+            The other arguments of the function
+        on_queued : Optional[Callable[[int], Awaitable[Any]]], optional
+            Called with the position in the queue if the job has to wait for a worker, by default None
+
+        Returns
+        -------
+        Tuple[Any, float]
+            What the function returned and how many seconds of CPU time it took
+
+        Raises
+        ------
+        ImageQueueFull
+            There are already max_queue jobs waiting
+        """
+        queued_at = time.perf_counter()
+        await self._acquire(on_queued)
+        wait = time.perf_counter() - queued_at
+
+        shared = None
+        job = None
+        try:
+            if isinstance(data, (bytes, bytearray, memoryview)) and len(data) >= self.shared_memory_threshold:
+                shared = SharedMemory(create=True, size=len(data))
+                shared.buf[: len(data)] = data
+                data = _SharedBuffer(shared.name, len(data))
+            start = time.perf_counter()
+            try:
+                job = self._submit(func, data, args)
+                try:
+                    result, cpu = await asyncio.wrap_future(job)
+                except BrokenProcessPool:
+                    # A worker died (eg. it ran out of memory) and every job that was running fails with this.
+                    # This job may be the one that killed it, so it is only retried once
+                    print_error(f"A image worker died while running {func.__name__}, retrying it once")
+                    job = self._submit(func, data, args)
+                    result, cpu = await asyncio.wrap_future(job)
+            except BaseException:
+                self.failures += 1
+                raise
+            run = time.perf_counter() - start
+        finally:
+            if job is not None and not job.done():
+                # Being cancelled doesn't stop the job in the worker, so the worker and the shared memory
+                # are only given back once it is done, otherwise more than ``workers`` jobs could be running
+                loop = asyncio.get_running_loop()
+                job.add_done_callback(lambda _: loop.call_soon_threadsafe(self._finish, shared))
+            else:
+                self._finish(shared)
+
+        self.jobs += 1
+        self.total_wait += wait
+        self.max_wait = max(self.max_wait, wait)
+        self.total_cpu += cpu
+        self.total_run += run
+        return result, cpu
+
+    def _submit(self, func: Callable[..., Any], data: Any, args: tuple) -> Future:
+        if self._executor is None:
+            self.start()
+        executor = self._executor
+        try:
+            return executor.submit(_work, func, data, args)
+        except BrokenProcessPool:
+            # The pool can't be used anymore after a worker died so we make a new one,
+            # every job that was running sees this so only the first one makes the new pool
+            if self._executor is executor:
+                self.restarts += 1
+                executor.shutdown(wait=False)
+                self.start()
+            return self._executor.submit(_work, func, data, args)
+
+    def _finish(self, shared: Optional[SharedMemory]) -> None:
+        if shared is not None:
+            shared.close()
+            shared.unlink()
+        self._release()
+
+    async def _acquire(self, on_queued: Optional[Callable[[int], Awaitable[Any]]]) -> None:
+        if self._running < self.workers and not self._waiting:
+            self._running += 1
+            return
+        if len(self._waiting) >= self.max_queue:
+            self.rejected += 1
+            raise ImageQueueFull(len(self._waiting))
+
+        future = asyncio.get_running_loop().create_future()
+        self._waiting.append(future)
+        self.queued += 1
+        try:
+            if on_queued is not None:
+                await on_queued(len(self._waiting))
+            # When this is done a finished job gave us its worker, see _release
+            await future
+        except BaseException:
+            if future.done() and not future.cancelled():
+                # We were given a worker but we won't use it
+                self._release()
+            else:
+                future.cancel()
+                if future in self._waiting:
+                    self._waiting.remove(future)
+            raise
+
+    def _release(self) -> None:
+        # The worker is given directly to the next job so no new job can take it first
+        while self._waiting:
+            future = self._waiting.popleft()
+            if not future.done():
+                future.set_result(None)
+                return
+        self._running -= 1